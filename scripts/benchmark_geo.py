@@ -0,0 +1,91 @@
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+"""
+Benchmark the vectorized geospatial helpers against their row-wise counterparts,
+checking that both return the same values.
+
+    python scripts/benchmark_geo.py --sizes 10000,100000,1000000,5000000
+"""
+import time
+from typing import Any, Callable, List, Tuple
+
+import click
+import geohash
+import numpy as np
+from geopy.point import Point
+
+from superset.utils import geo
+
+# geopy is slow, the row-wise parsing is timed on a sample and extrapolated
+MAX_POINT_SAMPLE = 100000
+
+
+def timed(func: Callable[[], Any]) -> Tuple[Any, float]:
+    start = time.perf_counter()
+    result = func()
+    return result, time.perf_counter() - start
+
+
+def report(operation: str, size: int, vectorized: float, row_wise: float) -> None:
+    print(
+        f"{operation:<16}{size:>10}{vectorized:>12.3f}s{row_wise:>12.3f}s"
+        f"{row_wise / vectorized:>9.1f}x"
+    )
+
+
+@click.command()
+@click.option(
+    "--sizes",
+    default="10000,100000,1000000,5000000",
+    help="Comma separated numbers of rows",
+)
+@click.option("--seed", default=0, help="Seed of the random coordinates")
+def main(sizes: str, seed: int) -> None:
+    rng = np.random.default_rng(seed)
+    print(f"{'operation':<16}{'rows':>10}{'vectorized':>13}{'row-wise':>13}{'':>10}")
+    for size in [int(size) for size in sizes.split(",")]:
+        latitudes = rng.uniform(-90, 90, size)
+        longitudes = rng.uniform(-180, 180, size)
+        lat_list, lon_list = latitudes.tolist(), longitudes.tolist()
+
+        geohashes, vectorized = timed(lambda: geo.geohash_encode(latitudes, longitudes))
+        codes, row_wise = timed(
+            lambda: [geohash.encode(lat, lon) for lat, lon in zip(lat_list, lon_list)]
+        )
+        assert geohashes.tolist() == codes
+        report("geohash_encode", size, vectorized, row_wise)
+
+        decoded, vectorized = timed(lambda: geo.geohash_decode(geohashes))
+        coordinates, row_wise = timed(lambda: [geohash.decode(code) for code in codes])
+        assert list(zip(*(values.tolist() for values in decoded))) == coordinates
+        report("geohash_decode", size, vectorized, row_wise)
+
+        # GPS coordinates usually have 6 decimals, about 10cm
+        points = [f"{lat:.6f}, {lon:.6f}" for lat, lon in zip(lat_list, lon_list)]
+        parsed, vectorized = timed(lambda: geo.parse_points(points))
+        sample: List[str] = points[:MAX_POINT_SAMPLE]
+        points_parsed, row_wise = timed(
+            lambda: [tuple(Point(point)) for point in sample]
+        )
+        assert list(zip(*(values.tolist() for values in parsed)))[
+            :MAX_POINT_SAMPLE
+        ] == (points_parsed)
+        report("parse_points", size, vectorized, row_wise * size / len(sample))
+
+
+if __name__ == "__main__":
+    main()  # pylint: disable=no-value-for-parameter
@@ -0,0 +1,100 @@
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+"""
+Benchmark the NVD3 series encoding of the time series charts against the former
+point by point loop, checking that both serialize to the same JSON.
+
+    python scripts/benchmark_nvd3_series.py --series 10,100,500 --timestamps 2000
+"""
+import time
+from typing import Any, Callable, Dict, List, Tuple
+
+import click
+import numpy as np
+import pandas as pd
+import simplejson as json
+
+from superset.utils.core import json_int_dttm_ser
+from superset.viz import NVD3Viz
+
+
+def timed(func: Callable[[], Any]) -> Tuple[Any, float]:
+    start = time.perf_counter()
+    result = func()
+    return result, time.perf_counter() - start
+
+
+def to_series_loop(df: pd.DataFrame) -> List[Dict[str, Any]]:
+    series = df.to_dict("series")
+    chart_data = []
+    for name in df.T.index.tolist():
+        ys = series[name]
+        values = []
+        non_nan_cnt = 0
+        for ds in df.index:
+            if ds in ys:
+                d = {"x": ds, "y": ys[ds]}
+                if not np.isnan(ys[ds]):
+                    non_nan_cnt += 1
+            else:
+                d = {}
+            values.append(d)
+        if non_nan_cnt:
+            chart_data.append({"key": name, "values": values})
+    return chart_data
+
+
+def to_series_vectorized(df: pd.DataFrame) -> List[Dict[str, Any]]:
+    x_values = df.index.tolist()
+    return [
+        {"key": name, "values": NVD3Viz.series_values(x_values, ys)}
+        for name, ys in df.items()
+        if ys.notna().any()
+    ]
+
+
+def dumps(chart_data: List[Dict[str, Any]]) -> str:
+    return json.dumps(chart_data, default=json_int_dttm_ser, ignore_nan=True)
+
+
+@click.command()
+@click.option(
+    "--series", default="10,100,500", help="Comma separated numbers of series"
+)
+@click.option("--timestamps", default=2000, help="Number of timestamps per series")
+@click.option("--seed", default=0, help="Seed of the random values")
+def main(series: str, timestamps: int, seed: int) -> None:
+    rng = np.random.default_rng(seed)
+    index = pd.date_range("2020-01-01", periods=timestamps, freq="H")
+    print(f"{'series':>8}{'points':>10}{'vectorized':>13}{'loop':>13}{'':>10}")
+    for count in [int(count) for count in series.split(",")]:
+        df = pd.DataFrame(rng.random((timestamps, count)), index=index)
+        # sparse and empty series
+        df.iloc[::3, ::2] = np.nan
+        df.iloc[:, ::7] = np.nan
+
+        vectorized_data, vectorized = timed(lambda: to_series_vectorized(df))
+        loop_data, loop = timed(lambda: to_series_loop(df))
+        assert dumps(vectorized_data) == dumps(loop_data)
+        print(
+            f"{count:>8}{count * timestamps:>10}{vectorized:>12.3f}s{loop:>12.3f}s"
+            f"{loop / vectorized:>9.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()  # pylint: disable=no-value-for-parameter
@@ -19,6 +19,7 @@
 /* eslint no-undef: 'error' */
 /* eslint no-param-reassign: ["error", { "props": false }] */
 import moment from 'moment';
+import shortid from 'shortid';
 import { t } from '@superset-ui/translation';
 import { SupersetClient } from '@superset-ui/connection';
 import { isFeatureEnabled, FeatureFlag } from '../featureFlags';
@@ -42,6 +43,50 @@ import { Logger, LOG_ACTIONS_LOAD_CHART } from '../logger/LogUtils';
 import getClientErrorObject from '../utils/getClientErrorObject';
 import { allowCrossDomain as allowDomainSharding } from '../utils/hostNamesConfig';
 
+const CHART_DATA_CANCEL_ENDPOINT = '/api/v1/chart/data/cancel';
+// ids of the chart data requests the server may still be running queries for
+const pendingRequestIds = new Set();
+
+export function cancelChartQueries(requestIds) {
+  if (requestIds.length === 0) {
+    return;
+  }
+  const body = JSON.stringify({ request_ids: requestIds });
+  if (navigator.sendBeacon) {
+    // the beacon survives the unload of the page
+    navigator.sendBeacon(
+      CHART_DATA_CANCEL_ENDPOINT,
+      new Blob([body], { type: 'text/plain' }),
+    );
+  } else {
+    SupersetClient.post({
+      endpoint: CHART_DATA_CANCEL_ENDPOINT,
+      headers: { 'Content-Type': 'application/json' },
+      body,
+    }).catch(() => {});
+  }
+}
+
+if (typeof window !== 'undefined') {
+  window.addEventListener('pagehide', () => {
+    cancelChartQueries([...pendingRequestIds]);
+    pendingRequestIds.clear();
+  });
+}
+
+// The dashboard id is added to query params for tracking purposes, the request
+// id to cancel the queries of the request
+const getChartDataQueryParams = requestParams => {
+  const params = {};
+  if (requestParams.dashboard_id) {
+    params.dashboard_id = requestParams.dashboard_id;
+  }
+  if (requestParams.request_id) {
+    params.request_id = requestParams.request_id;
+  }
+  return params;
+};
+
 export const CHART_UPDATE_STARTED = 'CHART_UPDATE_STARTED';
 export function chartUpdateStarted(queryController, latestQueryFormData, key) {
   return {
@@ -112,9 +157,7 @@ const legacyChartDataRequest = async (
     force,
     allowDomainSharding,
     method,
-    requestParams: requestParams.dashboard_id
-      ? { dashboard_id: requestParams.dashboard_id }
-      : {},
+    requestParams: getChartDataQueryParams(requestParams),
   });
   const querySettings = {
     ...requestParams,
@@ -149,13 +192,9 @@ const v1ChartDataRequest = async (
     force,
   });
 
-  // The dashboard id is added to query params for tracking purposes
-  const qs = requestParams.dashboard_id
-    ? { dashboard_id: requestParams.dashboard_id }
-    : {};
   const url = getChartDataUri({
     path: '/api/v1/chart/data',
-    qs,
+    qs: getChartDataQueryParams(requestParams),
     allowDomainSharding,
   }).toString();
 
@@ -326,12 +365,15 @@ export function exploreJSON(
   return async dispatch => {
     const logStart = Logger.getTimestamp();
     const controller = new AbortController();
+    const requestId = shortid.generate();
 
     const requestParams = {
       signal: controller.signal,
       timeout: timeout * 1000,
+      request_id: requestId,
     };
     if (dashboardId) requestParams.dashboard_id = dashboardId;
+    pendingRequestIds.add(requestId);
 
     const chartDataRequest = getChartDataRequest({
       formData,
@@ -387,18 +429,22 @@ export function exploreJSON(
           );
         };
         if (response.name === 'AbortError') {
+          // the server doesn't notice the abort, the queries have to be cancelled
+          cancelChartQueries([requestId]);
           appendErrorLog('abort');
           return dispatch(chartUpdateStopped(key));
         }
         return getClientErrorObject(response).then(parsedResponse => {
           if (response.statusText === 'timeout') {
+            cancelChartQueries([requestId]);
             appendErrorLog('timeout');
           } else {
             appendErrorLog(parsedResponse.error, parsedResponse.is_cached);
           }
           return dispatch(chartUpdateFailed(parsedResponse, key));
         });
-      });
+      })
+      .finally(() => pendingRequestIds.delete(requestId));
 
     const annotationLayers = formData.annotation_layers || [];
     const isDashboardRequest = dashboardId > 0;
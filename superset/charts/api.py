@@ -44,6 +44,7 @@ from superset.charts.commands.update import UpdateChartCommand
 from superset.charts.filters import ChartFilter, ChartNameOrDescriptionFilter
 from superset.charts.schemas import (
     CHART_SCHEMAS,
+    ChartDataCancelSchema,
     ChartDataQueryContextSchema,
     ChartPostSchema,
     ChartPutSchema,
@@ -57,7 +58,10 @@ from superset.exceptions import SupersetSecurityException
 from superset.extensions import event_logger
 from superset.models.slice import Slice
 from superset.tasks.thumbnails import cache_chart_thumbnail
+from superset.utils import timing
+from superset.utils.cancellation import query_cancellation
 from superset.utils.core import ChartDataResultFormat, json_int_dttm_ser
+from superset.utils.decorators import stats_timing
 from superset.utils.screenshots import ChartScreenshot
 from superset.utils.urls import get_url_path
 from superset.views.base_api import (
@@ -82,6 +86,7 @@ class ChartRestApi(BaseSupersetModelRestApi):
         RouteMethod.RELATED,
         "bulk_delete",  # not using RouteMethod since locally defined
         "data",
+        "cancel_data",
         "viz_types",
     }
     class_permission_name = "SliceModelView"
@@ -488,16 +493,69 @@ class ChartRestApi(BaseSupersetModelRestApi):
                 mimetype="application/csv",
             )
 
-        if result_format == ChartDataResultFormat.JSON:
-            response_data = simplejson.dumps(
-                {"result": payload}, default=json_int_dttm_ser, ignore_nan=True
-            )
+        if result_format in (
+            ChartDataResultFormat.JSON,
+            ChartDataResultFormat.COLUMNAR,
+        ):
+            with stats_timing(
+                "query_context.timing",
+                self.stats_logger,
+                {**query_context.stats_tags, "stage": timing.JSON_SERIALIZATION},
+            ):
+                response_data = simplejson.dumps(
+                    {"result": payload}, default=json_int_dttm_ser, ignore_nan=True
+                )
             resp = make_response(response_data, 200)
             resp.headers["Content-Type"] = "application/json; charset=utf-8"
             return resp
 
         return self.response_400(message=f"Unsupported result_format: {result_format}")
 
+    @expose("/data/cancel", methods=["POST"])
+    @protect()
+    @safe
+    @statsd_metrics
+    def cancel_data(self) -> Response:
+        """
+        Cancels the queries of chart data requests on their databases.
+        ---
+        post:
+          description: >-
+            Cancels the queries run by chart data requests of the current user,
+            e.g. when the client doesn't wait for their results anymore.
+          requestBody:
+            required: true
+            content:
+              application/json:
+                schema:
+                  $ref: "#/components/schemas/ChartDataCancelSchema"
+          responses:
+            200:
+              description: Cancellation requested
+              content:
+                application/json:
+                  schema:
+                    type: object
+                    properties:
+                      message:
+                        type: string
+            400:
+              $ref: '#/components/responses/400'
+            401:
+              $ref: '#/components/responses/401'
+            500:
+              $ref: '#/components/responses/500'
+        """
+        # navigator.sendBeacon() posts the payload as text/plain
+        try:
+            item = ChartDataCancelSchema().load(
+                request.get_json(force=True, silent=True) or {}
+            )
+        except ValidationError as error:
+            return self.response_400(message=error.messages)
+        query_cancellation.request_cancel(item["request_ids"], g.user.get_id())
+        return self.response(200, message="OK")
+
     @expose("/<pk>/cache_screenshot/", methods=["GET"])
     @protect()
     @rison(screenshot_query_schema)
@@ -681,6 +681,24 @@ class ChartDataExtrasSchema(Schema):
         description="HAVING clause to be added to aggregate queries using "
         "AND operator.",
     )
+    search = fields.String(
+        description="Case insensitive search term. Only the rows where one of the "
+        "string columns of `search_columns` contains the term are returned.",
+        allow_none=True,
+    )
+    search_columns = fields.List(
+        fields.String(),
+        description="Columns in which to search for the `search` term. "
+        "Default: the selected columns",
+    )
+    approximate = fields.Boolean(
+        description="Approximate the query if the dataset is in approximate mode: "
+        "the distinct counts are estimated and the table may be sampled.",
+    )
+    use_rollups = fields.Boolean(
+        description="Whether the query may be answered by a pre-aggregated rollup "
+        "of the dataset. Defaults to `true`.",
+    )
     having_druid = fields.List(
         fields.Nested(ChartDataFilterSchema),
         description="HAVING filters to be added to legacy Druid datasource queries.",
@@ -774,6 +792,12 @@ class ChartDataQueryObjectSchema(Schema):
             Range(min=0, error=_("`row_offset` must be greater than or equal to 0"))
         ],
     )
+    include_total_count = fields.Boolean(
+        description="Should the total number of rows matching the query, regardless "
+        "of `row_limit` and `row_offset`, be returned as `total_count`. Only "
+        "supported for queries without metrics. Default: `false`",
+        required=False,
+    )
     order_desc = fields.Boolean(
         description="Reverse order. Default: `false`", required=False
     )
@@ -827,7 +851,7 @@ class ChartDataQueryContextSchema(Schema):
     )
     result_format = fields.String(
         description="Format of result payload",
-        validate=validate.OneOf(choices=("json", "csv")),
+        validate=validate.OneOf(choices=("json", "csv", "columnar")),
     )
 
     # pylint: disable=no-self-use,unused-argument
@@ -880,7 +904,32 @@ class ChartDataResponseResult(Schema):
     rowcount = fields.Integer(
         description="Amount of rows in result set", allow_none=False,
     )
-    data = fields.List(fields.Dict(), description="A list with results")
+    total_count = fields.Integer(
+        description="Total amount of rows matching the query, when requested with "
+        "`include_total_count`",
+        allow_none=True,
+    )
+    is_approximate = fields.Boolean(
+        description="Whether the result was approximated, see the `approximate` "
+        "extra. The costliest queries on datasets in approximate mode are always "
+        "approximated.",
+    )
+    rollup = fields.String(
+        description="The name of the pre-aggregated rollup of the dataset which "
+        "answered the query, if any",
+        allow_none=True,
+    )
+    data = fields.Raw(
+        description="A list with results, or with the `columnar` result format, an "
+        "object with the `colnames` and `coltypes` of the columns, and `columns`, "
+        "the list of values of each column",
+    )
+    timings = fields.Dict(
+        keys=fields.String(),
+        values=fields.Float(),
+        description="Time spent in milliseconds in each stage of the query, "
+        "only returned when the `QUERY_TIMINGS` feature flag is enabled",
+    )
 
 
 class ChartDataResponseSchema(Schema):
@@ -890,9 +939,19 @@ class ChartDataResponseSchema(Schema):
     )
 
 
+class ChartDataCancelSchema(Schema):
+    request_ids = fields.List(
+        fields.String(),
+        description="The ids of the chart data requests whose queries are to be "
+        "cancelled, as sent in the `request_id` argument of the requests.",
+        required=True,
+    )
+
+
 CHART_SCHEMAS = (
     ChartDataQueryContextSchema,
     ChartDataResponseSchema,
+    ChartDataCancelSchema,
     # TODO: These should optimally be included in the QueryContext schema as an `anyOf`
     #  in ChartDataPostPricessingOperation.options, but since `anyOf` is not
     #  by Marshmallow<3, this is not currently possible.
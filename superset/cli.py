@@ -23,7 +23,6 @@ from typing import Any, Dict, Type, Union
 
 import click
 import yaml
-from celery.utils.abstract import CallableTask
 from colorama import Fore, Style
 from flask import g
 from flask.cli import FlaskGroup, with_appcontext
@@ -211,6 +210,45 @@ def refresh_druid(datasource: str, merge: bool) -> None:
     session.commit()
 
 
+@superset.command()
+@with_appcontext
+@click.option(
+    "--database_name",
+    "-d",
+    help="Specify which database to refresh, if omitted, the datasets of all "
+    "databases will be refreshed",
+)
+@click.option("--schema", "-s", help="Only refresh the datasets of this schema")
+@click.option(
+    "--workers",
+    "-w",
+    type=int,
+    default=None,
+    help="Number of schemas to reflect concurrently",
+)
+def refresh_datasets(database_name: str, schema: str, workers: int) -> None:
+    """Refresh the columns of physical datasets"""
+    from superset.connectors.sqla.models import SqlaTable
+    from superset.models.core import Database
+
+    query = db.session.query(SqlaTable).filter(SqlaTable.sql.is_(None))
+    if database_name:
+        query = query.join(Database).filter(Database.database_name == database_name)
+    if schema:
+        query = query.filter(SqlaTable.schema == schema)
+    datasets = query.all()
+
+    def report_progress(dataset: SqlaTable, processed: int, total: int) -> None:
+        click.secho(f'Refreshed dataset "{dataset}" ({processed}/{total})', fg="green")
+
+    results = SqlaTable.bulk_fetch_metadata(
+        datasets, workers=workers, progress_callback=report_progress
+    )
+    failed = len(datasets) - len(results)
+    if failed:
+        click.secho(f"Failed to refresh {failed} dataset(s)", fg="red")
+
+
 @superset.command()
 @with_appcontext
 @click.option(
@@ -490,55 +528,66 @@ def flower(port: int, address: str) -> None:
     help="Force refresh, even if previously cached",
 )
 @click.option("--model_id", "-i", multiple=True)
-def compute_thumbnails(
+@click.option(
+    "--batch_size",
+    "-b",
+    default=10,
+    help="Number of thumbnails computed in a row by each task",
+)
+def compute_thumbnails(  # pylint: disable=too-many-arguments
     asynchronous: bool,
     dashboards_only: bool,
     charts_only: bool,
     force: bool,
     model_id: int,
+    batch_size: int,
 ) -> None:
     """Compute thumbnails"""
     from superset.models.dashboard import Dashboard
     from superset.models.slice import Slice
-    from superset.tasks.thumbnails import (
-        cache_chart_thumbnail,
-        cache_dashboard_thumbnail,
-    )
+    from superset.tasks.thumbnails import get_recent_view_counts, schedule_thumbnails
 
     def compute_generic_thumbnail(
         friendly_type: str,
         model_cls: Union[Type[Dashboard], Type[Slice]],
         model_id: int,
-        compute_func: CallableTask,
     ) -> None:
         query = db.session.query(model_cls)
         if model_id:
             query = query.filter(model_cls.id.in_(model_id))
-        dashboards = query.all()
-        count = len(dashboards)
-        for i, model in enumerate(dashboards):
-            if asynchronous:
-                func = compute_func.delay
-                action = "Triggering"
-            else:
-                func = compute_func
-                action = "Processing"
-            msg = f'{action} {friendly_type} "{model}" ({i+1}/{count})'
-            click.secho(msg, fg="green")
+        models = query.all()
+        # Start with the most viewed charts and dashboards
+        view_counts = get_recent_view_counts(
+            "slice_id" if friendly_type == "chart" else "dashboard_id"
+        )
+        models.sort(key=lambda model: view_counts.get(model.id, 0), reverse=True)
+        thumbnails = []
+        for model in models:
             if friendly_type == "chart":
                 url = get_url_path(
                     "Superset.slice", slice_id=model.id, standalone="true"
                 )
             else:
                 url = get_url_path("Superset.dashboard", dashboard_id_or_slug=model.id)
-            func(url, model.digest, force=force)
+            thumbnails.append((url, model.digest))
+        count = schedule_thumbnails(
+            friendly_type,
+            thumbnails,
+            force=force,
+            asynchronous=asynchronous,
+            batch_size=batch_size,
+        )
+        action = "Triggered" if asynchronous else "Processed"
+        msg = (
+            f"{action} {count} {friendly_type} thumbnails, "
+            f"{len(thumbnails) - count} already cached or in progress"
+        )
+        click.secho(msg, fg="green")
 
     if not charts_only:
-        compute_generic_thumbnail(
-            "dashboard", Dashboard, model_id, cache_dashboard_thumbnail
-        )
+        compute_generic_thumbnail("dashboard", Dashboard, model_id)
     if not dashboards_only:
-        compute_generic_thumbnail("chart", Slice, model_id, cache_chart_thumbnail)
+        compute_generic_thumbnail("chart", Slice, model_id)
 
 
 @superset.command()
@@ -0,0 +1,227 @@
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+"""
+Execution plan of the post processing operations of a query object.
+
+The operations are validated before any of them runs, and consecutive operations
+that can share work are fused into a single step:
+
+- runs of `cum`, `diff` and `rolling` operations are computed on the source
+  columns and appended to the DataFrame at once, instead of copying the whole
+  DataFrame after each of them;
+- a `sort` followed by a `select` only reorders the selected columns.
+
+Each step is timed in the active timing trace as `post_processing.<operations>`.
+"""
+import inspect
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+from flask_babel import gettext as _
+from pandas import DataFrame
+
+from superset.exceptions import QueryObjectValidationError
+from superset.utils import pandas_postprocessing, timing
+from superset.utils.timing import trace_stage
+
+ALLOWLIST_OPERATIONS = (
+    "aggregate",
+    "contribution",
+    "cum",
+    "diff",
+    "geodetic_parse",
+    "geohash_decode",
+    "geohash_encode",
+    "pivot",
+    "prophet",
+    "rolling",
+    "select",
+    "sort",
+)
+
+# operations appending columns computed from other columns, row by row
+COLUMN_OPERATIONS = ("cum", "diff", "rolling")
+
+
+class PostProcessingOperation:  # pylint: disable=too-few-public-methods
+    """A validated post processing operation"""
+
+    def __init__(self, operation: str, options: Dict[str, Any]) -> None:
+        self.operation = operation
+        self.options = options
+        self.func: Callable[..., DataFrame] = getattr(pandas_postprocessing, operation)
+
+    def __call__(self, df: DataFrame) -> DataFrame:
+        return self.func(df, **self.options)
+
+    @property
+    def columns(self) -> Dict[str, str]:
+        return self.options.get("columns") or {}
+
+    @property
+    def is_column_operation(self) -> bool:
+        # rolling with `min_periods` also drops the first rows
+        return self.operation in COLUMN_OPERATIONS and not (
+            self.operation == "rolling" and self.options.get("min_periods")
+        )
+
+    def compute_columns(self, df: DataFrame) -> DataFrame:
+        """Computes the columns of a column operation, without appending them"""
+        source_df = df[self.columns.keys()]
+        options = {
+            name: value for name, value in self.options.items() if name != "columns"
+        }
+        if self.operation == "cum":
+            return pandas_postprocessing.cum_frame(source_df, **options)
+        if self.operation == "diff":
+            return pandas_postprocessing.diff_frame(source_df, **options)
+        return pandas_postprocessing.rolling_frame(source_df, **options)
+
+
+class PostProcessingStep:
+    """One or more operations executed together"""
+
+    def __init__(self, operations: List[PostProcessingOperation]) -> None:
+        self.operations = operations
+
+    @property
+    def name(self) -> str:
+        return "+".join(
+            dict.fromkeys(operation.operation for operation in self.operations)
+        )
+
+    def execute(self, df: DataFrame) -> DataFrame:
+        if len(self.operations) == 1 or not df.columns.is_unique:
+            for operation in self.operations:
+                df = operation(df)
+            return df
+        if self.operations[0].operation == "sort":
+            return self._sort_select(df)
+        return self._append_columns(df)
+
+    def _append_columns(self, df: DataFrame) -> DataFrame:
+        columns = df.columns.tolist()
+        appended: Dict[str, Any] = {}
+        for operation in self.operations:
+            if not all(column in columns for column in operation.columns):
+                raise QueryObjectValidationError(
+                    _("Referenced columns not available in DataFrame.")
+                )
+            computed = operation.compute_columns(df)
+            for source, target in operation.columns.items():
+                appended[target] = computed[source]
+        return df.assign(**appended)
+
+    def _sort_select(self, df: DataFrame) -> DataFrame:
+        sort, select = self.operations
+        if not all(column in df.columns for column in sort.columns):
+            # let the operations raise the usual validation errors
+            return select(sort(df))
+        # sort the keys only, then reorder the (usually fewer) selected columns
+        keys = df[list(sort.columns.keys())].reset_index(drop=True)
+        order = sort(keys).index
+        return select(df).take(order)
+
+
+class PostProcessingPlan:  # pylint: disable=too-few-public-methods
+    """
+    Validates the post processing operations of a query object and groups them in
+    steps.
+
+    :param post_processing: the post processing objects of the query object
+    :raises QueryObjectValidationError: If a post processing operation is incorrect
+    """
+
+    def __init__(self, post_processing: Sequence[Optional[Dict[str, Any]]]) -> None:
+        operations = [
+            self._validate(post_process)
+            for post_process in post_processing
+            if post_process
+        ]
+        self.steps: List[PostProcessingStep] = []
+        for operation in operations:
+            previous = self.steps[-1].operations if self.steps else []
+            if self._can_fuse(previous, operation):
+                previous.append(operation)
+            else:
+                self.steps.append(PostProcessingStep([operation]))
+
+    @staticmethod
+    def _validate(post_process: Dict[str, Any]) -> PostProcessingOperation:
+        operation = post_process.get("operation")
+        if not operation:
+            raise QueryObjectValidationError(
+                _("`operation` property of post processing object undefined")
+            )
+        if operation not in ALLOWLIST_OPERATIONS:
+            raise QueryObjectValidationError(
+                _(
+                    "Unsupported post processing operation: %(operation)s",
+                    operation=operation,
+                )
+            )
+        options = post_process.get("options") or {}
+        if not isinstance(options, dict):
+            raise QueryObjectValidationError(
+                _(
+                    "Invalid options for post processing operation %(operation)s",
+                    operation=operation,
+                )
+            )
+        post_processing_operation = PostProcessingOperation(operation, options)
+        try:
+            inspect.signature(post_processing_operation.func).bind(None, **options)
+        except TypeError as ex:
+            raise QueryObjectValidationError(
+                _(
+                    "Invalid options for post processing operation "
+                    "%(operation)s: %(error)s",
+                    operation=operation,
+                    error=str(ex),
+                )
+            )
+        return post_processing_operation
+
+    @staticmethod
+    def _can_fuse(
+        previous: List[PostProcessingOperation], operation: PostProcessingOperation
+    ) -> bool:
+        if not previous:
+            return False
+        if previous[-1].operation == "sort" and len(previous) == 1:
+            return operation.operation == "select"
+        if not operation.is_column_operation or not all(
+            prior.is_column_operation for prior in previous
+        ):
+            return False
+        # the sources must not depend on a column appended in the same step
+        targets = {target for prior in previous for target in prior.columns.values()}
+        return not targets.intersection(operation.columns.keys())
+
+    def execute(self, df: DataFrame) -> DataFrame:
+        """
+        Applies the post processing operations to a DataFrame.
+
+        :param df: DataFrame returned from database model.
+        :return: new DataFrame to which all post processing operations have been
+                 applied
+        :raises QueryObjectValidationError: If a post processing operation is
+                incorrect
+        """
+        for step in self.steps:
+            with trace_stage(f"{timing.POST_PROCESSING}.{step.name}"):
+                df = step.execute(df)
+        return df
@@ -24,19 +24,28 @@ import numpy as np
 import pandas as pd
 from flask_babel import gettext as _
 
-from superset import app, cache, db, security_manager
+from superset import app, cache, db, is_feature_enabled, security_manager
 from superset.common.query_object import QueryObject
 from superset.connectors.base.models import BaseDatasource
 from superset.connectors.connector_registry import ConnectorRegistry
+from superset.dataframe import df_to_columns, df_to_records, sanitize_df
 from superset.exceptions import QueryObjectValidationError
 from superset.stats_logger import BaseStatsLogger
-from superset.utils import core as utils
+from superset.utils import core as utils, timing
 from superset.utils.core import DTTM_ALIAS
+from superset.utils.decorators import stats_timing
+from superset.utils.timing import timing_trace, trace_stage
 
 config = app.config
 stats_logger: BaseStatsLogger = config["STATS_LOGGER"]
 logger = logging.getLogger(__name__)
 
+TOTAL_COUNT_METRIC = {
+    "expressionType": "SQL",
+    "sqlExpression": "COUNT(*)",
+    "label": "total_count",
+}
+
 
 class QueryContext:
     """
@@ -112,14 +121,17 @@ class QueryContext:
             if self.enforce_numerical_metrics:
                 self.df_metrics_to_num(df, query_object)
 
-            df.replace([np.inf, -np.inf], np.nan)
-            df = query_object.exec_post_processing(df)
+            df = sanitize_df(df)
+            with trace_stage(timing.POST_PROCESSING):
+                df = query_object.exec_post_processing(df)
 
         return {
             "query": result.query,
             "status": result.status,
             "error_message": result.error_message,
             "df": df,
+            "is_approximate": result.is_approximate,
+            "rollup": result.rollup,
         }
 
     @staticmethod
@@ -131,15 +143,17 @@ class QueryContext:
             if dtype.type == np.object_ and col in query_object.metrics:
                 df[col] = pd.to_numeric(df[col], errors="coerce")
 
-    def get_data(
+    def get_data(  # pylint: disable=no-self-use
         self, df: pd.DataFrame,
-    ) -> Union[str, List[Dict[str, Any]]]:  # pylint: disable=no-self-use
+    ) -> Union[str, List[Dict[str, Any]], Dict[str, Any]]:
         if self.result_format == utils.ChartDataResultFormat.CSV:
             include_index = not isinstance(df.index, pd.RangeIndex)
             result = df.to_csv(index=include_index, **config["CSV_EXPORT"])
             return result or ""
+        if self.result_format == utils.ChartDataResultFormat.COLUMNAR:
+            return df_to_columns(df)
 
-        return df.to_dict(orient="records")
+        return df_to_records(df)
 
     def get_single_payload(self, query_obj: QueryObject) -> Dict[str, Any]:
         """Returns a payload of metadata and data"""
@@ -157,16 +171,57 @@ class QueryContext:
             query_obj.row_limit = min(row_limit, config["SAMPLES_ROW_LIMIT"])
             query_obj.row_offset = 0
             query_obj.columns = [o.column_name for o in self.datasource.columns]
-        payload = self.get_df_payload(query_obj)
-        df = payload["df"]
-        status = payload["status"]
-        if status != utils.QueryStatus.FAILED:
-            payload["data"] = self.get_data(df)
+        with timing_trace() as trace:
+            payload = self.get_df_payload(query_obj)
+            df = payload["df"]
+            status = payload["status"]
+            if status != utils.QueryStatus.FAILED:
+                with trace.stage(timing.POST_PROCESSING):
+                    payload["data"] = self.get_data(df)
+                if query_obj.include_total_count:
+                    payload["total_count"] = self.get_total_count(query_obj)
         del payload["df"]
+        timings = trace.to_dict()
+        timing.report_timings(timings, "query_context.timing", self.stats_tags)
         if self.result_type == utils.ChartDataResultType.RESULTS:
             return {"data": payload["data"]}
+        if is_feature_enabled("QUERY_TIMINGS"):
+            payload["timings"] = timings
         return payload
 
+    def get_total_count(self, query_obj: QueryObject) -> Optional[int]:
+        """
+        Returns the total number of rows matching a query without metrics,
+        regardless of its row limit and offset. The count query is the same for
+        all the pages of the query, so that its result is cached once for all of
+        them.
+
+        :param query_obj: the paginated query object
+        :return: the number of rows, `None` for aggregate queries or if the count
+                 query failed
+        """
+        if query_obj.metrics or query_obj.groupby:
+            return None
+        count_query_obj = copy.copy(query_obj)
+        count_query_obj.is_timeseries = False
+        # search the columns of the pages
+        count_query_obj.extras = {
+            "search_columns": query_obj.columns,
+            **query_obj.extras,
+        }
+        count_query_obj.columns = []
+        count_query_obj.metrics = [TOTAL_COUNT_METRIC]
+        count_query_obj.orderby = []
+        count_query_obj.post_processing = []
+        count_query_obj.row_limit = 1
+        count_query_obj.row_offset = 0
+        count_query_obj.include_total_count = False
+        payload = self.get_df_payload(count_query_obj)
+        df = payload["df"]
+        if payload["status"] == utils.QueryStatus.FAILED or df.empty:
+            return None
+        return int(df.iloc[0, 0])
+
     def get_payload(self) -> List[Dict[str, Any]]:
         """Get all the payloads from the QueryObjects"""
         return [self.get_single_payload(query_object) for query_object in self.queries]
@@ -203,6 +258,14 @@ class QueryContext:
         )
         return cache_key
 
+    @property
+    def stats_tags(self) -> Dict[str, str]:
+        """Tags of the metrics sent to the stats logger"""
+        return {
+            "datasource_type": self.datasource.type,
+            "database": self.datasource.connection or "",
+        }
+
     def get_df_payload(  # pylint: disable=too-many-locals,too-many-statements
         self, query_obj: QueryObject, **kwargs: Any
     ) -> Dict[str, Any]:
@@ -217,16 +280,21 @@ class QueryContext:
         status = None
         query = ""
         error_message = None
+        is_approximate = False
+        rollup = None
         if cache_key and cache and not self.force:
-            cache_value = cache.get(cache_key)
+            with trace_stage(timing.CACHE_LOOKUP):
+                cache_value = cache.get(cache_key)
             if cache_value:
-                stats_logger.incr("loading_from_cache")
+                stats_logger.incr_with_tags("loading_from_cache", self.stats_tags)
                 try:
                     df = cache_value["df"]
                     query = cache_value["query"]
+                    is_approximate = cache_value.get("is_approximate", False)
+                    rollup = cache_value.get("rollup")
                     status = utils.QueryStatus.SUCCESS
                     is_loaded = True
-                    stats_logger.incr("loaded_from_cache")
+                    stats_logger.incr_with_tags("loaded_from_cache", self.stats_tags)
                 except Exception as ex:  # pylint: disable=broad-except
                     logger.exception(ex)
                     logger.error(
@@ -251,15 +319,22 @@ class QueryContext:
                             invalid_columns=invalid_columns,
                         )
                     )
-                query_result = self.get_query_result(query_obj)
+                with stats_timing(
+                    "query_context.load_from_source", stats_logger, self.stats_tags
+                ):
+                    query_result = self.get_query_result(query_obj)
                 status = query_result["status"]
                 query = query_result["query"]
                 error_message = query_result["error_message"]
                 df = query_result["df"]
+                is_approximate = query_result["is_approximate"]
+                rollup = query_result["rollup"]
                 if status != utils.QueryStatus.FAILED:
-                    stats_logger.incr("loaded_from_source")
+                    stats_logger.incr_with_tags("loaded_from_source", self.stats_tags)
                     if not self.force:
-                        stats_logger.incr("loaded_from_source_without_force")
+                        stats_logger.incr_with_tags(
+                            "loaded_from_source_without_force", self.stats_tags
+                        )
                     is_loaded = True
             except QueryObjectValidationError as ex:
                 error_message = str(ex)
@@ -273,8 +348,14 @@ class QueryContext:
 
             if is_loaded and cache_key and cache and status != utils.QueryStatus.FAILED:
                 try:
-                    cache_value = dict(dttm=cached_dttm, df=df, query=query)
-                    stats_logger.incr("set_cache_key")
+                    cache_value = dict(
+                        dttm=cached_dttm,
+                        df=df,
+                        query=query,
+                        is_approximate=is_approximate,
+                        rollup=rollup,
+                    )
+                    stats_logger.incr_with_tags("set_cache_key", self.stats_tags)
                     cache.set(cache_key, cache_value, timeout=self.cache_timeout)
                 except Exception as ex:  # pylint: disable=broad-except
                     # cache.set call can fail if the backend is down or if
@@ -289,7 +370,9 @@ class QueryContext:
             "df": df,
             "error": error_message,
             "is_cached": cache_key is not None,
+            "is_approximate": is_approximate,
             "query": query,
+            "rollup": rollup,
             "status": status,
             "stacktrace": stacktrace,
             "rowcount": len(df.index),
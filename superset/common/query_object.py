@@ -21,13 +21,12 @@ from datetime import datetime, timedelta
 from typing import Any, Dict, List, NamedTuple, Optional, Union
 
 import simplejson as json
-from flask_babel import gettext as _
 from pandas import DataFrame
 
 from superset import app, is_feature_enabled
-from superset.exceptions import QueryObjectValidationError
+from superset.common.post_processing import PostProcessingPlan
 from superset.typing import Metric
-from superset.utils import core as utils, pandas_postprocessing
+from superset.utils import core as utils
 from superset.views.utils import get_time_range_endpoints
 
 config = app.config
@@ -68,6 +67,7 @@ class QueryObject:
     metrics: List[Union[Dict[str, Any], str]]
     row_limit: int
     row_offset: int
+    include_total_count: bool
     filter: List[Dict[str, Any]]
     timeseries_limit: int
     timeseries_limit_metric: Optional[Metric]
@@ -89,6 +89,7 @@ class QueryObject:
         timeseries_limit: int = 0,
         row_limit: Optional[int] = None,
         row_offset: Optional[int] = None,
+        include_total_count: bool = False,
         timeseries_limit_metric: Optional[Metric] = None,
         order_desc: bool = True,
         extras: Optional[Dict[str, Any]] = None,
@@ -130,6 +131,7 @@ class QueryObject:
 
         self.row_limit = row_limit or config["ROW_LIMIT"]
         self.row_offset = row_offset or 0
+        self.include_total_count = include_total_count
         self.filter = filters or []
         self.timeseries_limit = timeseries_limit
         self.timeseries_limit_metric = timeseries_limit_metric
@@ -245,19 +247,4 @@ class QueryObject:
                  applied
         :raises ChartDataValidationError: If the post processing operation in incorrect
         """
-        for post_process in self.post_processing:
-            operation = post_process.get("operation")
-            if not operation:
-                raise QueryObjectValidationError(
-                    _("`operation` property of post processing object undefined")
-                )
-            if not hasattr(pandas_postprocessing, operation):
-                raise QueryObjectValidationError(
-                    _(
-                        "Unsupported post processing operation: %(operation)s",
-                        type=operation,
-                    )
-                )
-            options = post_process.get("options", {})
-            df = getattr(pandas_postprocessing, operation)(df, **options)
-        return df
+        return PostProcessingPlan(self.post_processing).execute(df)
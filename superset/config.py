@@ -52,9 +52,21 @@ if TYPE_CHECKING:
 
     from superset.models.core import Database  # pylint: disable=unused-import
 
-# Realtime stats logger, a StatsD implementation exists
+# Realtime stats logger, a StatsD implementation exists. The PrometheusStatsLogger
+# aggregates the metrics in process and serves them on the /metrics endpoint:
+# from superset.stats_logger import PrometheusStatsLogger
+# STATS_LOGGER = PrometheusStatsLogger()
 STATS_LOGGER = DummyStatsLogger()
+# The /metrics endpoint is disabled unless enabled here. Its metrics are labelled
+# with database names, so when a token is set the scraper has to send it in an
+# "Authorization: Bearer <token>" header.
+METRICS_ENDPOINT_ENABLED = False
+METRICS_ENDPOINT_TOKEN: Optional[str] = None
 EVENT_LOGGER = DBEventLogger()
+# To keep the metadata database writes out of the request path, the events can be
+# buffered in memory and written in batches from a background thread:
+# from superset.utils.log import BufferedDBEventLogger
+# EVENT_LOGGER = BufferedDBEventLogger(batch_size=100, flush_interval=5)
 
 SUPERSET_LOG_VIEW = True
 
@@ -119,6 +131,19 @@ VIZ_ROW_LIMIT = 10000
 SAMPLES_ROW_LIMIT = 1000
 # max rows retrieved by filter select auto complete
 FILTER_SELECT_ROW_LIMIT = 10000
+# The time comparisons of the time series charts are fetched with a single query
+# over the union of the shifted time ranges, when it spans at most this ratio of
+# the summed spans of the separate queries. Set to 0 to always run one query per
+# time shift.
+TIME_COMPARE_UNION_MAX_RATIO = 1.0
+# The queries on the datasets in approximate mode (`"approximate_mode": true` in
+# their `params`) are run approximately when a value of their cost estimate exceeds
+# its threshold here, e.g. {"cpuCost": 1e12} on Presto, even if the user did not
+# ask for approximate results. Only the engines supporting cost estimation apply.
+APPROXIMATE_QUERY_COST_THRESHOLDS: Dict[str, float] = {}
+# Time in seconds the outcome of the cost estimate of a query is cached, so that
+# the same query isn't estimated every time it runs
+APPROXIMATE_QUERY_COST_CACHE_TIMEOUT = 60 * 60 * 24
 SUPERSET_WORKERS = 2  # deprecated
 SUPERSET_CELERY_WORKERS = 32  # deprecated
 
@@ -172,7 +197,11 @@ QUERY_SEARCH_LIMIT = 1000
 WTF_CSRF_ENABLED = True
 
 # Add endpoints that need to be exempt from CSRF protection
-WTF_CSRF_EXEMPT_LIST = ["superset.views.core.log", "superset.charts.api.data"]
+WTF_CSRF_EXEMPT_LIST = [
+    "superset.views.core.log",
+    "superset.charts.api.data",
+    "superset.charts.api.cancel_data",
+]
 
 # Whether to run the web server in debug mode or not
 DEBUG = os.environ.get("FLASK_ENV") == "development"
@@ -310,6 +339,9 @@ DEFAULT_FEATURE_FLAGS: Dict[str, bool] = {
     "TAGGING_SYSTEM": False,
     "SQLLAB_BACKEND_PERSISTENCE": False,
     "SIP_34_DATABASE_UI": False,
+    # Returns the time spent in each stage of the chart and SQL Lab queries in their
+    # payload, and logs it to the event logger
+    "QUERY_TIMINGS": False,
 }
 
 # This is merely a default.
@@ -529,7 +561,11 @@ class CeleryConfig:  # pylint: disable=too-few-public-methods
         "email_reports.schedule_hourly": {
             "task": "email_reports.schedule_hourly",
             "schedule": crontab(minute=1, hour="*"),
-        }
+        },
+        "rollups.refresh": {
+            "task": "rollups.refresh",
+            "schedule": crontab(minute=5, hour="*"),
+        },
     }
 
 
@@ -565,6 +601,27 @@ SQLLAB_DEFAULT_DBID = None
 # by celery.
 SQLLAB_ASYNC_TIME_LIMIT_SEC = 60 * 60 * 6
 
+# Concurrency limits of the queries run by SQL Lab and the charts on each database:
+# at most "database" queries run at the same time on a database, and at most "user"
+# queries of the same user, the other queries waiting for their turn. The limits are
+# enforced through the cache (CACHE_CONFIG), which must be shared by all the
+# Superset processes, e.g. Redis. They can be overridden per database with the
+# `concurrency_limits` of its extra. Empty to disable, e.g. {"database": 10,
+# "user": 3}
+QUERY_CONCURRENCY_LIMITS: Dict[str, int] = {}
+# When the slots of a database are contended, the waiting queries of each source
+# get a share of the slots proportional to its weight
+QUERY_CONCURRENCY_SOURCE_WEIGHTS: Dict[str, float] = {
+    "SQL_LAB": 1,
+    "CHART": 2,
+    "DASHBOARD": 2,
+}
+# Seconds after which the slot of a query is freed if not released, e.g. when the
+# process running it died. The lease is renewed while the query runs.
+QUERY_CONCURRENCY_LEASE_TIMEOUT = 60 * 5
+# Seconds a query waits for a slot before failing
+QUERY_ADMISSION_TIMEOUT = 300
+
 # Some databases support running EXPLAIN queries that allow users to estimate
 # query costs before they run. These EXPLAIN queries should have a small
 # timeout.
@@ -573,6 +630,12 @@ SQLLAB_QUERY_COST_ESTIMATE_TIMEOUT = 10  # seconds
 # Flag that controls if limit should be enforced on the CTA (create table as queries).
 SQLLAB_CTAS_NO_LIMIT = False
 
+# Number of rows fetched at a time by the asynchronous SQL Lab queries. Their
+# results are read from a server-side cursor when the database driver supports it
+# (psycopg2, mysqlclient, PyMySQL), so that the driver doesn't buffer the whole
+# result set of the query in the worker. Set to None to use a client-side cursor.
+SQLLAB_FETCH_BATCH_SIZE: Optional[int] = 10000
+
 # This allows you to define custom logic around the "CREATE TABLE AS" or CTAS feature
 # in SQL Lab that defines where the target schema should be for a given user.
 # Database `CTAS Schema` has a precedence over this setting.
@@ -758,6 +821,10 @@ ENABLE_SCHEDULED_EMAIL_REPORTS = False
 # if it meets the criteria
 ENABLE_ALERTS = False
 
+# Maximum number of rows fetched to evaluate an alert, as any truthy cell
+# triggers the alert
+ALERT_QUERY_ROW_LIMIT = 1000
+
 # Slack API token for the superset reports
 SLACK_API_TOKEN = None
 SLACK_PROXY = None
@@ -775,6 +842,16 @@ MACHINE_AUTH_PROVIDER_CLASS = "superset.utils.machine_auth.MachineAuthProvider"
 # Email reports - minimum time resolution (in minutes) for the crontab
 EMAIL_REPORTS_CRON_RESOLUTION = 15
 
+# Email reports - the reports due at the same time are spread over this many
+# seconds (at most the crontab resolution), to avoid querying all the charts
+# at once at the top of the hour
+EMAIL_REPORTS_SPREAD_WINDOW = 5 * 60
+
+# Dashboard email reports - the charts of the dashboard are queried this many
+# seconds before the report is due, so that the report is rendered from the
+# chart cache. 0 disables the warm up.
+EMAIL_REPORTS_PREWARM_LEAD_TIME = 10 * 60
+
 # The MAX duration (in seconds) a email schedule can run for before being killed
 # by celery.
 EMAIL_ASYNC_TIME_LIMIT_SEC = 300
@@ -830,6 +907,13 @@ WEBDRIVER_BASEURL_USER_FRIENDLY = WEBDRIVER_BASEURL
 # and render for the email report.
 EMAIL_PAGE_RENDER_WAIT = 30
 
+# Authenticated webdrivers are kept alive and reused across screenshots
+# (thumbnails, email reports, alerts) within a process. This is the maximum
+# number of idle webdrivers kept per user, 0 disables the pooling.
+WEBDRIVER_POOL_SIZE = 2
+# Webdrivers are restarted after this many screenshots, or when they fail
+WEBDRIVER_POOL_MAX_USAGE = 50
+
 # Send user to a link where they can report bugs
 BUG_REPORT_URL = None
 
@@ -16,10 +16,21 @@
 # under the License.
 import json
 import logging
-from collections import OrderedDict
+from collections import defaultdict, OrderedDict
 from dataclasses import dataclass, field
 from datetime import datetime, timedelta
-from typing import Any, Dict, Hashable, List, NamedTuple, Optional, Tuple, Union
+from multiprocessing.pool import ThreadPool
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Hashable,
+    List,
+    NamedTuple,
+    Optional,
+    Tuple,
+    Union,
+)
 
 import pandas as pd
 import sqlalchemy as sa
@@ -37,12 +48,14 @@ from sqlalchemy import (
     desc,
     ForeignKey,
     Integer,
+    MetaData,
     or_,
     select,
     String,
     Table,
     Text,
 )
+from sqlalchemy.engine import Engine
 from sqlalchemy.exc import CompileError, SQLAlchemyError
 from sqlalchemy.orm import backref, Query, relationship, RelationshipProperty, Session
 from sqlalchemy.orm.exc import NoResultFound
@@ -50,8 +63,9 @@ from sqlalchemy.schema import UniqueConstraint
 from sqlalchemy.sql import column, ColumnElement, literal_column, table, text
 from sqlalchemy.sql.expression import Label, Select, TextAsFrom
 
-from superset import app, db, is_feature_enabled, security_manager
+from superset import app, cache, db, is_feature_enabled, security_manager
 from superset.connectors.base.models import BaseColumn, BaseDatasource, BaseMetric
+from superset.connectors.sqla.rollups import find_rollup
 from superset.constants import NULL_STRING
 from superset.db_engine_specs.base import TimestampExpression
 from superset.exceptions import DatabaseNotFound, QueryObjectValidationError
@@ -64,7 +78,9 @@ from superset.models.annotations import Annotation
 from superset.models.core import Database
 from superset.models.helpers import AuditMixinNullable, QueryResult
 from superset.typing import Metric, QueryObjectDict
-from superset.utils import core as utils, import_datasource
+from superset.utils import core as utils, import_datasource, timing
+from superset.utils.hashing import md5_sha_from_str
+from superset.utils.timing import trace_stage
 
 config = app.config
 metadata = Model.metadata  # pylint: disable=no-member
@@ -76,12 +92,16 @@ class SqlaQuery(NamedTuple):
     labels_expected: List[str]
     prequeries: List[str]
     sqla_query: Select
+    is_approximate: bool = False
+    rollup: Optional[str] = None
 
 
 class QueryStringExtended(NamedTuple):
     labels_expected: List[str]
     prequeries: List[str]
     sql: str
+    is_approximate: bool = False
+    rollup: Optional[str] = None
 
 
 @dataclass
@@ -91,6 +111,51 @@ class MetadataResult:
     modified: List[str] = field(default_factory=list)
 
 
+def _reflect_tables(
+    args: Tuple[
+        Tuple[int, Optional[str]], Engine, Dict[str, Any], Optional[str], List[str]
+    ]
+) -> Tuple[Tuple[int, Optional[str]], Dict[str, Table]]:
+    """
+    Reflects several tables of the same schema in a single pass. Tables that
+    can't be reflected are missing from the returned mapping.
+    """
+    key, engine, metadata_params, schema, table_names = args
+    names = set(table_names)
+    meta = MetaData(**metadata_params)
+    try:
+        meta.reflect(
+            bind=engine,
+            schema=schema or None,
+            views=True,
+            only=lambda name, _: name in names,
+        )
+    except SQLAlchemyError as ex:
+        logger.error("Error reflecting tables of schema %s", schema)
+        logger.exception(ex)
+        # fall back to reflecting the tables one at a time
+        meta = MetaData(**metadata_params)
+        for table_name in names:
+            try:
+                Table(
+                    table_name,
+                    meta,
+                    schema=schema or None,
+                    autoload=True,
+                    autoload_with=engine,
+                )
+            except SQLAlchemyError:
+                logger.error("Error reflecting table %s", table_name)
+    return (
+        key,
+        {
+            tbl.name: tbl
+            for tbl in meta.tables.values()
+            if tbl.name in names and tbl.schema == (schema or None)
+        },
+    )
+
+
 class AnnotationDatasource(BaseDatasource):
     """ Dummy object so we can query annotations using 'Viz' objects just like
         regular datasources.
@@ -370,9 +435,15 @@ class SqlMetric(Model, BaseMetric):
     )
     export_parent = "table"
 
-    def get_sqla_col(self, label: Optional[str] = None) -> Column:
+    def get_sqla_col(
+        self, label: Optional[str] = None, approximate: bool = False
+    ) -> Column:
         label = label or self.metric_name
-        sqla_col = literal_column(self.expression)
+        expression = self.expression
+        if approximate:
+            db_engine_spec = self.table.database.db_engine_spec
+            expression = db_engine_spec.get_approximate_expression(expression)
+        sqla_col = literal_column(expression)
         return self.table.make_sqla_column_compatible(sqla_col, label)
 
     @property
@@ -717,13 +788,99 @@ class SqlaTable(  # pylint: disable=too-many-public-methods,too-many-instance-at
 
     def get_query_str_extended(self, query_obj: QueryObjectDict) -> QueryStringExtended:
         sqlaq = self.get_sqla_query(**query_obj)
-        sql = self.database.compile_sqla_query(sqlaq.sqla_query)
-        logger.info(sql)
-        sql = sqlparse.format(sql, reindent=True)
-        sql = self.mutate_query_from_config(sql)
+        with trace_stage(timing.SQL_COMPILE):
+            sql = self.database.compile_sqla_query(sqlaq.sqla_query)
+        if (
+            self.approximate_mode
+            and not sqlaq.is_approximate
+            and self.is_above_cost_thresholds(sql)
+        ):
+            # too costly to be run exactly
+            sqlaq = self.get_sqla_query(**{**query_obj, "approximate": True})
+            with trace_stage(timing.SQL_COMPILE):
+                sql = self.database.compile_sqla_query(sqlaq.sqla_query)
+        with trace_stage(timing.SQL_COMPILE):
+            logger.info(sql)
+            sql = sqlparse.format(sql, reindent=True)
+            sql = self.mutate_query_from_config(sql)
         return QueryStringExtended(
-            labels_expected=sqlaq.labels_expected, sql=sql, prequeries=sqlaq.prequeries
+            labels_expected=sqlaq.labels_expected,
+            sql=sql,
+            prequeries=sqlaq.prequeries,
+            is_approximate=sqlaq.is_approximate,
+            rollup=sqlaq.rollup,
+        )
+
+    @property
+    def approximate_mode(self) -> bool:
+        """
+        Whether the queries on the dataset may be approximated, as set by
+        `"approximate_mode": true` in its params: the distinct counts are then
+        computed with the approximate function of the engine, and the table is
+        sampled when `"approximate_sample_percent"` is set, see `get_sqla_query`.
+        """
+        return bool(self.params_dict.get("approximate_mode"))
+
+    @property
+    def approximate_sample_percent(self) -> Optional[float]:
+        """
+        The percentage of the rows of the table sampled in approximate mode, as
+        set by `"approximate_sample_percent"` in the params of the dataset.
+        """
+        sample_percent = self.params_dict.get("approximate_sample_percent")
+        if sample_percent is None:
+            return None
+        try:
+            percent = float(sample_percent)
+        except (TypeError, ValueError):
+            percent = 0
+        if not 0 < percent <= 100:
+            logger.warning(
+                "Invalid approximate_sample_percent of %s: %s",
+                self.name,
+                sample_percent,
+            )
+            return None
+        return percent if percent < 100 else None
+
+    def is_above_cost_thresholds(self, sql: str) -> bool:
+        """
+        Whether a value of the cost estimate of a query exceeds its threshold in
+        `APPROXIMATE_QUERY_COST_THRESHOLDS`.
+
+        The outcome is cached for `APPROXIMATE_QUERY_COST_CACHE_TIMEOUT` seconds,
+        as the estimate is itself a query.
+
+        :param sql: The query
+        :returns: False if the cost of the query can't be estimated
+        """
+        thresholds = config["APPROXIMATE_QUERY_COST_THRESHOLDS"]
+        db_engine_spec = self.database.db_engine_spec
+        version = self.database.get_extra().get("version")
+        if not thresholds or not db_engine_spec.get_allow_cost_estimate(version):
+            return False
+        cache_key = md5_sha_from_str(f"{self.database.id}:{thresholds}:{sql}")
+        is_above = cache.get(cache_key) if cache else None
+        if is_above is not None:
+            return is_above
+        try:
+            costs = db_engine_spec.estimate_query_cost(self.database, self.schema, sql)
+        except Exception:  # pylint: disable=broad-except
+            logger.warning("Could not estimate the cost of %s", sql, exc_info=True)
+            return False
+        is_above = any(
+            value > thresholds[name]
+            for cost in costs
+            for name, value in db_engine_spec.get_cost_estimate_values(cost).items()
+            if name in thresholds
         )
+        if cache:
+            cache.set(
+                cache_key,
+                is_above,
+                timeout=config["APPROXIMATE_QUERY_COST_CACHE_TIMEOUT"],
+            )
+        return is_above
 
     def get_query_str(self, query_obj: QueryObjectDict) -> str:
         query_str_ext = self.get_query_str_extended(query_obj)
@@ -758,18 +915,23 @@ class SqlaTable(  # pylint: disable=too-many-public-methods,too-many-instance-at
         return self.get_sqla_table()
 
     def adhoc_metric_to_sqla(
-        self, metric: Dict[str, Any], columns_by_name: Dict[str, Any]
+        self,
+        metric: Dict[str, Any],
+        columns_by_name: Dict[str, Any],
+        approximate: bool = False,
     ) -> Optional[Column]:
         """
         Turn an adhoc metric into a sqlalchemy column.
 
         :param dict metric: Adhoc metric definition
         :param dict columns_by_name: Columns for the current table
+        :param bool approximate: Approximate the distinct counts, if supported
         :returns: The metric defined as a sqlalchemy column
         :rtype: sqlalchemy.sql.column
         """
         expression_type = metric.get("expressionType")
         label = utils.get_metric_name(metric)
+        db_engine_spec = self.database.db_engine_spec
 
         if expression_type == utils.AdhocMetricExpressionType.SIMPLE:
             column_name = metric["column"].get("column_name")
@@ -778,14 +940,45 @@ class SqlaTable(  # pylint: disable=too-many-public-methods,too-many-instance-at
                 sqla_column = table_column.get_sqla_col()
             else:
                 sqla_column = column(column_name)
-            sqla_metric = self.sqla_aggregations[metric["aggregate"]](sqla_column)
+            approx_function = db_engine_spec.approx_count_distinct_function
+            if (
+                approximate
+                and approx_function
+                and metric["aggregate"] == "COUNT_DISTINCT"
+            ):
+                sqla_metric = getattr(sa.func, approx_function)(sqla_column)
+            else:
+                sqla_metric = self.sqla_aggregations[metric["aggregate"]](sqla_column)
         elif expression_type == utils.AdhocMetricExpressionType.SQL:
-            sqla_metric = literal_column(metric.get("sqlExpression"))
+            expression = metric.get("sqlExpression")
+            if approximate and expression:
+                expression = db_engine_spec.get_approximate_expression(expression)
+            sqla_metric = literal_column(expression)
         else:
             return None
 
         return self.make_sqla_column_compatible(sqla_metric, label)
 
+    def get_search_filter(self, search: str, column_names: List[str]) -> ColumnElement:
+        """
+        Return the filter of the rows where one of the given string columns
+        contains the search term, case insensitively.
+
+        :param search: the search term
+        :param column_names: the names of the columns to search in, the columns
+        which aren't strings are ignored
+        :returns: the filter clause
+        """
+        columns_by_name = {col.column_name: col for col in self.columns}
+        conditions = [
+            sa.func.lower(col.get_sqla_col(), type_=String).contains(
+                search.lower(), autoescape=True
+            )
+            for col in (columns_by_name.get(name) for name in column_names)
+            if col is not None and col.is_string
+        ]
+        return or_(*conditions) if conditions else sa.false()
+
     def _get_sqla_row_level_filters(
         self, template_processor: BaseTemplateProcessor
     ) -> List[str]:
@@ -829,8 +1022,14 @@ class SqlaTable(  # pylint: disable=too-many-public-methods,too-many-instance-at
         orderby: Optional[List[Tuple[ColumnElement, bool]]] = None,
         extras: Optional[Dict[str, Any]] = None,
         order_desc: bool = True,
+        approximate: bool = False,
     ) -> SqlaQuery:
-        """Querying any sqla table from this common interface"""
+        """
+        Querying any sqla table from this common interface
+
+        :param approximate: Whether to approximate the query in approximate mode
+               even if the `approximate` extra isn't set
+        """
         template_kwargs = {
             "from_dttm": from_dttm,
             "groupby": groupby,
@@ -848,6 +1047,9 @@ class SqlaTable(  # pylint: disable=too-many-public-methods,too-many-instance-at
         template_processor = self.get_template_processor(**template_kwargs)
         db_engine_spec = self.database.db_engine_spec
         prequeries: List[str] = []
+        approximate = self.approximate_mode and (
+            approximate or bool((extras or {}).get("approximate"))
+        )
 
         orderby = orderby or []
 
@@ -855,6 +1057,47 @@ class SqlaTable(  # pylint: disable=too-many-public-methods,too-many-instance-at
         if granularity not in self.dttm_cols:
             granularity = self.main_dttm_col
 
+        if not is_sip_38 and not columns and (extras or {}).get("use_rollups", True):
+            rollup = find_rollup(
+                self,
+                metrics=metrics,
+                granularity=granularity,
+                from_dttm=from_dttm,
+                to_dttm=to_dttm,
+                groupby=groupby or [],
+                filter=filter or [],
+                is_timeseries=is_timeseries,
+                extras=extras or {},
+                orderby=orderby,
+                timeseries_limit=timeseries_limit,
+                timeseries_limit_metric=timeseries_limit_metric,
+                inner_from_dttm=inner_from_dttm,
+                inner_to_dttm=inner_to_dttm,
+            )
+            if rollup:
+                rollup_table = rollup.get_rollup_table(
+                    self, groupby or [], is_timeseries, extras or {}, timeseries_limit
+                )
+                sqlaq = rollup_table.get_sqla_query(
+                    metrics=metrics,
+                    granularity=utils.DTTM_ALIAS,
+                    from_dttm=from_dttm,
+                    to_dttm=to_dttm,
+                    groupby=groupby,
+                    filter=filter,
+                    is_timeseries=is_timeseries,
+                    timeseries_limit=timeseries_limit,
+                    timeseries_limit_metric=timeseries_limit_metric,
+                    row_limit=row_limit,
+                    row_offset=row_offset,
+                    inner_from_dttm=inner_from_dttm,
+                    inner_to_dttm=inner_to_dttm,
+                    orderby=orderby,
+                    extras={**(extras or {}), "use_rollups": False},
+                    order_desc=order_desc,
+                )
+                return sqlaq._replace(rollup=rollup.name)
+
         # Database spec supports join-free timeslot grouping
         time_groupby_inline = db_engine_spec.time_groupby_inline
 
@@ -880,9 +1123,13 @@ class SqlaTable(  # pylint: disable=too-many-public-methods,too-many-instance-at
         for metric in metrics:
             if utils.is_adhoc_metric(metric):
                 assert isinstance(metric, dict)
-                metrics_exprs.append(self.adhoc_metric_to_sqla(metric, columns_by_name))
+                metrics_exprs.append(
+                    self.adhoc_metric_to_sqla(metric, columns_by_name, approximate)
+                )
             elif isinstance(metric, str) and metric in metrics_by_name:
-                metrics_exprs.append(metrics_by_name[metric].get_sqla_col())
+                metrics_exprs.append(
+                    metrics_by_name[metric].get_sqla_col(approximate=approximate)
+                )
             else:
                 raise QueryObjectValidationError(
                     _("Metric '%(metric)s' does not exist", metric=metric)
@@ -968,6 +1215,9 @@ class SqlaTable(  # pylint: disable=too-many-public-methods,too-many-instance-at
         qry = sa.select(select_exprs)
 
         tbl = self.get_from_clause(template_processor)
+        sample_percent = self.approximate_sample_percent
+        if approximate and sample_percent and not self.sql:
+            tbl = db_engine_spec.get_table_sample(tbl, sample_percent)
 
         if (is_sip_38 and metrics) or (not is_sip_38 and not columns):
             qry = qry.group_by(*groupby_exprs_with_timestamp.values())
@@ -1063,6 +1313,12 @@ class SqlaTable(  # pylint: disable=too-many-public-methods,too-many-instance-at
                         )
                     )
                 having_clause_and += [sa.text("({})".format(having))]
+            search = extras.get("search")
+            if search:
+                search_columns = extras.get("search_columns") or (columns or []) + (
+                    groupby or []
+                )
+                where_clause_and.append(self.get_search_filter(search, search_columns))
         if granularity:
             qry = qry.where(and_(*(time_filters + where_clause_and)))
         else:
@@ -1081,7 +1337,7 @@ class SqlaTable(  # pylint: disable=too-many-public-methods,too-many-instance-at
         for col, ascending in orderby:
             direction = asc if ascending else desc
             if utils.is_adhoc_metric(col):
-                col = self.adhoc_metric_to_sqla(col, columns_by_name)
+                col = self.adhoc_metric_to_sqla(col, columns_by_name, approximate)
             elif col in columns_by_name:
                 col = columns_by_name[col].get_sqla_col()
 
@@ -1130,7 +1386,10 @@ class SqlaTable(  # pylint: disable=too-many-public-methods,too-many-instance-at
                 ob = inner_main_metric_expr
                 if timeseries_limit_metric:
                     ob = self._get_timeseries_orderby(
-                        timeseries_limit_metric, metrics_by_name, columns_by_name
+                        timeseries_limit_metric,
+                        metrics_by_name,
+                        columns_by_name,
+                        approximate,
                     )
                 direction = desc if order_desc else asc
                 subq = subq.order_by(direction(ob))
@@ -1153,6 +1412,7 @@ class SqlaTable(  # pylint: disable=too-many-public-methods,too-many-instance-at
                                 timeseries_limit_metric,
                                 metrics_by_name,
                                 columns_by_name,
+                                approximate,
                             ),
                             False,
                         )
@@ -1191,6 +1451,7 @@ class SqlaTable(  # pylint: disable=too-many-public-methods,too-many-instance-at
             labels_expected=labels_expected,
             sqla_query=qry.select_from(tbl),
             prequeries=prequeries,
+            is_approximate=approximate,
         )
 
     def _get_timeseries_orderby(
@@ -1198,15 +1459,20 @@ class SqlaTable(  # pylint: disable=too-many-public-methods,too-many-instance-at
         timeseries_limit_metric: Metric,
         metrics_by_name: Dict[str, SqlMetric],
         columns_by_name: Dict[str, TableColumn],
+        approximate: bool = False,
     ) -> Optional[Column]:
         if utils.is_adhoc_metric(timeseries_limit_metric):
             assert isinstance(timeseries_limit_metric, dict)
-            ob = self.adhoc_metric_to_sqla(timeseries_limit_metric, columns_by_name)
+            ob = self.adhoc_metric_to_sqla(
+                timeseries_limit_metric, columns_by_name, approximate
+            )
         elif (
             isinstance(timeseries_limit_metric, str)
             and timeseries_limit_metric in metrics_by_name
         ):
-            ob = metrics_by_name[timeseries_limit_metric].get_sqla_col()
+            ob = metrics_by_name[timeseries_limit_metric].get_sqla_col(
+                approximate=approximate
+            )
         else:
             raise QueryObjectValidationError(
                 _("Metric '%(metric)s' does not exist", metric=timeseries_limit_metric)
@@ -1275,46 +1541,81 @@ class SqlaTable(  # pylint: disable=too-many-public-methods,too-many-instance-at
             query=sql,
             errors=errors,
             error_message=error_message,
+            is_approximate=query_str_ext.is_approximate,
+            rollup=query_str_ext.rollup,
         )
 
     def get_sqla_table_object(self) -> Table:
         return self.database.get_table(self.table_name, schema=self.schema)
 
-    def fetch_metadata(self, commit: bool = True) -> MetadataResult:
+    def fetch_metadata(
+        self, commit: bool = True, new_table: Optional[Table] = None
+    ) -> MetadataResult:
         """
         Fetches the metadata for the table and merges it in
 
+        Only the differences with the existing columns are applied: unknown
+        columns are added, vanished columns are removed and columns whose type
+        changed are updated in place.
+
         :param commit: should the changes be committed or not.
+        :param new_table: an already reflected table object, when omitted the table
+            is reflected from the database.
         :return: Tuple with lists of added, removed and modified column names.
         """
-        try:
-            new_table = self.get_sqla_table_object()
-        except SQLAlchemyError:
-            raise QueryObjectValidationError(
-                _(
-                    "Table %(table)s doesn't seem to exist in the specified database, "
-                    "couldn't fetch column information",
-                    table=self.table_name,
+        if new_table is None:
+            try:
+                new_table = self.get_sqla_table_object()
+            except SQLAlchemyError:
+                raise QueryObjectValidationError(
+                    _(
+                        "Table %(table)s doesn't seem to exist in the specified "
+                        "database, couldn't fetch column information",
+                        table=self.table_name,
+                    )
                 )
+
+        results, any_date_col = self._merge_columns(new_table)
+        metrics = [
+            SqlMetric(
+                metric_name="count",
+                verbose_name="COUNT(*)",
+                metric_type="count",
+                expression="COUNT(*)",
             )
+        ]
+        if not self.main_dttm_col:
+            self.main_dttm_col = any_date_col
+        self.add_missing_metrics(metrics)
+
+        # Apply config supplied mutations.
+        config["SQLA_TABLE_MUTATOR"](self)
+
+        db.session.merge(self)
+        if commit:
+            db.session.commit()
+        return results
+
+    def _merge_columns(self, new_table: Table) -> Tuple[MetadataResult, Optional[str]]:
+        """
+        Applies the differences between the columns of the dataset and the
+        columns of the reflected table.
 
-        metrics = []
+        :return: the added, removed and modified column names, and the name of
+            the first temporal column
+        """
         any_date_col = None
         db_engine_spec = self.database.db_engine_spec
         db_dialect = self.database.get_dialect()
-        old_columns = db.session.query(TableColumn).filter(TableColumn.table == self)
 
-        old_columns_by_name = {col.column_name: col for col in old_columns}
+        old_columns_by_name = {col.column_name: col for col in self.columns}
+        new_column_names = {col.name for col in new_table.columns}
         results = MetadataResult(
-            removed=[
-                col
-                for col in old_columns_by_name
-                if col not in {col.name for col in new_table.columns}
-            ]
+            removed=[col for col in old_columns_by_name if col not in new_column_names]
         )
+        for column_name in results.removed:
+            self.columns.remove(old_columns_by_name[column_name])
 
-        # clear old columns before adding modified columns back
-        self.columns = []
         for col in new_table.columns:
             try:
                 datatype = db_engine_spec.column_datatype_to_string(
@@ -1324,42 +1625,93 @@ class SqlaTable(  # pylint: disable=too-many-public-methods,too-many-instance-at
                 datatype = "UNKNOWN"
                 logger.error("Unrecognized data type in %s.%s", new_table, col.name)
                 logger.exception(ex)
-            old_column = old_columns_by_name.get(col.name, None)
-            if not old_column:
+            new_column = old_columns_by_name.get(col.name, None)
+            if not new_column:
                 results.added.append(col.name)
                 new_column = TableColumn(
                     column_name=col.name, type=datatype, table=self
                 )
                 new_column.is_dttm = new_column.is_temporal
                 db_engine_spec.alter_new_orm_column(new_column)
-            else:
-                new_column = old_column
-                if new_column.type != datatype:
-                    results.modified.append(col.name)
+            elif new_column.type != datatype:
+                results.modified.append(col.name)
                 new_column.type = datatype
             new_column.groupby = True
             new_column.filterable = True
-            self.columns.append(new_column)
             if not any_date_col and new_column.is_temporal:
                 any_date_col = col.name
-        metrics.append(
-            SqlMetric(
-                metric_name="count",
-                verbose_name="COUNT(*)",
-                metric_type="count",
-                expression="COUNT(*)",
-            )
-        )
-        if not self.main_dttm_col:
-            self.main_dttm_col = any_date_col
-        self.add_missing_metrics(metrics)
+        return results, any_date_col
 
-        # Apply config supplied mutations.
-        config["SQLA_TABLE_MUTATOR"](self)
+    @classmethod
+    def bulk_fetch_metadata(
+        cls,
+        datasets: List["SqlaTable"],
+        commit: bool = True,
+        workers: Optional[int] = None,
+        progress_callback: Optional[Callable[["SqlaTable", int, int], None]] = None,
+    ) -> Dict[int, MetadataResult]:
+        """
+        Fetches the metadata of many datasets at once.
+
+        Datasets are grouped by database and schema, and each group is reflected
+        in a single inspector pass. The reflection of the different groups runs
+        concurrently in a thread pool, while the resulting column diffs are
+        applied to the metadata database in the calling thread, with one commit
+        per group.
+
+        :param datasets: the datasets to refresh
+        :param commit: should the changes be committed or not
+        :param workers: number of concurrent reflection threads
+        :param progress_callback: called with the dataset, the number of processed
+            datasets and the total number of datasets after each dataset
+        :return: the metadata results of the successfully refreshed datasets,
+            keyed by dataset id
+        """
+        groups: Dict[Tuple[int, Optional[str]], List[SqlaTable]] = defaultdict(list)
+        for dataset in datasets:
+            groups[(dataset.database_id, dataset.schema)].append(dataset)
+
+        # engines are created in the calling thread as they may depend on the
+        # request context (impersonation, connection mutator)
+        reflect_args = [
+            (
+                key,
+                group[0].database.get_sqla_engine(),
+                group[0].database.get_extra().get("metadata_params", {}),
+                key[1],
+                [dataset.table_name for dataset in group],
+            )
+            for key, group in groups.items()
+        ]
 
-        db.session.merge(self)
-        if commit:
-            db.session.commit()
+        results: Dict[int, MetadataResult] = {}
+        processed = 0
+        pool = ThreadPool(processes=workers)
+        try:
+            for key, tables in pool.imap_unordered(_reflect_tables, reflect_args):
+                for dataset in groups[key]:
+                    processed += 1
+                    new_table = tables.get(dataset.table_name)
+                    if new_table is None:
+                        logger.error("Couldn't fetch column information of %s", dataset)
+                    else:
+                        try:
+                            # a failure doesn't leave half applied changes to be
+                            # committed with the group
+                            with db.session.begin_nested():
+                                results[dataset.id] = dataset.fetch_metadata(
+                                    commit=False, new_table=new_table
+                                )
+                        except Exception as ex:  # pylint: disable=broad-except
+                            logger.error("Error refreshing metadata of %s", dataset)
+                            logger.exception(ex)
+                    if progress_callback:
+                        progress_callback(dataset, processed, len(datasets))
+                if commit:
+                    db.session.commit()
+        finally:
+            pool.close()
+            pool.join()
         return results
 
     @classmethod
@@ -0,0 +1,472 @@
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+"""
+Rollups are tables pre-aggregating a dataset by some of its dimensions, metrics
+and a time grain. They are declared in the `rollups` list of the params of the
+dataset, e.g.
+
+    {
+        "rollups": [
+            {
+                "name": "daily_by_state",
+                "dimensions": ["state"],
+                "metrics": ["count", "sum__num"],
+                "time_grain": "P1D"
+            }
+        ]
+    }
+
+with optionally the `granularity` column of the required time grain (the main
+datetime column by default), and the `table_name` and `schema` of the rollup
+table.
+The rollup tables are materialized and refreshed by the `rollups.refresh` task,
+and the queries on the dataset are routed to the smallest rollup able to answer
+them, see `SqlaTable.get_sqla_query`. A rollup is only used for time ranges
+ending before its last refresh, and is materialized again from scratch when its
+definition or the expressions of its columns and metrics change.
+"""
+import json
+import logging
+import re
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple, TYPE_CHECKING
+
+import sqlalchemy as sa
+from dateutil.parser import isoparse
+from sqlalchemy.orm.attributes import set_committed_value
+
+from superset import app, security_manager
+from superset.sql_parse import ParsedQuery
+from superset.typing import Metric, QueryObjectDict
+from superset.utils import core as utils
+from superset.utils.hashing import md5_sha_from_str
+
+if TYPE_CHECKING:
+    # pylint: disable=unused-import
+    from superset.connectors.sqla.models import SqlaTable, SqlMetric, TableColumn
+
+config = app.config
+logger = logging.getLogger(__name__)
+
+# metrics made of a single aggregation, which can be aggregated again from the
+# results of a finer grouping
+REAGGREGATIONS = {"COUNT": "SUM", "SUM": "SUM", "MIN": "MIN", "MAX": "MAX"}
+SINGLE_AGGREGATION_REGEX = re.compile(
+    r"^\s*(COUNT|SUM|MIN|MAX)\s*\(\s*(?!DISTINCT\b)[^()]*\)\s*$", re.IGNORECASE
+)
+
+
+def get_reaggregation(expression: str) -> Optional[str]:
+    """
+    Get the aggregation computing a metric from its values over a finer grouping.
+
+    :param expression: the SQL expression of the metric
+    :return: the aggregate function, `None` if the metric can't be aggregated again
+    """
+    match = SINGLE_AGGREGATION_REGEX.match(expression)
+    return REAGGREGATIONS[match.group(1).upper()] if match else None
+
+
+@dataclass
+class Rollup:  # pylint: disable=too-many-instance-attributes
+    name: str
+    table_name: str
+    # the freshness of the rollup is tracked by the time grain buckets
+    time_grain: str
+    dimensions: List[str] = field(default_factory=list)
+    metrics: List[str] = field(default_factory=list)
+    granularity: Optional[str] = None
+    schema: Optional[str] = None
+    # set when the rollup table is materialized
+    row_count: Optional[int] = None
+    refreshed_on: Optional[str] = None
+    definition_hash: Optional[str] = None
+
+    @classmethod
+    def from_dict(cls, table: "SqlaTable", definition: Dict[str, Any]) -> "Rollup":
+        if not definition.get("time_grain"):
+            raise ValueError("A rollup needs a time grain")
+        return cls(
+            name=definition["name"],
+            table_name=definition.get("table_name")
+            or f"{table.table_name}__{definition['name']}",
+            dimensions=list(definition.get("dimensions") or []),
+            metrics=list(definition.get("metrics") or []),
+            time_grain=definition["time_grain"],
+            granularity=definition.get("granularity") or table.main_dttm_col,
+            schema=definition.get("schema", table.schema),
+            row_count=definition.get("row_count"),
+            refreshed_on=definition.get("refreshed_on"),
+            definition_hash=definition.get("definition_hash"),
+        )
+
+    @property
+    def full_table_name(self) -> str:
+        return f"{self.schema}.{self.table_name}" if self.schema else self.table_name
+
+    def get_sqla_table(self) -> sa.sql.TableClause:
+        return sa.table(
+            self.table_name, sa.column(utils.DTTM_ALIAS), schema=self.schema
+        )
+
+    def get_definition_hash(self, table: "SqlaTable") -> str:
+        """
+        The hash of the definition of the rollup, including the expressions of
+        its columns and metrics on the dataset, which the rollup table was
+        materialized from.
+        """
+        columns_by_name = {col.column_name: col.expression for col in table.columns}
+        metrics_by_name = {
+            metric.metric_name: metric.expression for metric in table.metrics
+        }
+        definition = {
+            "table": [table.schema, table.table_name, table.sql],
+            "rollup_table": [self.schema, self.table_name],
+            "dimensions": [
+                [name, columns_by_name.get(name)] for name in self.dimensions
+            ],
+            "metrics": [[name, metrics_by_name.get(name)] for name in self.metrics],
+            "time_grain": self.time_grain,
+            "granularity": [self.granularity, columns_by_name.get(self.granularity)],
+        }
+        return md5_sha_from_str(json.dumps(definition, sort_keys=True))
+
+    def is_materialized(self, table: "SqlaTable") -> bool:
+        """Whether the rollup table is materialized from the current definition"""
+        return bool(self.refreshed_on) and (
+            self.definition_hash == self.get_definition_hash(table)
+        )
+
+    def get_query_obj(self, since: Optional[datetime] = None) -> QueryObjectDict:
+        """
+        The query object of the aggregation materialized by the rollup.
+
+        :param since: only aggregate the rows from this datetime on
+        """
+        return {
+            "granularity": self.granularity,
+            "from_dttm": since,
+            "to_dttm": None,
+            "is_timeseries": True,
+            "groupby": self.dimensions,
+            "metrics": self.metrics,
+            "filter": [],
+            "extras": {
+                "time_grain_sqla": self.time_grain,
+                "time_range_endpoints": (
+                    utils.TimeRangeEndpoint.INCLUSIVE,
+                    utils.TimeRangeEndpoint.EXCLUSIVE,
+                ),
+                "use_rollups": False,
+                # the rollups are queried as exact data
+                "approximate": False,
+            },
+            "timeseries_limit": 0,
+            "row_limit": None,
+        }
+
+    def can_answer(  # pylint: disable=too-many-arguments,too-many-locals
+        self,
+        table: "SqlaTable",
+        metrics: List[Metric],
+        granularity: Optional[str],
+        from_dttm: Optional[datetime],
+        to_dttm: Optional[datetime],
+        groupby: List[str],
+        filter: List[Dict[str, Any]],  # pylint: disable=redefined-builtin
+        is_timeseries: bool,
+        extras: Dict[str, Any],
+        orderby: List[Any],
+        timeseries_limit: int = 0,
+        timeseries_limit_metric: Optional[Metric] = None,
+        inner_from_dttm: Optional[datetime] = None,
+        inner_to_dttm: Optional[datetime] = None,
+    ) -> bool:
+        """
+        Whether the rollup holds all the data needed by a query on the dataset,
+        with the same results. The metrics must be aggregated again unless the
+        query groups the rows exactly like the rollup.
+        """
+        if not metrics or not self.is_materialized(table):
+            return False
+        query_metrics = metrics + (
+            [timeseries_limit_metric] if timeseries_limit_metric else []
+        )
+        if not self.holds_columns(
+            table, query_metrics, groupby, filter, extras, orderby
+        ):
+            return False
+        time_ranges = [(from_dttm, to_dttm), (inner_from_dttm, inner_to_dttm)]
+        if not self.holds_time_ranges(granularity, is_timeseries, extras, time_ranges):
+            return False
+
+        time_grain = extras.get("time_grain_sqla")
+        if self.is_exact(groupby, is_timeseries, time_grain, timeseries_limit):
+            return True
+        metrics_by_name = {metric.metric_name: metric for metric in table.metrics}
+        return all(
+            metric in metrics_by_name
+            and get_reaggregation(metrics_by_name[metric].expression)
+            for metric in query_metrics
+        )
+
+    def holds_columns(  # pylint: disable=too-many-arguments,too-many-return-statements
+        self,
+        table: "SqlaTable",
+        metrics: List[Metric],
+        groupby: List[str],
+        filter: List[Dict[str, Any]],  # pylint: disable=redefined-builtin
+        extras: Dict[str, Any],
+        orderby: List[Any],
+    ) -> bool:
+        """
+        Whether the rollup holds the columns and metrics grouped by, filtered on
+        and ordered by a query on the dataset.
+        """
+        if extras.get("where") or extras.get("having") or extras.get("search"):
+            return False
+        dimensions = set(self.dimensions)
+        if not set(groupby) <= dimensions:
+            return False
+        if any(flt.get("col") not in dimensions for flt in filter if flt.get("op")):
+            return False
+        if any(metric not in self.metrics for metric in metrics):
+            return False
+        if any(
+            utils.is_adhoc_metric(col) or col not in dimensions | set(self.metrics)
+            for col, _ in orderby
+        ):
+            return False
+        return not (
+            config["ENABLE_ROW_LEVEL_SECURITY"]
+            and security_manager.get_rls_filters(table)
+        )
+
+    def holds_time_ranges(
+        self,
+        granularity: Optional[str],
+        is_timeseries: bool,
+        extras: Dict[str, Any],
+        time_ranges: List[Tuple[Optional[datetime], Optional[datetime]]],
+    ) -> bool:
+        """
+        Whether the time ranges of a query on the dataset only cover whole time
+        grain buckets of the rollup, ending before its last refresh: the rows
+        added to the dataset since are not in the rollup table.
+        """
+        if granularity != self.granularity:
+            return False
+        if not self.refreshed_on or not time_ranges or not time_ranges[0][1]:
+            return False
+        if is_timeseries and not utils.is_time_grain_multiple(
+            extras.get("time_grain_sqla"), self.time_grain
+        ):
+            return False
+        endpoints = extras.get("time_range_endpoints") or []
+        end_exclusive = (
+            len(endpoints) > 1 and endpoints[1] == utils.TimeRangeEndpoint.EXCLUSIVE
+        )
+        refreshed_on = isoparse(self.refreshed_on)
+        for start, end in time_ranges:
+            if start and not utils.is_time_grain_start(start, self.time_grain):
+                return False
+            if end and not (
+                end_exclusive
+                and utils.is_time_grain_start(end, self.time_grain)
+                and end <= refreshed_on
+            ):
+                return False
+        return True
+
+    def is_exact(
+        self,
+        groupby: List[str],
+        is_timeseries: bool,
+        time_grain: Optional[str],
+        timeseries_limit: int = 0,
+    ) -> bool:
+        """
+        Whether a query groups the rows exactly like the rollup, the top groups
+        of a timeseries limit being computed over the whole time range.
+        """
+        if not (is_timeseries and time_grain == self.time_grain):
+            return False
+        return set(groupby) == set(self.dimensions) and not (
+            is_timeseries and timeseries_limit and groupby
+        )
+
+    def get_rollup_table(  # pylint: disable=too-many-arguments
+        self,
+        table: "SqlaTable",
+        groupby: List[str],
+        is_timeseries: bool,
+        extras: Dict[str, Any],
+        timeseries_limit: int = 0,
+    ) -> "SqlaTable":
+        """
+        A transient dataset on the rollup table, whose columns are the dimensions
+        of the rollup and the timestamps of its time grain buckets, and whose
+        metrics aggregate the pre-aggregated metrics again.
+        """
+        # pylint: disable=import-outside-toplevel
+        from superset.connectors.sqla.models import SqlaTable
+
+        rollup_table = SqlaTable(
+            table_name=self.table_name,
+            schema=self.schema,
+            main_dttm_col=utils.DTTM_ALIAS,
+            template_params=table.template_params,
+        )
+        columns = self.get_rollup_columns(table)
+        exact = self.is_exact(
+            groupby, is_timeseries, extras.get("time_grain_sqla"), timeseries_limit
+        )
+        metrics = self.get_rollup_metrics(table, exact)
+
+        # the relationships are set without their backrefs, so that the transient
+        # objects aren't cascaded into the session along with the database
+        set_committed_value(rollup_table, "database", table.database)
+        set_committed_value(rollup_table, "columns", columns)
+        set_committed_value(rollup_table, "metrics", metrics)
+        for obj in columns + metrics:
+            set_committed_value(obj, "table", rollup_table)
+        return rollup_table
+
+    def get_rollup_columns(self, table: "SqlaTable") -> List["TableColumn"]:
+        """The columns of the rollup table: its dimensions and timestamps"""
+        # pylint: disable=import-outside-toplevel
+        from superset.connectors.sqla.models import TableColumn
+
+        columns_by_name = {col.column_name: col for col in table.columns}
+        columns = [
+            TableColumn(
+                column_name=name,
+                type=columns_by_name[name].type if name in columns_by_name else None,
+            )
+            for name in self.dimensions
+        ]
+        dttm_col = columns_by_name.get(self.granularity)
+        is_epoch = dttm_col and dttm_col.python_date_format in ("epoch_s", "epoch_ms")
+        columns.append(
+            TableColumn(
+                column_name=utils.DTTM_ALIAS,
+                is_dttm=True,
+                type="TIMESTAMP" if is_epoch or not dttm_col else dttm_col.type,
+            )
+        )
+        return columns
+
+    def get_rollup_metrics(self, table: "SqlaTable", exact: bool) -> List["SqlMetric"]:
+        """
+        The metrics of the rollup table, aggregating the pre-aggregated metrics
+        again, if they can be.
+
+        :param exact: whether the query groups the rows exactly like the rollup
+        """
+        # pylint: disable=import-outside-toplevel
+        from superset.connectors.sqla.models import SqlMetric
+
+        metrics_by_name = {metric.metric_name: metric for metric in table.metrics}
+        quote = table.database.get_dialect().identifier_preparer.quote
+        metrics = []
+        for name in self.metrics:
+            if name not in metrics_by_name:
+                continue
+            aggregate = get_reaggregation(metrics_by_name[name].expression)
+            if exact:
+                # a single row of the rollup per group, whatever the aggregation
+                aggregate = aggregate or "MAX"
+            if not aggregate:
+                continue
+            metrics.append(
+                SqlMetric(metric_name=name, expression=f"{aggregate}({quote(name)})")
+            )
+        return metrics
+
+
+def get_rollups(table: "SqlaTable") -> List[Rollup]:
+    """The rollups declared in the params of a dataset"""
+    rollups = []
+    for definition in table.params_dict.get("rollups") or []:
+        try:
+            rollups.append(Rollup.from_dict(table, definition))
+        except (KeyError, TypeError, ValueError):
+            logger.warning("Invalid rollup definition %s on %s", definition, table)
+    return rollups
+
+
+def find_rollup(table: "SqlaTable", **query: Any) -> Optional[Rollup]:
+    """
+    Find the smallest materialized rollup of a dataset able to answer a query.
+
+    :param table: the dataset
+    :param query: the arguments of `SqlaTable.get_sqla_query`
+    :return: the rollup, if any
+    """
+    rollups = [
+        rollup for rollup in get_rollups(table) if rollup.can_answer(table, **query)
+    ]
+    return min(rollups, key=lambda rollup: rollup.row_count or 0) if rollups else None
+
+
+def refresh_rollup(table: "SqlaTable", rollup: Rollup) -> Rollup:
+    """
+    Materialize a rollup, or refresh it incrementally: the rows of the latest time
+    grain bucket of the rollup table and after are aggregated again. The rollup
+    is materialized again from scratch when its definition changed.
+
+    :param table: the dataset
+    :param rollup: the rollup
+    :return: the refreshed rollup
+    """
+    engine = table.database.get_sqla_engine(schema=rollup.schema)
+    rollup_table = rollup.get_sqla_table()
+    since = None
+    if rollup.is_materialized(table):
+        since = engine.execute(
+            sa.select([sa.func.max(rollup_table.c[utils.DTTM_ALIAS])])
+        ).scalar()
+        if isinstance(since, str):
+            since = utils.parse_human_datetime(since)
+    definition_hash = rollup.get_definition_hash(table)
+    # compiled without `get_query_str_extended`, which may approximate costly
+    # queries
+    sqlaq = table.get_sqla_query(**rollup.get_query_obj(since))
+    sql = table.mutate_query_from_config(
+        table.database.compile_sqla_query(sqlaq.sqla_query)
+    )
+
+    with engine.begin() as connection:
+        if since is None:
+            ctas = ParsedQuery(sql).as_create_table(
+                rollup.table_name, rollup.schema, overwrite=True
+            )
+            for statement in ParsedQuery(ctas).get_statements():
+                connection.execute(statement)
+        else:
+            connection.execute(
+                rollup_table.delete().where(rollup_table.c[utils.DTTM_ALIAS] >= since)
+            )
+            table_name = engine.dialect.identifier_preparer.format_table(rollup_table)
+            connection.execute(f"INSERT INTO {table_name} {sql}")
+        rollup.row_count = connection.execute(
+            sa.select([sa.func.count()]).select_from(rollup_table)
+        ).scalar()
+    rollup.refreshed_on = datetime.utcnow().isoformat()
+    rollup.definition_hash = definition_hash
+    return rollup
@@ -16,20 +16,173 @@
 # under the License.
 """ Superset utilities for pandas.DataFrame.
 """
-from typing import Any, Dict, List
+from typing import Any, Callable, Dict, List, Optional, Tuple
 
+import numpy as np
 import pandas as pd
+from pandas.api.types import infer_dtype
 
 from superset.utils.core import JS_MAX_INTEGER
 
 
+# the inferred types of object columns that can hold ints or floats
+INFERRED_NUMERIC_TYPES = ("integer", "mixed-integer", "mixed-integer-float", "mixed")
+INFERRED_FLOAT_TYPES = ("floating", "mixed-integer-float", "mixed")
+
+
+def _js_unsafe_ints(values: np.ndarray) -> np.ndarray:
+    """Return a mask of the ints too big for JavaScript to handle"""
+    return (values > JS_MAX_INTEGER) | (values < -JS_MAX_INTEGER)
+
+
+def _stringify_big_ints(values: List[Any]) -> List[Any]:
+    """Convert the ints too big for JavaScript to handle to strings"""
+    return [
+        str(value) if isinstance(value, int) and abs(value) > JS_MAX_INTEGER else value
+        for value in values
+    ]
+
+
+def sanitize_df(dframe: pd.DataFrame, stringify_big_ints: bool = False) -> pd.DataFrame:
+    """
+    Sanitize the numeric columns of a DataFrame, one column at a time: infinite
+    floats are replaced with NaN and, if `stringify_big_ints` is set, the ints too
+    big for JavaScript to handle are converted to strings. The DataFrame is only
+    copied if a column has to be changed.
+
+    :param dframe: the DataFrame to sanitize
+    :param stringify_big_ints: convert the ints too big for JavaScript to strings
+    :return: the sanitized DataFrame
+    """
+    replacements: Dict[int, Any] = {}
+    for idx, dtype in enumerate(dframe.dtypes):
+        kind = dtype.kind if isinstance(dtype, np.dtype) else None
+        if kind == "f":
+            values = dframe.iloc[:, idx].to_numpy()
+            infinite = np.isinf(values)
+            if infinite.any():
+                replacements[idx] = np.where(infinite, np.nan, values)
+        elif kind in ("i", "u") and stringify_big_ints:
+            values = dframe.iloc[:, idx].to_numpy()
+            too_big = _js_unsafe_ints(values)
+            if too_big.any():
+                converted = values.astype(object)
+                converted[too_big] = [str(value) for value in values[too_big].tolist()]
+                replacements[idx] = converted
+        elif kind == "O":
+            series = dframe.iloc[:, idx]
+            inferred_type = infer_dtype(series, skipna=True)
+            if inferred_type in INFERRED_FLOAT_TYPES:
+                replaced = series.replace([np.inf, -np.inf], np.nan)
+                if not replaced.equals(series):
+                    series = replacements[idx] = replaced
+            if stringify_big_ints and inferred_type in INFERRED_NUMERIC_TYPES:
+                values = series.tolist()
+                converted = _stringify_big_ints(values)
+                if converted != values:
+                    replacements[idx] = converted
+
+    if not replacements:
+        return dframe
+    # columns are replaced by position, as their names may not be unique
+    columns = dframe.columns
+    dframe = dframe.set_axis(range(len(columns)), axis=1)
+    for idx, values in replacements.items():
+        dframe[idx] = values
+    dframe.columns = columns
+    return dframe
+
+
 def df_to_records(dframe: pd.DataFrame) -> List[Dict[str, Any]]:
-    data: List[Dict[str, Any]] = dframe.to_dict(orient="records")
-    # TODO: refactor this
-    for row in data:
-        for key, value in list(row.items()):
-            # if an int is too big for JavaScript to handle
-            # convert it to a string
-            if isinstance(value, int) and abs(value) > JS_MAX_INTEGER:
-                row[key] = str(value)
+    """
+    Convert a DataFrame to a list of records, with the ints too big for JavaScript
+    to handle converted to strings
+    """
+    data: List[Dict[str, Any]] = sanitize_df(dframe, stringify_big_ints=True).to_dict(
+        orient="records"
+    )
     return data
+
+
+def _replace_masked(
+    values: np.ndarray, mask: np.ndarray, replacements: Any
+) -> List[Any]:
+    """Convert an array to a list, with the masked values replaced"""
+    if not mask.any():
+        return values.tolist()
+    converted = values.astype(object)
+    converted[mask] = replacements
+    return converted.tolist()
+
+
+def _ints_to_list(series: pd.Series) -> List[Any]:
+    values = series.to_numpy()
+    too_big = _js_unsafe_ints(values)
+    return _replace_masked(
+        values, too_big, [str(value) for value in values[too_big].tolist()]
+    )
+
+
+def _floats_to_list(series: pd.Series) -> List[Any]:
+    values = series.to_numpy()
+    return _replace_masked(values, ~np.isfinite(values), None)
+
+
+def _datetimes_to_list(series: pd.Series) -> List[Any]:
+    if getattr(series.dtype, "tz", None) is not None:
+        # like `datetime_to_epoch`, which keeps the local time
+        series = series.dt.tz_localize(None)
+    values = series.to_numpy(dtype="datetime64[ns]")
+    nanoseconds = values.view(np.int64)
+    # same as `Timedelta.total_seconds`, which has a microsecond precision
+    epochs = (nanoseconds - nanoseconds % 1000) / 1e9 * 1000
+    return _replace_masked(epochs, np.isnat(values), None)
+
+
+# the generic type and the converter to a list of the columns of each dtype kind
+COLUMN_CONVERTERS: Dict[str, Tuple[str, Callable[[pd.Series], List[Any]]]] = {
+    "b": ("BOOL", lambda series: series.tolist()),
+    "i": ("INT", _ints_to_list),
+    "u": ("INT", _ints_to_list),
+    "f": ("FLOAT", _floats_to_list),
+    "M": ("DATETIME", _datetimes_to_list),
+}
+
+
+def _column_to_list(series: pd.Series) -> Tuple[Optional[str], List[Any]]:
+    """
+    Convert a column to a list of JSON serializable values and its generic type.
+    NaN and NaT become None, datetimes milliseconds since the epoch and the ints
+    too big for JavaScript strings, like `json_int_dttm_ser` and `df_to_records`.
+    """
+    if pd.api.types.is_datetime64_any_dtype(series.dtype):
+        kind: Optional[str] = "M"
+    else:
+        kind = series.dtype.kind if isinstance(series.dtype, np.dtype) else None
+    if kind in COLUMN_CONVERTERS:
+        generic_type, converter = COLUMN_CONVERTERS[kind]
+        return generic_type, converter(series)
+
+    values = series.tolist()
+    inferred_type = infer_dtype(values, skipna=True)
+    if inferred_type in ("string", "empty"):
+        return "STRING", values
+    return None, _stringify_big_ints(values)
+
+
+def df_to_columns(dframe: pd.DataFrame) -> Dict[str, Any]:
+    """
+    Convert a DataFrame to a columnar payload: the names and generic types of the
+    columns, and the values of each column in a list. The values are converted
+    one column at a time, which is much faster than `df_to_records` for large
+    results, and serialized without any call to the `default` JSON handler for
+    the common types.
+    """
+    colnames = [str(name) for name in dframe.columns]
+    coltypes: List[Optional[str]] = []
+    columns: List[List[Any]] = []
+    for idx in range(len(dframe.columns)):
+        coltype, values = _column_to_list(dframe.iloc[:, idx])
+        coltypes.append(coltype)
+        columns.append(values)
+    return {"colnames": colnames, "coltypes": coltypes, "columns": columns}
@@ -24,6 +24,8 @@ from superset.utils import core as utils
 class AthenaEngineSpec(BaseEngineSpec):
     engine = "awsathena"
     engine_name = "Amazon Athena"
+    approx_count_distinct_function = "approx_distinct"
+    table_sample_method = "BERNOULLI"
 
     _time_grain_expressions = {
         None: "{col}",
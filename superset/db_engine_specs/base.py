@@ -26,6 +26,8 @@ from typing import (
     Any,
     Callable,
     Dict,
+    Iterable,
+    Iterator,
     List,
     Match,
     NamedTuple,
@@ -36,10 +38,13 @@ from typing import (
     Union,
 )
 
+import numpy as np
 import pandas as pd
+import sqlalchemy as sqla
 import sqlparse
 from flask import g
 from flask_babel import lazy_gettext as _
+from pandas.api.types import is_float_dtype, is_integer_dtype
 from sqlalchemy import column, DateTime, select
 from sqlalchemy.engine.base import Engine
 from sqlalchemy.engine.interfaces import Compiled, Dialect
@@ -48,7 +53,14 @@ from sqlalchemy.engine.url import URL
 from sqlalchemy.ext.compiler import compiles
 from sqlalchemy.orm import Session
 from sqlalchemy.sql import quoted_name, text
-from sqlalchemy.sql.expression import ColumnClause, ColumnElement, Select, TextAsFrom
+from sqlalchemy.sql.expression import (
+    ColumnClause,
+    ColumnElement,
+    FromClause,
+    Select,
+    TableClause,
+    TextAsFrom,
+)
 from sqlalchemy.types import TypeEngine
 
 from superset import app, sql_parse
@@ -77,6 +89,12 @@ class TimeGrain(NamedTuple):  # pylint: disable=too-few-public-methods
 QueryStatus = utils.QueryStatus
 config = app.config
 
+# distinct count of a single expression without function calls, e.g.
+# COUNT(DISTINCT user_id)
+COUNT_DISTINCT_REGEX = re.compile(
+    r"COUNT\s*\(\s*DISTINCT\s+([^(),]+?)\s*\)", re.IGNORECASE
+)
+
 builtin_time_grains: Dict[Optional[str], str] = {
     None: "Time Column",
     "PT1S": "second",
@@ -157,6 +175,10 @@ class BaseEngineSpec:  # pylint: disable=too-many-public-methods
     arraysize = 0
     max_column_name_length = 0
     try_remove_schema_from_table_name = True  # pylint: disable=invalid-name
+    # approximate mode of the datasets: the function approximating
+    # COUNT(DISTINCT ...) and the sampling method of TABLESAMPLE, if supported
+    approx_count_distinct_function: Optional[str] = None
+    table_sample_method: Optional[str] = None
 
     # default matching patterns for identifying column types
     db_column_types: Dict[utils.DbColumnType, Tuple[Pattern[Any], ...]] = {
@@ -320,6 +342,41 @@ class BaseEngineSpec:  # pylint: disable=too-many-public-methods
             return cursor.fetchmany(limit)
         return cursor.fetchall()
 
+    @classmethod
+    def fetch_data_in_batches(
+        cls, cursor: Any, batch_size: int, limit: Optional[int] = None
+    ) -> List[Tuple[Any, ...]]:
+        """
+        Fetch the results of a server-side cursor a batch at a time, so that the
+        database driver only buffers a batch of rows.
+
+        :param cursor: Cursor instance
+        :param batch_size: Number of rows fetched at a time
+        :param limit: Maximum number of rows to be returned by the cursor
+        :return: Result of query
+        """
+        data: List[Tuple[Any, ...]] = []
+        while not limit or len(data) < limit:
+            size = min(batch_size, limit - len(data)) if limit else batch_size
+            batch = cursor.fetchmany(size)
+            if not batch:
+                break
+            data.extend(batch)
+        return data
+
+    @classmethod
+    def get_server_side_cursor(cls, engine: Engine, connection: Any) -> Optional[Any]:
+        """
+        Open a cursor streaming the results of its query from the database as
+        they are fetched, instead of buffering them all in the client on execute.
+        Such a cursor runs a single SELECT statement, only returning rows.
+
+        :param engine: SqlAlchemy Engine instance of the connection
+        :param connection: DB-API connection
+        :return: the cursor, or None if the driver doesn't support it
+        """
+        return None
+
     @classmethod
     def expand_data(
         cls, columns: List[Dict[Any, Any]], data: List[Dict[Any, Any]]
@@ -413,7 +470,7 @@ class BaseEngineSpec:  # pylint: disable=too-many-public-methods
             return database.compile_sqla_query(qry)
 
         if LimitMethod.FORCE_LIMIT:
-            parsed_query = sql_parse.ParsedQuery(sql)
+            parsed_query = sql_parse.get_parsed_query(sql)
             sql = parsed_query.set_or_update_query_limit(limit)
 
         return sql
@@ -426,7 +483,7 @@ class BaseEngineSpec:  # pylint: disable=too-many-public-methods
         :param sql: SQL query
         :return: Value of limit clause in query
         """
-        parsed_query = sql_parse.ParsedQuery(sql)
+        parsed_query = sql_parse.get_parsed_query(sql)
         return parsed_query.limit
 
     @classmethod
@@ -438,7 +495,7 @@ class BaseEngineSpec:  # pylint: disable=too-many-public-methods
         :param limit: New limit to insert/replace into query
         :return: Query with new limit
         """
-        parsed_query = sql_parse.ParsedQuery(sql)
+        parsed_query = sql_parse.get_parsed_query(sql)
         return parsed_query.set_or_update_query_limit(limit)
 
     @staticmethod
@@ -453,14 +510,22 @@ class BaseEngineSpec:  # pylint: disable=too-many-public-methods
         return df
 
     @staticmethod
-    def csv_to_df(**kwargs: Any) -> pd.DataFrame:
-        """ Read csv into Pandas DataFrame
+    def csv_to_df_chunks(**kwargs: Any) -> Iterator[pd.DataFrame]:
+        """ Read csv into an iterator of Pandas DataFrames, one per chunk
         :param kwargs: params to be passed to DataFrame.read_csv
-        :return: Pandas DataFrame containing data from csv
+        :return: Iterator of Pandas DataFrames containing data from csv
         """
         kwargs["encoding"] = "utf-8"
         kwargs["iterator"] = True
-        chunks = pd.read_csv(**kwargs)
+        return pd.read_csv(**kwargs)
+
+    @classmethod
+    def csv_to_df(cls, **kwargs: Any) -> pd.DataFrame:
+        """ Read csv into Pandas DataFrame
+        :param kwargs: params to be passed to DataFrame.read_csv
+        :return: Pandas DataFrame containing data from csv
+        """
+        chunks = cls.csv_to_df_chunks(**kwargs)
         df = pd.concat(chunk for chunk in chunks)
         return df
 
@@ -475,6 +540,86 @@ class BaseEngineSpec:  # pylint: disable=too-many-public-methods
         """
         df.to_sql(**kwargs)
 
+    @classmethod
+    def get_df_to_sql_method(
+        cls, engine: Engine
+    ) -> Optional[Union[str, Callable[..., None]]]:
+        """
+        The `method` passed to DataFrame.to_sql() when uploading files. Can be
+        overridden to use an engine-native bulk loader.
+
+        :param engine: The engine the data is uploaded to
+        :return: `None` (executemany), "multi" or a callable, see
+            https://pandas.pydata.org/pandas-docs/stable/user_guide/io.html#io-sql-method
+        """
+        if engine.dialect.supports_multivalues_insert:
+            return "multi"
+        return None
+
+    @staticmethod
+    def _is_whole(series: pd.Series) -> bool:
+        values = series.dropna()
+        return bool(np.isfinite(values).all() and (values % 1 == 0).all())
+
+    @classmethod
+    def df_chunks_to_sql(
+        cls,
+        chunks: Iterable[pd.DataFrame],
+        table: Table,
+        database: "Database",
+        df_to_sql_kwargs: Dict[str, Any],
+    ) -> None:
+        """
+        Upload the chunks of a file to a database as they are read, so that the
+        whole file never needs to be held in memory. The table is created from
+        the first chunk, the following chunks are appended to it. The integer
+        columns of the first chunk that turned into floats in a following chunk,
+        because of missing values, are cast back to integers when the values are
+        whole numbers, and otherwise left to the database to convert.
+
+        If a chunk fails after the table was created by the upload, the
+        partially loaded table is dropped.
+        """
+        engine = cls.get_engine(database)
+        if table.schema:
+            # only add schema when it is preset and non empty
+            df_to_sql_kwargs["schema"] = table.schema
+        method = cls.get_df_to_sql_method(engine)
+        if method:
+            df_to_sql_kwargs["method"] = method
+        if_exists = df_to_sql_kwargs.get("if_exists", "fail")
+
+        dtypes: Optional[pd.Series] = None
+        created = False
+        rows = 0
+        try:
+            for df in chunks:
+                if dtypes is None:
+                    dtypes = df.dtypes
+                    cls.df_to_sql(df=df, con=engine, **df_to_sql_kwargs)
+                    created = if_exists != "append"
+                else:
+                    for col, dtype in dtypes.items():
+                        if (
+                            is_integer_dtype(dtype)
+                            and is_float_dtype(df[col])
+                            and cls._is_whole(df[col])
+                        ):
+                            # missing values turned the column into floats
+                            df[col] = df[col].astype("Int64")
+                    cls.df_to_sql(
+                        df=df, con=engine, **{**df_to_sql_kwargs, "if_exists": "append"}
+                    )
+                rows += len(df)
+                logger.debug("Uploaded %i rows to table %s", rows, table)
+        except Exception:
+            # only drop the table created by this upload, not an existing one
+            if created:
+                sqla.Table(
+                    table.table, sqla.MetaData(), schema=table.schema or None
+                ).drop(engine, checkfirst=True)
+            raise
+
     @classmethod
     def create_table_from_csv(  # pylint: disable=too-many-arguments
         cls,
@@ -488,14 +633,8 @@ class BaseEngineSpec:  # pylint: disable=too-many-public-methods
         Create table from contents of a csv. Note: this method does not create
         metadata for the table.
         """
-        df = cls.csv_to_df(filepath_or_buffer=filename, **csv_to_df_kwargs)
-        engine = cls.get_engine(database)
-        if table.schema:
-            # only add schema when it is preset and non empty
-            df_to_sql_kwargs["schema"] = table.schema
-        if engine.dialect.supports_multivalues_insert:
-            df_to_sql_kwargs["method"] = "multi"
-        cls.df_to_sql(df=df, con=engine, **df_to_sql_kwargs)
+        chunks = cls.csv_to_df_chunks(filepath_or_buffer=filename, **csv_to_df_kwargs)
+        cls.df_chunks_to_sql(chunks, table, database, df_to_sql_kwargs)
 
     @classmethod
     def convert_dttm(cls, target_type: str, dttm: datetime) -> Optional[str]:
@@ -522,13 +661,7 @@ class BaseEngineSpec:  # pylint: disable=too-many-public-methods
         metadata for the table.
         """
         df = cls.excel_to_df(io=filename, **excel_to_df_kwargs,)
-        engine = cls.get_engine(database)
-        if table.schema:
-            # only add schema when it is preset and non empty
-            df_to_sql_kwargs["schema"] = table.schema
-        if engine.dialect.supports_multivalues_insert:
-            df_to_sql_kwargs["method"] = "multi"
-        cls.df_to_sql(df=df, con=engine, **df_to_sql_kwargs)
+        cls.df_chunks_to_sql([df], table, database, df_to_sql_kwargs)
 
     @classmethod
     def get_all_datasource_names(
@@ -575,6 +708,35 @@ class BaseEngineSpec:  # pylint: disable=too-many-public-methods
         query object"""
         # TODO: Fix circular import error caused by importing sql_lab.Query
 
+    @classmethod
+    def get_cancel_query_id(cls, cursor: Any, database: "Database") -> Optional[str]:
+        """
+        Get the id identifying the queries run by the cursor on the database, used
+        to cancel them from another connection.
+
+        :param cursor: Cursor instance in which the queries will be run
+        :param database: Database instance
+        :return: the id, if needed to cancel the queries
+        """
+        return None
+
+    @classmethod
+    def cancel_query(
+        cls, cursor: Any, database: "Database", cancel_query_id: Optional[str]
+    ) -> bool:
+        """
+        Cancel the query running in the cursor, from another thread.
+
+        :param cursor: Cursor instance running the query
+        :param database: Database instance
+        :param cancel_query_id: the id returned by `get_cancel_query_id`
+        :return: whether the query could be cancelled
+        """
+        if hasattr(cursor, "cancel"):
+            cursor.cancel()
+            return True
+        return False
+
     @classmethod
     def extract_error_message(cls, ex: Exception) -> str:
         return f"{cls.engine} error: {cls._extract_error_message(ex)}"
@@ -791,9 +953,27 @@ class BaseEngineSpec:  # pylint: disable=too-many-public-methods
         """
         raise Exception("Database does not support cost estimation")
 
+    @classmethod
+    def get_cost_estimate_values(cls, raw_cost: Dict[str, Any]) -> Dict[str, float]:
+        """
+        Get the numeric values of the cost estimate of a statement.
+
+        :param raw_cost: Raw estimate of a statement from `estimate_query_cost`
+        :return: The values of the estimate by name
+        """
+        return {
+            key: value
+            for key, value in raw_cost.items()
+            if isinstance(value, (int, float)) and not isinstance(value, bool)
+        }
+
     @classmethod
     def estimate_query_cost(
-        cls, database: "Database", schema: str, sql: str, source: Optional[str] = None
+        cls,
+        database: "Database",
+        schema: Optional[str],
+        sql: str,
+        source: Optional[str] = None,
     ) -> List[Dict[str, str]]:
         """
         Estimate the cost of a multiple statement SQL query.
@@ -808,7 +988,7 @@ class BaseEngineSpec:  # pylint: disable=too-many-public-methods
             raise Exception("Database does not support cost estimation")
 
         user_name = g.user.username if g.user else None
-        parsed_query = sql_parse.ParsedQuery(sql)
+        parsed_query = sql_parse.get_parsed_query(sql)
         statements = parsed_query.get_statements()
 
         engine = cls.get_engine(database, schema=schema, source=source)
@@ -823,6 +1003,35 @@ class BaseEngineSpec:  # pylint: disable=too-many-public-methods
                     )
         return costs
 
+    @classmethod
+    def get_approximate_expression(cls, expression: str) -> str:
+        """
+        Rewrite the exact distinct counts of a metric expression with the
+        approximate function of the engine, if any.
+
+        :param expression: SQL expression of a metric
+        :return: The approximate expression
+        """
+        if not cls.approx_count_distinct_function:
+            return expression
+        return COUNT_DISTINCT_REGEX.sub(
+            rf"{cls.approx_count_distinct_function}(\1)", expression
+        )
+
+    @classmethod
+    def get_table_sample(cls, tbl: TableClause, percent: float) -> FromClause:
+        """
+        Sample the rows of a table, if the engine supports TABLESAMPLE.
+
+        :param tbl: The table to sample
+        :param percent: The percentage of the rows to sample
+        :return: The sampled table, or the table itself
+        """
+        if not cls.table_sample_method:
+            return tbl
+        method = getattr(sqla.func, cls.table_sample_method)
+        return sqla.tablesample(tbl, method(percent), name=tbl.name)
+
     @classmethod
     def modify_url_for_impersonation(
         cls, url: URL, impersonate_user: bool, username: Optional[str]
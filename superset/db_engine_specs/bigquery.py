@@ -38,6 +38,7 @@ class BigQueryEngineSpec(BaseEngineSpec):
 
     engine = "bigquery"
     engine_name = "Google BigQuery"
+    approx_count_distinct_function = "APPROX_COUNT_DISTINCT"
     max_column_name_length = 128
 
     """
@@ -26,6 +26,7 @@ class ClickHouseEngineSpec(BaseEngineSpec):  # pylint: disable=abstract-method
 
     engine = "clickhouse"
     engine_name = "ClickHouse"
+    approx_count_distinct_function = "uniq"
 
     time_secondary_columns = True
     time_groupby_inline = True
@@ -14,9 +14,19 @@
 # KIND, either express or implied.  See the License for the
 # specific language governing permissions and limitations
 # under the License.
+from typing import Any, Optional
+
+from sqlalchemy.engine.base import Engine
+
 from superset.db_engine_specs.postgres import PostgresEngineSpec
 
 
 class CockroachDbEngineSpec(PostgresEngineSpec):
     engine = "cockroachdb"
     engine_name = "CockroachDB"
+    table_sample_method = None
+
+    @classmethod
+    def get_server_side_cursor(cls, engine: Engine, connection: Any) -> Optional[Any]:
+        """CockroachDB doesn't support the cursors declared by psycopg2"""
+        return None
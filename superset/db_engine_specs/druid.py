@@ -36,6 +36,7 @@ class DruidEngineSpec(BaseEngineSpec):  # pylint: disable=abstract-method
 
     engine = "druid"
     engine_name = "Apache Druid"
+    approx_count_distinct_function = "APPROX_COUNT_DISTINCT"
     allows_joins = False
     allows_subqueries = True
 
@@ -78,6 +78,8 @@ class HiveEngineSpec(PrestoEngineSpec):
 
     engine = "hive"
     engine_name = "Apache Hive"
+    approx_count_distinct_function = None
+    table_sample_method = None
     max_column_name_length = 767
     # pylint: disable=line-too-long
     _time_grain_expressions = {
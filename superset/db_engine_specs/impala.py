@@ -28,6 +28,7 @@ class ImpalaEngineSpec(BaseEngineSpec):
 
     engine = "impala"
     engine_name = "Apache Impala"
+    approx_count_distinct_function = "NDV"
 
     _time_grain_expressions = {
         None: "{col}",
@@ -15,14 +15,19 @@
 # specific language governing permissions and limitations
 # under the License.
 from datetime import datetime
-from typing import Any, Dict, Optional
+from typing import Any, Dict, Optional, TYPE_CHECKING
 from urllib import parse
 
+from sqlalchemy.engine.base import Engine
 from sqlalchemy.engine.url import URL
 
 from superset.db_engine_specs.base import BaseEngineSpec
 from superset.utils import core as utils
 
+if TYPE_CHECKING:
+    # prevent circular imports
+    from superset.models.core import Database  # pylint: disable=unused-import
+
 
 class MySQLEngineSpec(BaseEngineSpec):
     engine = "mysql"
@@ -87,6 +92,41 @@ class MySQLEngineSpec(BaseEngineSpec):
     def epoch_to_dttm(cls) -> str:
         return "from_unixtime({col})"
 
+    @classmethod
+    def get_server_side_cursor(cls, engine: Engine, connection: Any) -> Optional[Any]:
+        """An unbuffered cursor, reading the rows from the connection as fetched"""
+        # pylint: disable=import-error
+        if engine.dialect.driver == "mysqldb":
+            import MySQLdb.cursors
+
+            return connection.cursor(MySQLdb.cursors.SSCursor)
+        if engine.dialect.driver == "pymysql":
+            import pymysql.cursors
+
+            return connection.cursor(pymysql.cursors.SSCursor)
+        return None
+
+    @classmethod
+    def get_cancel_query_id(cls, cursor: Any, database: "Database") -> Optional[str]:
+        # the drivers know the id of their connection, without a round trip
+        thread_id = getattr(cursor.connection, "thread_id", None)
+        if callable(thread_id):
+            return str(thread_id())
+        cursor.execute("SELECT CONNECTION_ID()")
+        row = cursor.fetchone()
+        return str(row[0]) if row else None
+
+    @classmethod
+    def cancel_query(
+        cls, cursor: Any, database: "Database", cancel_query_id: Optional[str]
+    ) -> bool:
+        """Kill the running query from another connection"""
+        if not cancel_query_id:
+            return False
+        engine = database.get_sqla_engine()
+        engine.execute(f"KILL QUERY {int(cancel_query_id)}")
+        return True
+
     @classmethod
     def _extract_error_message(cls, ex: Exception) -> str:
         """Extract error message for queries"""
@@ -14,11 +14,24 @@
 # KIND, either express or implied.  See the License for the
 # specific language governing permissions and limitations
 # under the License.
+import math
+import uuid
 from datetime import datetime
-from typing import Any, List, Optional, Tuple, TYPE_CHECKING
+from io import StringIO
+from typing import (
+    Any,
+    Callable,
+    Iterator,
+    List,
+    Optional,
+    Tuple,
+    TYPE_CHECKING,
+    Union,
+)
 
 from pytz import _FixedOffset  # type: ignore
 from sqlalchemy.dialects.postgresql.base import PGInspector
+from sqlalchemy.engine.base import Connection, Engine
 
 from superset.db_engine_specs.base import BaseEngineSpec
 from superset.utils import core as utils
@@ -70,6 +83,7 @@ class PostgresEngineSpec(PostgresBaseEngineSpec):
     engine = "postgresql"
     max_column_name_length = 63
     try_remove_schema_from_table_name = False
+    table_sample_method: Optional[str] = "BERNOULLI"
 
     @classmethod
     def get_table_names(
@@ -80,6 +94,67 @@ class PostgresEngineSpec(PostgresBaseEngineSpec):
         tables.extend(inspector.get_foreign_table_names(schema))
         return sorted(tables)
 
+    @classmethod
+    def get_server_side_cursor(cls, engine: Engine, connection: Any) -> Optional[Any]:
+        """A psycopg2 named cursor, declared on the server in the transaction"""
+        if engine.dialect.driver != "psycopg2":
+            return None
+        cursor = connection.cursor(name=f"superset_{uuid.uuid4().hex}")
+        cursor.tzinfo_factory = FixedOffsetTimezone
+        return cursor
+
+    @classmethod
+    def cancel_query(
+        cls, cursor: Any, database: "Database", cancel_query_id: Optional[str]
+    ) -> bool:
+        """psycopg2 cancels the running query through its connection"""
+        if hasattr(cursor.connection, "cancel"):
+            cursor.connection.cancel()
+            return True
+        return False
+
+    @staticmethod
+    def _copy_csv_field(value: Any) -> str:
+        # COPY reads unquoted empty fields as NULL, and quoted ones as strings
+        if value is None or (isinstance(value, float) and math.isnan(value)):
+            return ""
+        escaped = str(value).replace('"', '""')
+        return f'"{escaped}"'
+
+    @classmethod
+    def _copy_insert(
+        cls,
+        pd_table: Any,
+        conn: Connection,
+        keys: List[str],
+        data_iter: Iterator[Tuple[Any, ...]],
+    ) -> None:
+        """Insert the rows of a DataFrame.to_sql() chunk using COPY FROM STDIN"""
+        buffer = StringIO()
+        for row in data_iter:
+            buffer.write(",".join(cls._copy_csv_field(value) for value in row))
+            buffer.write("\n")
+        buffer.seek(0)
+
+        quote = conn.dialect.identifier_preparer.quote
+        table_name = quote(pd_table.name)
+        if pd_table.schema:
+            table_name = f"{quote(pd_table.schema)}.{table_name}"
+        columns = ", ".join(quote(key) for key in keys)
+        with conn.connection.cursor() as cursor:
+            cursor.copy_expert(
+                f"COPY {table_name} ({columns}) FROM STDIN WITH CSV", buffer
+            )
+
+    @classmethod
+    def get_df_to_sql_method(
+        cls, engine: Engine
+    ) -> Optional[Union[str, Callable[..., None]]]:
+        dialect = engine.dialect
+        if dialect.name == "postgresql" and dialect.driver == "psycopg2":
+            return cls._copy_insert
+        return super().get_df_to_sql_method(engine)
+
     @classmethod
     def convert_dttm(cls, target_type: str, dttm: datetime) -> Optional[str]:
         tt = target_type.upper()
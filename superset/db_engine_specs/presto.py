@@ -48,7 +48,7 @@ from superset.models.sql_types.presto_sql_types import (
     TinyInteger,
 )
 from superset.result_set import destringify
-from superset.sql_parse import ParsedQuery
+from superset.sql_parse import get_parsed_query
 from superset.utils import core as utils
 
 if TYPE_CHECKING:
@@ -109,6 +109,8 @@ def get_children(column: Dict[str, str]) -> List[Dict[str, str]]:
 class PrestoEngineSpec(BaseEngineSpec):
     engine = "presto"
     engine_name = "Presto"
+    approx_count_distinct_function: Optional[str] = "approx_distinct"
+    table_sample_method: Optional[str] = "BERNOULLI"
 
     _time_grain_expressions = {
         None: "{col}",
@@ -482,7 +484,7 @@ class PrestoEngineSpec(BaseEngineSpec):
         :param username: Effective username
         :return: JSON response from Presto
         """
-        parsed_query = ParsedQuery(statement)
+        parsed_query = get_parsed_query(statement)
         sql = parsed_query.stripped()
 
         sql_query_mutator = config["SQL_QUERY_MUTATOR"]
@@ -508,6 +510,10 @@ class PrestoEngineSpec(BaseEngineSpec):
         result = json.loads(cursor.fetchone()[0])
         return result
 
+    @classmethod
+    def get_cost_estimate_values(cls, raw_cost: Dict[str, Any]) -> Dict[str, float]:
+        return super().get_cost_estimate_values(raw_cost.get("estimate", {}))
+
     @classmethod
     def query_cost_formatter(
         cls, raw_cost: List[Dict[str, Any]]
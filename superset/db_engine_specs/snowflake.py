@@ -31,6 +31,7 @@ if TYPE_CHECKING:
 class SnowflakeEngineSpec(PostgresBaseEngineSpec):
     engine = "snowflake"
     engine_name = "Snowflake"
+    approx_count_distinct_function = "APPROX_COUNT_DISTINCT"
     force_column_alias_quotes = True
     max_column_name_length = 256
 
@@ -15,8 +15,9 @@
 # specific language governing permissions and limitations
 # under the License.
 from datetime import datetime
-from typing import List, Optional, TYPE_CHECKING
+from typing import Any, Callable, List, Optional, TYPE_CHECKING, Union
 
+from sqlalchemy.engine.base import Engine
 from sqlalchemy.engine.reflection import Inspector
 
 from superset.db_engine_specs.base import BaseEngineSpec
@@ -48,6 +49,14 @@ class SqliteEngineSpec(BaseEngineSpec):
     def epoch_to_dttm(cls) -> str:
         return "datetime({col}, 'unixepoch')"
 
+    @classmethod
+    def get_df_to_sql_method(
+        cls, engine: Engine
+    ) -> Optional[Union[str, Callable[..., None]]]:
+        # multi-row inserts quickly hit the bound parameters limit of SQLite,
+        # executemany is faster anyway
+        return None
+
     @classmethod
     def get_all_datasource_names(
         cls, database: "Database", datasource_type: str
@@ -87,3 +96,11 @@ class SqliteEngineSpec(BaseEngineSpec):
     ) -> List[str]:
         """Need to disregard the schema for Sqlite"""
         return sorted(inspector.get_table_names())
+
+    @classmethod
+    def cancel_query(
+        cls, cursor: Any, database: "Database", cancel_query_id: Optional[str]
+    ) -> bool:
+        """Interrupt the query running on the connection of the cursor"""
+        cursor.connection.interrupt()
+        return True
@@ -20,3 +20,4 @@ from superset.db_engine_specs.postgres import PostgresBaseEngineSpec
 class VerticaEngineSpec(PostgresBaseEngineSpec):
     engine = "vertica"
     engine_name = "Vertica"
+    approx_count_distinct_function = "APPROXIMATE_COUNT_DISTINCT"
@@ -17,14 +17,18 @@
 """Defines the templating context for SQL Lab"""
 import inspect
 import re
-from typing import Any, cast, List, Optional, Tuple, TYPE_CHECKING
+from functools import lru_cache
+from typing import Any, cast, Dict, List, Optional, Tuple, Type, TYPE_CHECKING
 
 from flask import g, request
+from jinja2 import Template
 from jinja2.sandbox import SandboxedEnvironment
 
 from superset import jinja_base_context
 from superset.extensions import jinja_context_manager
+from superset.utils import timing
 from superset.utils.core import convert_legacy_filters_into_adhoc, merge_extra_filters
+from superset.utils.timing import trace_stage
 
 if TYPE_CHECKING:
     from superset.connectors.sqla.models import (  # pylint: disable=unused-import
@@ -34,6 +38,42 @@ if TYPE_CHECKING:
     from superset.models.sql_lab import Query  # pylint: disable=unused-import
 
 
+# Number of compiled templates kept around by the template processors
+TEMPLATE_CACHE_SIZE = 256
+TEMPLATE_DELIMITERS = ("{{", "{%", "{#")
+NEWLINE_RE = re.compile(r"(\r\n|\r|\n)")
+
+_environments: Dict[Type["BaseTemplateProcessor"], SandboxedEnvironment] = {}
+
+
+def get_environment(
+    processor_class: Type["BaseTemplateProcessor"],
+) -> SandboxedEnvironment:
+    """Returns the sandboxed environment shared by the processors of a class"""
+    if processor_class not in _environments:
+        _environments[processor_class] = SandboxedEnvironment()
+    return _environments[processor_class]
+
+
+@lru_cache(maxsize=TEMPLATE_CACHE_SIZE)
+def compile_template(
+    processor_class: Type["BaseTemplateProcessor"], sql: str
+) -> Template:
+    """Compiles a template, reusing the compiled template of the same source"""
+    return get_environment(processor_class).from_string(sql)
+
+
+def render_plain_sql(sql: str) -> str:
+    """
+    Renders SQL without any template delimiters as Jinja would, i.e.
+    normalizing the newlines and stripping a single trailing newline
+    """
+    lines = NEWLINE_RE.split(sql)[::2]
+    if lines[-1] == "":
+        del lines[-1]
+    return "\n".join(lines)
+
+
 def filter_values(column: str, default: Optional[str] = None) -> List[str]:
     """ Gets a values for a particular filter as a list
 
@@ -235,7 +275,7 @@ class BaseTemplateProcessor:  # pylint: disable=too-few-public-methods
         self.context.update(jinja_base_context)
         if self.engine:
             self.context[self.engine] = self
-        self.env = SandboxedEnvironment()
+        self.env = get_environment(type(self))
 
     def process_template(self, sql: str, **kwargs: Any) -> str:
         """Processes a sql template
@@ -244,9 +284,12 @@ class BaseTemplateProcessor:  # pylint: disable=too-few-public-methods
         >>> process_template(sql)
         "SELECT '2017-01-01T00:00:00'"
         """
-        template = self.env.from_string(sql)
-        kwargs.update(self.context)
-        return template.render(kwargs)
+        if not any(delimiter in sql for delimiter in TEMPLATE_DELIMITERS):
+            return render_plain_sql(sql)
+        with trace_stage(timing.JINJA_RENDER):
+            template = compile_template(type(self), sql)
+            kwargs.update(self.context)
+            return template.render(kwargs)
 
 
 class PrestoTemplateProcessor(BaseTemplateProcessor):
@@ -27,7 +27,6 @@ from typing import Any, Callable, Dict, List, Optional, Set, Tuple, Type
 import numpy
 import pandas as pd
 import sqlalchemy as sqla
-import sqlparse
 from flask import g, request
 from flask_appbuilder import Model
 from sqlalchemy import (
@@ -58,7 +57,11 @@ from superset.models.dashboard import Dashboard
 from superset.models.helpers import AuditMixinNullable, ImportMixin
 from superset.models.tags import DashboardUpdater, FavStarUpdater
 from superset.result_set import SupersetResultSet
-from superset.utils import cache as cache_util, core as utils
+from superset.sql_parse import get_parsed_query
+from superset.utils import cache as cache_util, core as utils, timing
+from superset.utils.admission import admit_query
+from superset.utils.cancellation import query_cancellation
+from superset.utils.timing import trace_stage
 
 config = app.config
 custom_password_store = config["SQLALCHEMY_CUSTOM_PASSWORD_STORE"]
@@ -71,6 +74,19 @@ PASSWORD_MASK = "X" * 10
 DB_CONNECTION_MUTATOR = config["DB_CONNECTION_MUTATOR"]
 
 
+def get_query_source_from_request() -> Optional[utils.QuerySource]:
+    """The source of the queries of the current request, from its referrer"""
+    if not request or not request.referrer:
+        return None
+    if "/superset/dashboard/" in request.referrer:
+        return utils.QuerySource.DASHBOARD
+    if "/superset/explore/" in request.referrer:
+        return utils.QuerySource.CHART
+    if "/superset/sqllab/" in request.referrer:
+        return utils.QuerySource.SQL_LAB
+    return None
+
+
 class Url(Model, AuditMixinNullable):
     """Used for the short url feature"""
 
@@ -246,6 +262,22 @@ class Database(
     def table_cache_timeout(self) -> Optional[int]:
         return self.metadata_cache_timeout.get("table_cache_timeout")
 
+    @property
+    def sqllab_results_cache_enabled(self) -> bool:
+        timeout = self.sqllab_results_cache_timeout
+        return isinstance(timeout, int) and timeout > 0
+
+    @property
+    def sqllab_results_cache_timeout(self) -> Optional[int]:
+        return self.get_extra().get("sqllab_results_cache_timeout")
+
+    @property
+    def concurrency_limits(self) -> Dict[str, int]:
+        return {
+            **config["QUERY_CONCURRENCY_LIMITS"],
+            **self.get_extra().get("concurrency_limits", {}),
+        }
+
     @property
     def default_schemas(self) -> List[str]:
         return self.get_extra().get("default_schemas", [])
@@ -345,13 +377,8 @@ class Database(
         params.update(self.get_encrypted_extra())
 
         if DB_CONNECTION_MUTATOR:
-            if not source and request and request.referrer:
-                if "/superset/dashboard/" in request.referrer:
-                    source = utils.QuerySource.DASHBOARD
-                elif "/superset/explore/" in request.referrer:
-                    source = utils.QuerySource.CHART
-                elif "/superset/sqllab/" in request.referrer:
-                    source = utils.QuerySource.SQL_LAB
+            if not source:
+                source = get_query_source_from_request()
 
             sqlalchemy_url, params = DB_CONNECTION_MUTATOR(
                 sqlalchemy_url, params, effective_username, security_manager, source
@@ -371,7 +398,7 @@ class Database(
         schema: Optional[str] = None,
         mutator: Optional[Callable[[pd.DataFrame], None]] = None,
     ) -> pd.DataFrame:
-        sqls = [str(s).strip(" ;") for s in sqlparse.parse(sql)]
+        sqls = get_parsed_query(sql).get_statements()
 
         engine = self.get_sqla_engine(schema=schema)
         username = utils.get_username()
@@ -383,29 +410,39 @@ class Database(
             if log_query:
                 log_query(engine.url, sql, schema, username, __name__, security_manager)
 
-        with closing(engine.raw_connection()) as conn:
-            with closing(conn.cursor()) as cursor:
-                for sql_ in sqls[:-1]:
-                    _log_query(sql_)
-                    self.db_engine_spec.execute(cursor, sql_)
-                    cursor.fetchall()
-
-                _log_query(sqls[-1])
-                self.db_engine_spec.execute(cursor, sqls[-1])
-
-                data = self.db_engine_spec.fetch_data(cursor)
-                result_set = SupersetResultSet(
-                    data, cursor.description, self.db_engine_spec
-                )
-                df = result_set.to_pandas_df()
-                if mutator:
-                    mutator(df)
-
-                for k, v in df.dtypes.items():
-                    if v.type == numpy.object_ and needs_conversion(df[k]):
-                        df[k] = df[k].apply(utils.json_dumps_w_dates)
-
-                return df
+        with admit_query(self, username, get_query_source_from_request()):
+            with trace_stage(timing.CONNECTION_ACQUIRE):
+                raw_connection = engine.raw_connection()
+            with closing(raw_connection) as conn:
+                with closing(conn.cursor()) as cursor, query_cancellation.register(
+                    cursor, self
+                ):
+                    with trace_stage(timing.EXECUTE):
+                        for sql_ in sqls[:-1]:
+                            _log_query(sql_)
+                            self.db_engine_spec.execute(cursor, sql_)
+                            cursor.fetchall()
+
+                        _log_query(sqls[-1])
+                        self.db_engine_spec.execute(cursor, sqls[-1])
+
+                    with trace_stage(timing.FETCH):
+                        data = self.db_engine_spec.fetch_data(cursor)
+                    with trace_stage(timing.ARROW_CONVERSION):
+                        result_set = SupersetResultSet(
+                            data, cursor.description, self.db_engine_spec
+                        )
+
+        with trace_stage(timing.PANDAS_CONVERSION):
+            df = result_set.to_pandas_df()
+        if mutator:
+            mutator(df)
+
+        for k, v in df.dtypes.items():
+            if v.type == numpy.object_ and needs_conversion(df[k]):
+                df[k] = df[k].apply(utils.json_dumps_w_dates)
+
+        return df
 
     def compile_sqla_query(self, qry: Select, schema: Optional[str] = None) -> str:
         engine = self.get_sqla_engine(schema=schema)
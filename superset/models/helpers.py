@@ -400,7 +400,7 @@ class AuditMixinNullable(AuditMixin):
         return Markup(f'<span class="no-wrap">{self.changed_on_humanized}</span>')
 
 
-class QueryResult:  # pylint: disable=too-few-public-methods
+class QueryResult:  # pylint: disable=too-few-public-methods,too-many-instance-attributes
 
     """Object returned by the query interface"""
 
@@ -412,6 +412,8 @@ class QueryResult:  # pylint: disable=too-few-public-methods
         status: str = QueryStatus.SUCCESS,
         error_message: Optional[str] = None,
         errors: Optional[List[Dict[str, Any]]] = None,
+        is_approximate: bool = False,
+        rollup: Optional[str] = None,
     ) -> None:
         self.df = df
         self.query = query
@@ -419,6 +421,8 @@ class QueryResult:  # pylint: disable=too-few-public-methods
         self.status = status
         self.error_message = error_message
         self.errors = errors or []
+        self.is_approximate = is_approximate
+        self.rollup = rollup
 
 
 class ExtraJSONMixin:
@@ -947,7 +947,7 @@ class SupersetSecurityManager(  # pylint: disable=too-many-public-methods
             if query:
                 tables = {
                     Table(table_.table, table_.schema or query.schema)
-                    for table_ in sql_parse.ParsedQuery(query.sql).tables
+                    for table_ in sql_parse.get_parsed_query(query.sql).tables
                 }
             elif table:
                 tables = {table}
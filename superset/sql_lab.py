@@ -14,6 +14,7 @@
 # KIND, either express or implied.  See the License for the
 # specific language governing permissions and limitations
 # under the License.
+import hashlib
 import logging
 import uuid
 from contextlib import closing
@@ -26,6 +27,7 @@ import msgpack
 import pyarrow as pa
 import simplejson as json
 import sqlalchemy
+import sqlparse
 from celery.exceptions import SoftTimeLimitExceeded
 from celery.task.base import Task
 from contextlib2 import contextmanager
@@ -36,6 +38,7 @@ from sqlalchemy.pool import NullPool
 from superset import (
     app,
     db,
+    is_feature_enabled,
     results_backend,
     results_backend_use_msgpack,
     security_manager,
@@ -45,15 +48,19 @@ from superset.db_engine_specs import BaseEngineSpec
 from superset.extensions import celery_app
 from superset.models.sql_lab import Query
 from superset.result_set import SupersetResultSet
-from superset.sql_parse import ParsedQuery
+from superset.sql_parse import get_parsed_query, ParsedQuery
+from superset.utils.admission import admit_query
 from superset.utils.core import (
     json_iso_dttm_ser,
     QuerySource,
     QueryStatus,
     zlib_compress,
+    zlib_decompress,
 )
+from superset.utils import timing
 from superset.utils.dates import now_as_float
 from superset.utils.decorators import stats_timing
+from superset.utils.timing import get_active_trace, timing_trace, trace_stage
 
 config = app.config
 stats_logger = config["STATS_LOGGER"]
@@ -61,6 +68,7 @@ SQLLAB_TIMEOUT = config["SQLLAB_ASYNC_TIME_LIMIT_SEC"]
 SQLLAB_HARD_TIMEOUT = SQLLAB_TIMEOUT + 60
 SQL_MAX_ROW = config["SQL_MAX_ROW"]
 SQLLAB_CTAS_NO_LIMIT = config["SQLLAB_CTAS_NO_LIMIT"]
+SQLLAB_FETCH_BATCH_SIZE = config["SQLLAB_FETCH_BATCH_SIZE"]
 SQL_QUERY_MUTATOR = config["SQL_QUERY_MUTATOR"]
 log_query = config["QUERY_LOGGER"]
 logger = logging.getLogger(__name__)
@@ -168,7 +176,7 @@ def get_sql_results(  # pylint: disable=too-many-arguments
     log_params: Optional[Dict[str, Any]] = None,
 ) -> Optional[Dict[str, Any]]:
     """Executes the sql query returns the results."""
-    with session_scope(not ctask.request.called_directly) as session:
+    with session_scope(not ctask.request.called_directly) as session, timing_trace():
 
         try:
             return execute_sql_statements(
@@ -189,25 +197,15 @@ def get_sql_results(  # pylint: disable=too-many-arguments
             return handle_query_error(str(ex), query, session)
 
 
-# pylint: disable=too-many-arguments
-def execute_sql_statement(
-    sql_statement: str,
-    query: Query,
-    user_name: Optional[str],
-    session: Session,
-    cursor: Any,
-    log_params: Optional[Dict[str, Any]],
-) -> SupersetResultSet:
-    """Executes a single SQL statement"""
+def get_executed_sql(
+    parsed_query: ParsedQuery, query: Query, user_name: Optional[str]
+) -> str:
+    """
+    Get the SQL actually run for a statement, i.e. with the CTA, the row limit
+    and the environment-specific mutations applied
+    """
     database = query.database
-    db_engine_spec = database.db_engine_spec
-    parsed_query = ParsedQuery(sql_statement)
     sql = parsed_query.stripped()
-
-    if not parsed_query.is_readonly() and not database.allow_dml:
-        raise SqlLabSecurityException(
-            _("Only `SELECT` statements are allowed against this database")
-        )
     if query.select_as_cta:
         if not parsed_query.is_select():
             raise SqlLabException(
@@ -240,6 +238,35 @@ def execute_sql_statement(
     # Hook to allow environment-specific mutation (usually comments) to the SQL
     if SQL_QUERY_MUTATOR:
         sql = SQL_QUERY_MUTATOR(sql, user_name, security_manager, database)
+    return sql
+
+
+# pylint: disable=too-many-arguments
+def execute_sql_statement(
+    sql_statement: str,
+    query: Query,
+    user_name: Optional[str],
+    session: Session,
+    cursor: Any,
+    log_params: Optional[Dict[str, Any]],
+    batch_size: Optional[int] = None,
+) -> SupersetResultSet:
+    """
+    Executes a single SQL statement
+
+    :param batch_size: fetch the results of a server-side cursor in batches of this
+           number of rows
+    """
+    database = query.database
+    db_engine_spec = database.db_engine_spec
+    stats_tags = {"database": database.database_name}
+    parsed_query = get_parsed_query(sql_statement)
+
+    if not parsed_query.is_readonly() and not database.allow_dml:
+        raise SqlLabSecurityException(
+            _("Only `SELECT` statements are allowed against this database")
+        )
+    sql = get_executed_sql(parsed_query, query, user_name)
 
     try:
         if log_query:
@@ -254,19 +281,30 @@ def execute_sql_statement(
             )
         query.executed_sql = sql
         session.commit()
-        with stats_timing("sqllab.query.time_executing_query", stats_logger):
+        with stats_timing(
+            "sqllab.query.time_executing_query", stats_logger, stats_tags
+        ):
             logger.debug("Query %d: Running query: %s", query.id, sql)
-            db_engine_spec.execute(cursor, sql, async_=True)
-            logger.debug("Query %d: Handling cursor", query.id)
-            db_engine_spec.handle_cursor(cursor, query, session)
+            with trace_stage(timing.EXECUTE):
+                db_engine_spec.execute(cursor, sql, async_=True)
+                logger.debug("Query %d: Handling cursor", query.id)
+                db_engine_spec.handle_cursor(cursor, query, session)
 
-        with stats_timing("sqllab.query.time_fetching_results", stats_logger):
+        with stats_timing(
+            "sqllab.query.time_fetching_results", stats_logger, stats_tags
+        ):
             logger.debug(
                 "Query %d: Fetching data for query object: %s",
                 query.id,
                 str(query.to_dict()),
             )
-            data = db_engine_spec.fetch_data(cursor, query.limit)
+            with trace_stage(timing.FETCH):
+                if batch_size:
+                    data = db_engine_spec.fetch_data_in_batches(
+                        cursor, batch_size, query.limit
+                    )
+                else:
+                    data = db_engine_spec.fetch_data(cursor, query.limit)
 
     except SoftTimeLimitExceeded as ex:
         logger.error("Query %d: Time limit exceeded", query.id)
@@ -282,7 +320,172 @@ def execute_sql_statement(
 
     logger.debug("Query %d: Fetching cursor description", query.id)
     cursor_description = cursor.description
-    return SupersetResultSet(data, cursor_description, db_engine_spec)
+    with trace_stage(timing.ARROW_CONVERSION):
+        return SupersetResultSet(data, cursor_description, db_engine_spec)
+
+
+def get_server_side_cursor(
+    engine: sqlalchemy.engine.Engine, conn: Any, query: Query, statement: str
+) -> Optional[Any]:
+    """
+    Get a server-side cursor to run a statement whose results are fetched in
+    batches, if the database driver supports it and the statement returns rows.
+    """
+    if not SQLLAB_FETCH_BATCH_SIZE or query.select_as_cta:
+        return None
+    # e.g. a psycopg2 named cursor can't run a SELECT INTO
+    if not get_parsed_query(statement).is_plain_select():
+        return None
+    return query.database.db_engine_spec.get_server_side_cursor(engine, conn)
+
+
+@contextmanager
+def get_statement_cursor(  # pylint: disable=too-many-arguments
+    engine: sqlalchemy.engine.Engine,
+    conn: Any,
+    cursor: Any,
+    query: Query,
+    statement: str,
+    stream: bool,
+) -> Iterator[Tuple[Any, Optional[int]]]:
+    """
+    Get the cursor running a statement, and the size of the batches its results
+    are fetched in: a server-side cursor if the results are streamed and it's
+    supported, see `get_server_side_cursor`, else the cursor shared by the
+    statements.
+    """
+    server_side_cursor = (
+        get_server_side_cursor(engine, conn, query, statement) if stream else None
+    )
+    if not server_side_cursor:
+        yield cursor, None
+        return
+    with closing(server_side_cursor):
+        yield server_side_cursor, SQLLAB_FETCH_BATCH_SIZE
+
+
+def get_results_cache_key(
+    query: Query, rendered_query: str, user_name: Optional[str]
+) -> Optional[str]:
+    """
+    Get the key of the results of a query in the SQL Lab results cache of its
+    database, which is the same for the queries returning the same results: the
+    same normalized SQL run by the same effective user on the same schema with the
+    same limit.
+
+    :return: `None` if the results of the query can't be reused
+    """
+    database = query.database
+    if not database.sqllab_results_cache_enabled or query.select_as_cta:
+        return None
+    parsed_query = get_parsed_query(rendered_query)
+    if not parsed_query.is_deterministic() or not all(
+        get_parsed_query(statement).is_select()
+        for statement in parsed_query.get_statements()
+    ):
+        return None
+
+    limit = query.limit
+    if SQL_MAX_ROW and (not limit or limit > SQL_MAX_ROW):
+        limit = SQL_MAX_ROW
+    # the results depend on the user when impersonated or if the SQL is mutated
+    effective_user = (
+        user_name if database.impersonate_user or SQL_QUERY_MUTATOR else None
+    )
+    normalized_sql = sqlparse.format(
+        parsed_query.stripped(),
+        strip_comments=True,
+        strip_whitespace=True,
+        keyword_case="upper",
+    )
+    key = json.dumps([database.id, query.schema, effective_user, normalized_sql, limit])
+    return "sqllab_results_{}".format(hashlib.md5(key.encode("utf-8")).hexdigest())
+
+
+def _results_exist(results_key: str) -> bool:
+    try:
+        return bool(results_backend.has(results_key))
+    except NotImplementedError:
+        # the key in the cache doesn't outlive the results, so rather than
+        # downloading them, assume they weren't evicted
+        return True
+
+
+def _load_cached_results(
+    query: Query, cache_key: str, session: Session, stats_tags: Dict[str, str]
+) -> Optional[Dict[str, Any]]:
+    """
+    Point a query at the stored results of the same query, if still available.
+
+    :return: the cached query details, `None` if not cached
+    """
+    with stats_timing("sqllab.query.results_cache_read", stats_logger, stats_tags):
+        blob = results_backend.get(cache_key)
+        cached = json.loads(zlib_decompress(blob)) if blob else None
+    if not cached or not _results_exist(cached["results_key"]):
+        return None
+
+    logger.info(
+        "Query %s: Reusing the results of key %s", str(query.id), cached["results_key"]
+    )
+    query.results_key = cached["results_key"]
+    query.executed_sql = cached["executed_sql"]
+    query.limit = cached["limit"]
+    query.rows = cached["rows"]
+    query.progress = 100
+    query.status = QueryStatus.SUCCESS
+    query.start_running_time = query.end_time = now_as_float()
+    session.commit()
+    stats_logger.incr("sqllab.query.results_cache_hit")
+    return cached
+
+
+def _store_results(
+    query: Query,
+    payload: Dict[str, Any],
+    cache_key: Optional[str],
+    stats_tags: Dict[str, str],
+) -> None:
+    """
+    Store the results of a query in the results backend, under the key of the
+    query and, if reusable, under their key in the SQL Lab results cache.
+    """
+    database = query.database
+    key = str(uuid.uuid4())
+    logger.info(
+        "Query %s: Storing results in results backend, key: %s", str(query.id), key
+    )
+    with stats_timing("sqllab.query.results_backend_write", stats_logger, stats_tags):
+        with stats_timing(
+            "sqllab.query.results_backend_write_serialization",
+            stats_logger,
+            stats_tags,
+        ), trace_stage(timing.JSON_SERIALIZATION):
+            serialized_payload = _serialize_payload(
+                payload, cast(bool, results_backend_use_msgpack)
+            )
+        cache_timeout = database.cache_timeout
+        if cache_timeout is None:
+            cache_timeout = config["CACHE_DEFAULT_TIMEOUT"]
+
+        compressed = zlib_compress(serialized_payload)
+        logger.debug("*** serialized payload size: %i", getsizeof(serialized_payload))
+        logger.debug("*** compressed payload size: %i", getsizeof(compressed))
+        results_backend.set(key, compressed, cache_timeout)
+    query.results_key = key
+
+    if cache_key:
+        timeout = database.sqllab_results_cache_timeout
+        if cache_timeout and (not timeout or timeout > cache_timeout):
+            # the results mustn't expire before their key in the cache
+            timeout = cache_timeout
+        cached_value = {
+            "results_key": key,
+            "executed_sql": query.executed_sql,
+            "limit": query.limit,
+            "rows": query.rows,
+        }
+        results_backend.set(cache_key, zlib_compress(json.dumps(cached_value)), timeout)
 
 
 def _serialize_payload(
@@ -308,7 +511,7 @@ def _serialize_and_expand_data(
     if use_msgpack:
         with stats_timing(
             "sqllab.query.results_backend_pa_serialization", stats_logger
-        ):
+        ), trace_stage(timing.RESULTS_SERIALIZATION):
             data = (
                 pa.default_serialization_context()
                 .serialize(result_set.pa_table)
@@ -319,8 +522,10 @@ def _serialize_and_expand_data(
         # expand when loading data from results backend
         all_columns, expanded_columns = (selected_columns, [])
     else:
-        df = result_set.to_pandas_df()
-        data = df_to_records(df) or []
+        with trace_stage(timing.PANDAS_CONVERSION):
+            df = result_set.to_pandas_df()
+        with trace_stage(timing.RESULTS_SERIALIZATION):
+            data = df_to_records(df) or []
 
         if expand_data:
             all_columns, data, expanded_columns = db_engine_spec.expand_data(
@@ -333,6 +538,22 @@ def _serialize_and_expand_data(
     return (data, selected_columns, all_columns, expanded_columns)
 
 
+def complete_query(query: Query, result_set: SupersetResultSet) -> None:
+    """Update the query entry once all of its statements have run"""
+    query.rows = result_set.size
+    query.progress = 100
+    query.set_extra_json_key("progress", None)
+    if query.select_as_cta:
+        query.select_sql = query.database.select_star(
+            query.tmp_table_name,
+            schema=query.tmp_schema_name,
+            limit=query.limit,
+            show_cols=False,
+            latest_partition=False,
+        )
+    query.end_time = now_as_float()
+
+
 def execute_sql_statements(  # pylint: disable=too-many-arguments, too-many-locals, too-many-statements
     query_id: int,
     rendered_query: str,
@@ -353,70 +574,106 @@ def execute_sql_statements(  # pylint: disable=too-many-arguments, too-many-loca
     payload: Dict[str, Any] = dict(query_id=query_id)
     database = query.database
     db_engine_spec = database.db_engine_spec
+    stats_tags = {"database": database.database_name}
     db_engine_spec.patch()
 
     if database.allow_run_async and not results_backend:
         raise SqlLabException("Results backend isn't configured.")
 
+    # the stored results of the same query can be reused unless returned inline
+    cache_key = (
+        get_results_cache_key(query, rendered_query, user_name)
+        if store_results and results_backend
+        else None
+    )
+    if (
+        cache_key
+        and not return_results
+        and _load_cached_results(query, cache_key, session, stats_tags)
+    ):
+        return None
+
     # Breaking down into multiple statements
-    parsed_query = ParsedQuery(rendered_query)
+    parsed_query = get_parsed_query(rendered_query)
     statements = parsed_query.get_statements()
     logger.info("Query %s: Executing %i statement(s)", str(query_id), len(statements))
 
-    logger.info("Query %s: Set query to 'running'", str(query_id))
-    query.status = QueryStatus.RUNNING
-    query.start_running_time = now_as_float()
-    session.commit()
+    def on_queued(queue_depth: int) -> None:
+        msg = f"Queued behind {queue_depth} other queries on this database"
+        logger.info("Query %s: %s", str(query_id), msg)
+        query.status = QueryStatus.PENDING
+        query.set_extra_json_key("progress", msg)
+        session.commit()
 
-    engine = database.get_sqla_engine(
-        schema=query.schema,
-        nullpool=True,
-        user_name=user_name,
-        source=QuerySource.SQL_LAB,
-    )
-    # Sharing a single connection and cursor across the
-    # execution of all statements (if many)
-    with closing(engine.raw_connection()) as conn:
-        with closing(conn.cursor()) as cursor:
-            statement_count = len(statements)
-            for i, statement in enumerate(statements):
-                # Check if stopped
-                query = get_query(query_id, session)
-                if query.status == QueryStatus.STOPPED:
-                    return None
-
-                # Run statement
-                msg = f"Running statement {i+1} out of {statement_count}"
-                logger.info("Query %s: %s", str(query_id), msg)
-                query.set_extra_json_key("progress", msg)
-                session.commit()
-                try:
-                    result_set = execute_sql_statement(
-                        statement, query, user_name, session, cursor, log_params
-                    )
-                except Exception as ex:  # pylint: disable=broad-except
-                    msg = str(ex)
-                    if statement_count > 1:
-                        msg = f"[Statement {i+1} out of {statement_count}] " + msg
-                    payload = handle_query_error(msg, query, session, payload)
-                    return payload
+    def is_stopped() -> bool:
+        session.refresh(query)
+        return query.status == QueryStatus.STOPPED
+
+    with admit_query(
+        database, user_name, QuerySource.SQL_LAB, on_queued, is_stopped
+    ) as admitted:
+        # the query may have been stopped while waiting
+        if not admitted or is_stopped():
+            return None
+        logger.info("Query %s: Set query to 'running'", str(query_id))
+        query.status = QueryStatus.RUNNING
+        query.start_running_time = now_as_float()
+        session.commit()
 
-        # Commit the connection so CTA queries will create the table.
-        conn.commit()
+        engine = database.get_sqla_engine(
+            schema=query.schema,
+            nullpool=True,
+            user_name=user_name,
+            source=QuerySource.SQL_LAB,
+        )
+        # Sharing a single connection and cursor across the
+        # execution of all statements (if many)
+        with trace_stage(timing.CONNECTION_ACQUIRE):
+            raw_connection = engine.raw_connection()
+        with closing(raw_connection) as conn:
+            with closing(conn.cursor()) as cursor:
+                statement_count = len(statements)
+                for i, statement in enumerate(statements):
+                    # Check if stopped
+                    query = get_query(query_id, session)
+                    if query.status == QueryStatus.STOPPED:
+                        return None
+
+                    # Run statement
+                    msg = f"Running statement {i+1} out of {statement_count}"
+                    logger.info("Query %s: %s", str(query_id), msg)
+                    query.set_extra_json_key("progress", msg)
+                    session.commit()
+                    # only the results of the last statement are kept, stream them
+                    # when stored in the results backend
+                    stream = store_results and i == statement_count - 1
+                    try:
+                        with get_statement_cursor(
+                            engine, conn, cursor, query, statement, stream
+                        ) as (statement_cursor, batch_size):
+                            result_set = execute_sql_statement(
+                                statement,
+                                query,
+                                user_name,
+                                session,
+                                statement_cursor,
+                                log_params,
+                                batch_size,
+                            )
+                    except Exception as ex:  # pylint: disable=broad-except
+                        msg = (
+                            f"[Statement {i+1} out of {statement_count}] {ex}"
+                            if statement_count > 1
+                            else str(ex)
+                        )
+                        payload = handle_query_error(msg, query, session, payload)
+                        return payload
+
+            # Commit the connection so CTA queries will create the table.
+            conn.commit()
 
     # Success, updating the query entry in database
-    query.rows = result_set.size
-    query.progress = 100
-    query.set_extra_json_key("progress", None)
-    if query.select_as_cta:
-        query.select_sql = database.select_star(
-            query.tmp_table_name,
-            schema=query.tmp_schema_name,
-            limit=query.limit,
-            show_cols=False,
-            latest_partition=False,
-        )
-    query.end_time = now_as_float()
+    complete_query(query, result_set)
 
     use_arrow_data = store_results and cast(bool, results_backend_use_msgpack)
     data, selected_columns, all_columns, expanded_columns = _serialize_and_expand_data(
@@ -435,33 +692,19 @@ def execute_sql_statements(  # pylint: disable=too-many-arguments, too-many-loca
         }
     )
     payload["query"]["state"] = QueryStatus.SUCCESS
+    trace = get_active_trace()
+    if trace and is_feature_enabled("QUERY_TIMINGS"):
+        payload["timings"] = trace.to_dict()
 
     if store_results and results_backend:
-        key = str(uuid.uuid4())
-        logger.info(
-            "Query %s: Storing results in results backend, key: %s", str(query_id), key
-        )
-        with stats_timing("sqllab.query.results_backend_write", stats_logger):
-            with stats_timing(
-                "sqllab.query.results_backend_write_serialization", stats_logger
-            ):
-                serialized_payload = _serialize_payload(
-                    payload, cast(bool, results_backend_use_msgpack)
-                )
-            cache_timeout = database.cache_timeout
-            if cache_timeout is None:
-                cache_timeout = config["CACHE_DEFAULT_TIMEOUT"]
-
-            compressed = zlib_compress(serialized_payload)
-            logger.debug(
-                "*** serialized payload size: %i", getsizeof(serialized_payload)
-            )
-            logger.debug("*** compressed payload size: %i", getsizeof(compressed))
-            results_backend.set(key, compressed, cache_timeout)
-        query.results_key = key
+        _store_results(query, payload, cache_key, stats_tags)
 
     query.status = QueryStatus.SUCCESS
     session.commit()
+    if trace:
+        timing.report_timings(
+            trace.to_dict(), "sqllab.query.timing", stats_tags, user_id=query.user_id
+        )
 
     if return_results:
         # since we're returning results we need to create non-arrow data
@@ -15,20 +15,43 @@
 # specific language governing permissions and limitations
 # under the License.
 import logging
+import threading
 from dataclasses import dataclass
 from enum import Enum
+from functools import lru_cache
 from typing import List, Optional, Set
 from urllib import parse
 
 import sqlparse
 from sqlparse.sql import Identifier, IdentifierList, remove_quotes, Token, TokenList
-from sqlparse.tokens import Keyword, Name, Punctuation, String, Whitespace
+from sqlparse.tokens import DML, Keyword, Name, Punctuation, String, Whitespace
 from sqlparse.utils import imt
 
 RESULT_OPERATIONS = {"UNION", "INTERSECT", "EXCEPT", "SELECT"}
 ON_KEYWORD = "ON"
 PRECEDES_TABLE_NAME = {"FROM", "JOIN", "DESCRIBE", "WITH", "LEFT JOIN", "RIGHT JOIN"}
 CTE_PREFIX = "CTE__"
+# functions and keywords whose results depend on when the query is run
+NON_DETERMINISTIC_KEYWORDS = {
+    "CURRENT_DATE",
+    "CURRENT_TIME",
+    "CURRENT_TIMESTAMP",
+    "GETDATE",
+    "LOCALTIME",
+    "LOCALTIMESTAMP",
+    "NEWID",
+    "NOW",
+    "RAND",
+    "RANDOM",
+    "SYSDATE",
+    "SYSDATETIME",
+    "TABLESAMPLE",
+    "TODAY",
+    "UNIX_TIMESTAMP",
+    "UUID",
+}
+# Number of parsed queries kept around by `get_parsed_query`
+PARSED_QUERY_CACHE_SIZE = 128
 logger = logging.getLogger(__name__)
 
 
@@ -86,6 +109,8 @@ class ParsedQuery:
         self._tables: Set[Table] = set()
         self._alias_names: Set[str] = set()
         self._limit: Optional[int] = None
+        self._tables_lock = threading.Lock()
+        self._tables_extracted = False
 
         logger.debug("Parsing with sqlparse statement: %s", self.sql)
         self._parsed = sqlparse.parse(self.stripped())
@@ -94,13 +119,18 @@ class ParsedQuery:
 
     @property
     def tables(self) -> Set[Table]:
-        if not self._tables:
-            for statement in self._parsed:
-                self._extract_from_token(statement)
-
-            self._tables = {
-                table for table in self._tables if str(table) not in self._alias_names
-            }
+        # the parsed query may be shared across threads by `get_parsed_query`
+        with self._tables_lock:
+            if not self._tables_extracted:
+                for statement in self._parsed:
+                    self._extract_from_token(statement)
+
+                self._tables = {
+                    table
+                    for table in self._tables
+                    if str(table) not in self._alias_names
+                }
+                self._tables_extracted = True
         return self._tables
 
     @property
@@ -110,6 +140,17 @@ class ParsedQuery:
     def is_select(self) -> bool:
         return self._parsed[0].get_type() == "SELECT"
 
+    def is_plain_select(self) -> bool:
+        """
+        A SELECT only returning rows, without an INTO clause nor data modifying
+        statements in its common table expressions
+        """
+        return self.is_select() and not any(
+            (token.ttype is Keyword and token.normalized == "INTO")
+            or (token.ttype is DML and token.normalized != "SELECT")
+            for token in self._parsed[0].flatten()
+        )
+
     def is_explain(self) -> bool:
         return self.stripped().upper().startswith("EXPLAIN")
 
@@ -117,6 +158,18 @@ class ParsedQuery:
         """Pessimistic readonly, 100% sure statement won't mutate anything"""
         return self.is_select() or self.is_explain()
 
+    def is_deterministic(self) -> bool:
+        """
+        Pessimistic determinism, the statements return the same results whenever
+        they are run on the same data
+        """
+        return not any(
+            token.ttype not in String
+            and token.value.upper() in NON_DETERMINISTIC_KEYWORDS
+            for statement in self._parsed
+            for token in statement.flatten()
+        )
+
     def stripped(self) -> str:
         return self.sql.strip(" \t\n;")
 
@@ -276,16 +329,33 @@ class ParsedQuery:
             if item.ttype in Keyword and item.value.lower() == "limit":
                 limit_pos = pos
                 break
-        _, limit = statement.token_next(idx=limit_pos)
-        # Override the limit only when it exceeds the configured value.
+        limit_idx, limit = statement.token_next(idx=limit_pos)
+        # Override the limit only when it exceeds the configured value. The tokens
+        # are left untouched, as the parsed query may be shared.
+        limit_value = str(limit.value)
         if limit.ttype == sqlparse.tokens.Literal.Number.Integer and new_limit < int(
             limit.value
         ):
-            limit.value = new_limit
+            limit_value = str(new_limit)
         elif limit.is_group:
-            limit.value = f"{next(limit.get_identifiers())}, {new_limit}"
+            limit_value = f"{next(limit.get_identifiers())}, {new_limit}"
+
+        return "".join(
+            limit_value if pos == limit_idx else str(item.value)
+            for pos, item in enumerate(statement.tokens)
+        )
+
 
-        str_res = ""
-        for i in statement.tokens:
-            str_res += str(i.value)
-        return str_res
+@lru_cache(maxsize=PARSED_QUERY_CACHE_SIZE)
+def get_parsed_query(sql: str) -> ParsedQuery:
+    """
+    Returns the parsed query, reusing the parsed query of the same SQL if it was
+    parsed recently, as parsing long queries is expensive and the same SQL is
+    usually parsed several times when executed (limit, CTAS, access checks...).
+
+    The parsed query is shared and must not be modified.
+
+    :param sql: The SQL to parse
+    :return: The parsed query
+    """
+    return ParsedQuery(sql)
@@ -24,7 +24,7 @@ from flask import g
 
 from superset import app, security_manager
 from superset.models.core import Database
-from superset.sql_parse import ParsedQuery
+from superset.sql_parse import get_parsed_query
 from superset.sql_validators.base import BaseSQLValidator, SQLValidationAnnotation
 from superset.utils.core import QuerySource
 
@@ -49,7 +49,7 @@ class PrestoDBSQLValidator(BaseSQLValidator):
     ) -> Optional[SQLValidationAnnotation]:
         # pylint: disable=too-many-locals
         db_engine_spec = database.db_engine_spec
-        parsed_query = ParsedQuery(statement)
+        parsed_query = get_parsed_query(statement)
         sql = parsed_query.stripped()
 
         # Hook to allow environment-specific mutation (usually comments) to the SQL
@@ -153,7 +153,7 @@ class PrestoDBSQLValidator(BaseSQLValidator):
         VALIDATE) SELECT 1 FROM default.mytable.
         """
         user_name = g.user.username if g.user else None
-        parsed_query = ParsedQuery(sql)
+        parsed_query = get_parsed_query(sql)
         statements = parsed_query.get_statements()
 
         logger.info("Validating %i statement(s)", len(statements))
@@ -15,7 +15,11 @@
 # specific language governing permissions and limitations
 # under the License.
 import logging
-from typing import Optional
+import math
+import re
+import threading
+from collections import defaultdict
+from typing import Dict, List, Optional, Sequence, Set, Tuple
 
 from colorama import Fore, Style
 
@@ -44,10 +48,31 @@ class BaseStatsLogger:
     def timing(self, key: str, value: float) -> None:
         raise NotImplementedError()
 
-    def gauge(self, key: str) -> None:
-        """Setup a gauge"""
+    def gauge(self, key: str, value: float) -> None:
+        """Set the value of a gauge"""
         raise NotImplementedError()
 
+    def incr_with_tags(  # pylint: disable=unused-argument
+        self, key: str, tags: Optional[Dict[str, str]] = None
+    ) -> None:
+        """Increment a counter labelled with tags, loggers that don't support
+        tags increment the plain counter"""
+        self.incr(key)
+
+    def timing_with_tags(  # pylint: disable=unused-argument
+        self, key: str, value: float, tags: Optional[Dict[str, str]] = None
+    ) -> None:
+        """Record a duration in milliseconds labelled with tags, loggers that don't
+        support tags record the plain timing"""
+        self.timing(key, value)
+
+    def gauge_with_tags(  # pylint: disable=unused-argument
+        self, key: str, value: float, tags: Optional[Dict[str, str]] = None
+    ) -> None:
+        """Set the value of a gauge labelled with tags, loggers that don't support
+        tags set the plain gauge"""
+        self.gauge(key, value)
+
 
 class DummyStatsLogger(BaseStatsLogger):
     def incr(self, key: str) -> None:
@@ -61,11 +86,177 @@ class DummyStatsLogger(BaseStatsLogger):
             (Fore.CYAN + f"[stats_logger] (timing) {key} | {value} " + Style.RESET_ALL)
         )
 
-    def gauge(self, key: str) -> None:
+    def gauge(self, key: str, value: float) -> None:
         logger.debug(
-            (Fore.CYAN + "[stats_logger] (gauge) " + f"{key}" + Style.RESET_ALL)
+            (Fore.CYAN + f"[stats_logger] (gauge) {key} | {value} " + Style.RESET_ALL)
+        )
+
+
+LabelSet = Tuple[Tuple[str, str], ...]
+
+
+class PrometheusStatsLogger(BaseStatsLogger):
+    """
+    Aggregates counters, gauges and latency histograms in process and renders
+    them in the Prometheus text exposition format, served on `/metrics`.
+
+    Note that the metrics are held by each process: when running several web
+    server processes, each one has to be scraped (or a single process used).
+    Counters which are ever decremented are exposed as gauges.
+    """
+
+    # histogram buckets in seconds
+    DEFAULT_BUCKETS = (
+        0.005,
+        0.01,
+        0.025,
+        0.05,
+        0.1,
+        0.25,
+        0.5,
+        1.0,
+        2.5,
+        5.0,
+        10.0,
+        30.0,
+        60.0,
+        300.0,
+    )
+
+    def __init__(
+        self, prefix: str = "superset", buckets: Sequence[float] = DEFAULT_BUCKETS
+    ) -> None:
+        super().__init__(prefix)
+        self.buckets = sorted(buckets) + [math.inf]
+        self._lock = threading.Lock()
+        self._counters: Dict[Tuple[str, LabelSet], float] = defaultdict(float)
+        # the names of the counters which were decremented
+        self._decremented: Set[str] = set()
+        self._gauges: Dict[Tuple[str, LabelSet], float] = defaultdict(float)
+        # bucket counts followed by the sum and the count of the observations
+        self._histograms: Dict[Tuple[str, LabelSet], List[float]] = {}
+
+    def metric_name(self, key: str) -> str:
+        name = re.sub(r"[^a-zA-Z0-9_]", "_", key)
+        if self.prefix:
+            name = f"{self.prefix}_{name}"
+        return name
+
+    @staticmethod
+    def _label_set(tags: Optional[Dict[str, str]]) -> LabelSet:
+        return tuple(sorted((name, str(value)) for name, value in (tags or {}).items()))
+
+    def incr(self, key: str) -> None:
+        self.incr_with_tags(key)
+
+    def decr(self, key: str) -> None:
+        name = self.metric_name(key) + "_total"
+        with self._lock:
+            self._counters[(name, ())] -= 1
+            self._decremented.add(name)
+
+    def timing(self, key: str, value: float) -> None:
+        self.timing_with_tags(key, value)
+
+    def gauge(self, key: str, value: float) -> None:
+        self.gauge_with_tags(key, value)
+
+    def incr_with_tags(self, key: str, tags: Optional[Dict[str, str]] = None) -> None:
+        name = self.metric_name(key) + "_total"
+        with self._lock:
+            self._counters[(name, self._label_set(tags))] += 1
+
+    def timing_with_tags(
+        self, key: str, value: float, tags: Optional[Dict[str, str]] = None
+    ) -> None:
+        name = self.metric_name(key) + "_seconds"
+        seconds = value / 1000
+        with self._lock:
+            histogram = self._histograms.setdefault(
+                (name, self._label_set(tags)), [0.0] * (len(self.buckets) + 2)
+            )
+            for i, bound in enumerate(self.buckets):
+                if seconds <= bound:
+                    histogram[i] += 1
+            histogram[-2] += seconds
+            histogram[-1] += 1
+
+    def gauge_with_tags(
+        self, key: str, value: float, tags: Optional[Dict[str, str]] = None
+    ) -> None:
+        with self._lock:
+            self._gauges[(self.metric_name(key), self._label_set(tags))] = value
+
+    @staticmethod
+    def _format_labels(labels: LabelSet) -> str:
+        if not labels:
+            return ""
+        return (
+            "{"
+            + ",".join(
+                '{}="{}"'.format(
+                    name,
+                    value.replace("\\", "\\\\")
+                    .replace('"', '\\"')
+                    .replace("\n", "\\n"),
+                )
+                for name, value in labels
+            )
+            + "}"
         )
 
+    @staticmethod
+    def _format_value(value: float) -> str:
+        if value == math.inf:
+            return "+Inf"
+        return repr(float(value))
+
+    def render(self) -> str:
+        """Renders the metrics in the Prometheus text exposition format"""
+        with self._lock:
+            counters = sorted(self._counters.items())
+            decremented = set(self._decremented)
+            gauges = sorted(self._gauges.items())
+            histograms = sorted(
+                (key, list(values)) for key, values in self._histograms.items()
+            )
+
+        lines: List[str] = []
+        declared = set()
+
+        def declare(name: str, metric_type: str) -> None:
+            if name not in declared:
+                declared.add(name)
+                lines.append(f"# TYPE {name} {metric_type}")
+
+        for (name, labels), value in counters:
+            declare(name, "gauge" if name in decremented else "counter")
+            lines.append(
+                f"{name}{self._format_labels(labels)} {self._format_value(value)}"
+            )
+        for (name, labels), value in gauges:
+            declare(name, "gauge")
+            lines.append(
+                f"{name}{self._format_labels(labels)} {self._format_value(value)}"
+            )
+        for (name, labels), values in histograms:
+            declare(name, "histogram")
+            for bound, count in zip(self.buckets, values):
+                bucket_labels = labels + (("le", self._format_value(bound)),)
+                lines.append(
+                    f"{name}_bucket{self._format_labels(bucket_labels)} "
+                    f"{self._format_value(count)}"
+                )
+            lines.append(
+                f"{name}_sum{self._format_labels(labels)} "
+                f"{self._format_value(values[-2])}"
+            )
+            lines.append(
+                f"{name}_count{self._format_labels(labels)} "
+                f"{self._format_value(values[-1])}"
+            )
+        return "\n".join(lines) + "\n"
+
 
 try:
     from statsd import StatsClient
@@ -98,9 +289,8 @@ try:
         def timing(self, key: str, value: float) -> None:
             self.client.timing(key, value)
 
-        def gauge(self, key: str) -> None:
-            # pylint: disable=no-value-for-parameter
-            self.client.gauge(key)
+        def gauge(self, key: str, value: float) -> None:
+            self.client.gauge(key, value)
 
 
 except Exception:  # pylint: disable=broad-except
@@ -0,0 +1,65 @@
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+import logging
+from typing import Dict, List, Optional
+
+from superset import db
+from superset.connectors.sqla.models import SqlaTable
+from superset.connectors.sqla.rollups import get_rollups, refresh_rollup
+from superset.extensions import celery_app
+
+logger = logging.getLogger(__name__)
+
+
+@celery_app.task(name="rollups.refresh")
+def refresh_rollups(dataset_id: Optional[int] = None) -> Dict[str, List[str]]:
+    """
+    Materialize or refresh the rollup tables of the datasets, see
+    `superset.connectors.sqla.rollups`.
+
+    :param dataset_id: only refresh the rollups of this dataset
+    :return: the refreshed rollups and the ones which failed
+    """
+    query = db.session.query(SqlaTable).filter(SqlaTable.params.like('%"rollups"%'))
+    if dataset_id is not None:
+        query = query.filter(SqlaTable.id == dataset_id)
+
+    results: Dict[str, List[str]] = {"success": [], "errors": []}
+    for table in query.all():
+        for rollup in get_rollups(table):
+            try:
+                logger.info("Refreshing rollup %s of %s", rollup.name, table)
+                rollup = refresh_rollup(table, rollup)
+            except Exception:  # pylint: disable=broad-except
+                logger.exception("Error refreshing rollup %s", rollup.name)
+                results["errors"].append(rollup.full_table_name)
+                continue
+            definitions = [
+                {
+                    **definition,
+                    "row_count": rollup.row_count,
+                    "refreshed_on": rollup.refreshed_on,
+                    "definition_hash": rollup.definition_hash,
+                }
+                if definition.get("name") == rollup.name
+                else definition
+                for definition in table.params_dict.get("rollups") or []
+            ]
+            table.alter_params(rollups=definitions)
+            db.session.commit()
+            results["success"].append(rollup.full_table_name)
+    return results
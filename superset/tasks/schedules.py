@@ -18,9 +18,9 @@
 """Utility functions used across Superset"""
 
 import logging
-import time
 import urllib.request
-from collections import namedtuple
+from collections import defaultdict, namedtuple
+from contextlib import closing
 from datetime import datetime, timedelta
 from email.utils import make_msgid, parseaddr
 from typing import (
@@ -28,6 +28,7 @@ from typing import (
     Callable,
     Dict,
     Iterator,
+    List,
     NamedTuple,
     Optional,
     Tuple,
@@ -41,7 +42,7 @@ import pandas as pd
 import simplejson as json
 from celery.app.task import Task
 from dateutil.tz import tzlocal
-from flask import current_app, render_template, url_for
+from flask import current_app, g, render_template, url_for
 from flask_babel import gettext as __
 from retry.api import retry_call
 from selenium.common.exceptions import WebDriverException
@@ -55,17 +56,25 @@ from superset.models.alerts import Alert, AlertLog
 from superset.models.core import Database
 from superset.models.dashboard import Dashboard
 from superset.models.schedules import (
+    DashboardEmailSchedule,
     EmailDeliveryType,
     get_scheduler_model,
     ScheduleType,
     SliceEmailReportFormat,
 )
 from superset.models.slice import Slice
-from superset.sql_parse import ParsedQuery
+from superset.sql_parse import get_parsed_query
 from superset.tasks.slack_util import deliver_slack_msg
-from superset.utils.core import get_email_address_list, send_email_smtp
+from superset.utils.core import (
+    get_email_address_list,
+    get_username,
+    send_email_smtp,
+)
+from superset.utils.hashing import md5_sha_from_str
 from superset.utils.screenshots import ChartScreenshot, WebDriverProxy
 from superset.utils.urls import get_url_path
+from superset.utils.webdriver import WindowSize
+from superset.views.utils import get_dashboard_extra_filters, get_form_data, get_viz
 
 # pylint: disable=too-few-public-methods
 
@@ -81,6 +90,7 @@ logger = logging.getLogger("tasks.email_reports")
 logger.setLevel(logging.INFO)
 
 stats_logger = current_app.config["STATS_LOGGER"]
+log_query = config["QUERY_LOGGER"]
 EMAIL_PAGE_RENDER_WAIT = config["EMAIL_PAGE_RENDER_WAIT"]
 WEBDRIVER_BASEURL = config["WEBDRIVER_BASEURL"]
 WEBDRIVER_BASEURL_USER_FRIENDLY = config["WEBDRIVER_BASEURL_USER_FRIENDLY"]
@@ -225,6 +235,22 @@ def destroy_webdriver(
         pass
 
 
+def _get_screenshot(url: str, element_name: str, window: WindowSize) -> bytes:
+    """
+    Takes a screenshot of an element of the page with a pooled webdriver,
+    waiting for the element to be rendered
+    """
+    proxy = WebDriverProxy(
+        driver_type=config["WEBDRIVER_TYPE"],
+        window=window,
+        locate_wait=EMAIL_PAGE_RENDER_WAIT,
+    )
+    screenshot = proxy.get_screenshot(url, element_name, get_reports_user())
+    if not screenshot:
+        raise WebDriverException(f"Unable to take a screenshot of {url}")
+    return screenshot
+
+
 def deliver_dashboard(
     dashboard_id: int,
     recipients: Optional[str],
@@ -245,29 +271,11 @@ def deliver_dashboard(
         "Superset.dashboard", user_friendly=True, dashboard_id_or_slug=dashboard.id
     )
 
-    # Create a driver, fetch the page, wait for the page to render
-    driver = create_webdriver()
-    window = config["WEBDRIVER_WINDOW"]["dashboard"]
-    driver.set_window_size(*window)
-    driver.get(dashboard_url)
-    time.sleep(EMAIL_PAGE_RENDER_WAIT)
-
-    # Set up a function to retry once for the element.
-    # This is buggy in certain selenium versions with firefox driver
-    get_element = getattr(driver, "find_element_by_class_name")
-    element = retry_call(
-        get_element, fargs=["grid-container"], tries=2, delay=EMAIL_PAGE_RENDER_WAIT
+    # Fetch the page and wait for the dashboard to render
+    screenshot = _get_screenshot(
+        dashboard_url, "grid-container", config["WEBDRIVER_WINDOW"]["dashboard"]
     )
 
-    try:
-        screenshot = element.screenshot_as_png
-    except WebDriverException:
-        # Some webdrivers do not support screenshots for elements.
-        # In such cases, take a screenshot of the entire page.
-        screenshot = driver.screenshot()  # pylint: disable=no-member
-    finally:
-        destroy_webdriver(driver)
-
     # Generate the email body and attachments
     report_content = _generate_report_content(
         delivery_type,
@@ -383,37 +391,16 @@ def _get_slice_screenshot(slice_id: int) -> ScreenshotData:
 def _get_slice_visualization(
     slc: Slice, delivery_type: EmailDeliveryType
 ) -> ReportContent:
-    # Create a driver, fetch the page, wait for the page to render
-    driver = create_webdriver()
-    window = config["WEBDRIVER_WINDOW"]["slice"]
-    driver.set_window_size(*window)
-
     slice_url = _get_url_path("Superset.slice", slice_id=slc.id)
     slice_url_user_friendly = _get_url_path(
         "Superset.slice", slice_id=slc.id, user_friendly=True
     )
 
-    driver.get(slice_url)
-    time.sleep(EMAIL_PAGE_RENDER_WAIT)
-
-    # Set up a function to retry once for the element.
-    # This is buggy in certain selenium versions with firefox driver
-    element = retry_call(
-        driver.find_element_by_class_name,
-        fargs=["chart-container"],
-        tries=2,
-        delay=EMAIL_PAGE_RENDER_WAIT,
+    # Fetch the page and wait for the chart to render
+    screenshot = _get_screenshot(
+        slice_url, "chart-container", config["WEBDRIVER_WINDOW"]["slice"]
     )
 
-    try:
-        screenshot = element.screenshot_as_png
-    except WebDriverException:
-        # Some webdrivers do not support screenshots for elements.
-        # In such cases, take a screenshot of the entire page.
-        screenshot = driver.screenshot()  # pylint: disable=no-member
-    finally:
-        destroy_webdriver(driver)
-
     # Generate the email body and attachments
     return _generate_report_content(
         delivery_type, screenshot, slc.slice_name, slice_url_user_friendly
@@ -511,6 +498,48 @@ def schedule_email_report(  # pylint: disable=unused-argument
         raise RuntimeError("Unknown report type")
 
 
+@celery_app.task(
+    name="email_reports.prewarm",
+    bind=True,
+    soft_time_limit=config["EMAIL_ASYNC_TIME_LIMIT_SEC"],
+)
+def prewarm_dashboard_cache(  # pylint: disable=unused-argument
+    task: Task, schedule_id: int
+) -> None:
+    """
+    Runs the queries of the charts of a scheduled dashboard ahead of its email
+    report, so that the report is rendered from the chart cache instead of
+    querying all the charts when the report is due.
+    """
+    schedule = db.session.query(DashboardEmailSchedule).get(schedule_id)
+    if not schedule or not schedule.active:
+        logger.info("Ignoring deactivated schedule")
+        return
+
+    dashboard = schedule.dashboard
+    user = get_reports_user()
+    for slc in dashboard.slices:
+        # build the chart payload as the dashboard does for the reports user,
+        # for the cache keys to match
+        with app.test_request_context():
+            g.user = user
+            try:
+                form_data = get_form_data(slc.id, use_slice_data=True)[0]
+                form_data["extra_filters"] = get_dashboard_extra_filters(
+                    slc.id, dashboard.id
+                )
+                g.form_data = form_data
+                viz_obj = get_viz(
+                    datasource_type=slc.datasource.type,
+                    datasource_id=slc.datasource.id,
+                    form_data=form_data,
+                )
+                viz_obj.get_payload()
+            except Exception:  # pylint: disable=broad-except
+                logger.exception("Failed to warm up the cache of chart %s", slc.id)
+    db.session.commit()
+
+
 @celery_app.task(
     name="alerts.run_query",
     bind=True,
@@ -543,11 +572,9 @@ def schedule_alert_query(  # pylint: disable=unused-argument
                 deliver_alert(schedule.id, recipients, slack_channel)
                 return
 
-            if run_alert_query(
+            run_alert_query(
                 schedule.id, schedule.database_id, schedule.sql, schedule.label
-            ):
-                # deliver_dashboard OR deliver_slice
-                return
+            )
         else:
             raise RuntimeError("Unknown report type")
     except NoSuchColumnError as column_error:
@@ -558,6 +585,25 @@ def schedule_alert_query(  # pylint: disable=unused-argument
         raise resource_error
 
 
+@celery_app.task(
+    name="alerts.run_queries",
+    bind=True,
+    soft_time_limit=config["EMAIL_ASYNC_TIME_LIMIT_SEC"],
+)
+def schedule_alert_queries(  # pylint: disable=unused-argument
+    task: Task, database_id: int, alert_ids: List[int]
+) -> None:
+    """Evaluates a batch of alerts querying the same database"""
+    alerts = (
+        db.session.query(Alert)
+        .filter(Alert.id.in_(alert_ids), Alert.active.is_(True))
+        .all()
+    )
+    run_alert_queries(
+        database_id, [(alert.id, alert.sql, alert.label) for alert in alerts]
+    )
+
+
 class AlertState:
     ERROR = "error"
     TRIGGER = "trigger"
@@ -645,55 +691,52 @@ def deliver_slack_alert(alert_content: AlertContent, slack_channel: str) -> None
     )
 
 
-def run_alert_query(
-    alert_id: int, database_id: int, sql: str, label: str
-) -> Optional[bool]:
+def run_alert_query(alert_id: int, database_id: int, sql: str, label: str) -> None:
     """
-    Execute alert.sql and return value if any rows are returned
+    Execute alert.sql and deliver the alert if it is triggered
     """
-    logger.info("Processing alert ID: %i", alert_id)
-    database = db.session.query(Database).get(database_id)
-    if not database:
-        logger.error("Alert database not preset")
-        return None
-
-    if not sql:
-        logger.error("Alert SQL not preset")
-        return None
+    run_alert_queries(database_id, [(alert_id, sql, label)])
 
-    parsed_query = ParsedQuery(sql)
-    sql = parsed_query.stripped()
 
-    state = None
-    dttm_start = datetime.utcnow()
+def is_alert_triggered(df: pd.DataFrame) -> bool:
+    """Whether any cell of the alert query result is truthy, nulls being falsy"""
+    values = df.to_numpy()
+    return bool((pd.notna(values) & values.astype(bool)).any())
 
-    df = pd.DataFrame()
-    try:
-        logger.info("Evaluating SQL for alert <%s:%s>", alert_id, label)
-        df = database.get_df(sql)
-    except Exception as exc:  # pylint: disable=broad-except
-        state = AlertState.ERROR
-        logging.exception(exc)
-        logging.error("Failed at evaluating alert: %s (%s)", label, alert_id)
-
-    dttm_end = datetime.utcnow()
-    last_eval_dttm = datetime.utcnow()
-
-    if state != AlertState.ERROR:
-        if not df.empty:
-            # Looking for truthy cells
-            for row in df.to_records():
-                if any(row):
-                    state = AlertState.TRIGGER
-                    deliver_alert(alert_id)
-                    break
-        if not state:
-            state = AlertState.PASS
 
+def _get_alert_df(
+    cursor: Any, database: Database, engine: Any, sql: str
+) -> pd.DataFrame:
+    """
+    Executes the statements of the alert SQL, like `Database.get_df`, and
+    returns the result of the last one
+    """
+    db_engine_spec = database.db_engine_spec
+    username = get_username()
+    statements = get_parsed_query(sql).get_statements()
+    for statement in statements[:-1]:
+        if log_query:
+            log_query(engine.url, statement, None, username, __name__, security_manager)
+        db_engine_spec.execute(cursor, statement)
+        cursor.fetchall()
+
+    sql = statements[-1]
+    limit = config["ALERT_QUERY_ROW_LIMIT"]
+    if limit and get_parsed_query(sql).is_select():
+        sql = database.apply_limit_to_sql(sql, limit)
+    if log_query:
+        log_query(engine.url, sql, None, username, __name__, security_manager)
+    db_engine_spec.execute(cursor, sql)
+    return pd.DataFrame(list(db_engine_spec.fetch_data(cursor, limit)))
+
+
+def _record_alert_state(
+    alert_id: int, state: str, dttm_start: datetime, dttm_end: datetime
+) -> None:
     db.session.commit()
     alert = db.session.query(Alert).get(alert_id)
     if state != AlertState.ERROR:
-        alert.last_eval_dttm = last_eval_dttm
+        alert.last_eval_dttm = datetime.utcnow()
     alert.last_state = state
     alert.logs.append(
         AlertLog(
@@ -705,6 +748,64 @@ def run_alert_query(
     )
     db.session.commit()
 
+
+def run_alert_queries(
+    database_id: int, alerts: List[Tuple[int, Optional[str], str]]
+) -> None:
+    """
+    Evaluates alerts sharing the same database, over a single connection
+
+    :param database_id: The id of the database the alerts query
+    :param alerts: The id, SQL and label of each alert
+    """
+    database = db.session.query(Database).get(database_id)
+    if not database:
+        logger.error("Alert database not preset")
+        return None
+
+    engine: Any = None
+    connection: Any = None
+    try:
+        for alert_id, sql, label in alerts:
+            logger.info("Processing alert ID: %i", alert_id)
+            if not sql:
+                logger.error("Alert SQL not preset")
+                continue
+
+            state = None
+            dttm_start = datetime.utcnow()
+
+            df = pd.DataFrame()
+            try:
+                logger.info("Evaluating SQL for alert <%s:%s>", alert_id, label)
+                if connection is None:
+                    engine = database.get_sqla_engine()
+                    connection = engine.raw_connection()
+                with closing(connection.cursor()) as cursor:
+                    df = _get_alert_df(cursor, database, engine, sql)
+            except Exception as exc:  # pylint: disable=broad-except
+                state = AlertState.ERROR
+                logging.exception(exc)
+                logging.error("Failed at evaluating alert: %s (%s)", label, alert_id)
+                # the connection may be left in a failed transaction
+                if connection is not None:
+                    connection.close()
+                    connection = None
+
+            dttm_end = datetime.utcnow()
+
+            if state != AlertState.ERROR:
+                if is_alert_triggered(df):
+                    state = AlertState.TRIGGER
+                    deliver_alert(alert_id)
+                else:
+                    state = AlertState.PASS
+
+            _record_alert_state(alert_id, state, dttm_start, dttm_end)
+    finally:
+        if connection is not None:
+            connection.close()
+
     return None
 
 
@@ -730,6 +831,60 @@ def next_schedules(
         previous = eta
 
 
+def get_schedule_offset(report_type: str, schedule_id: int, window: int) -> int:
+    """
+    A stable offset in seconds, between 0 and the window, for the schedules
+    sharing the same crontab not to run all at the same time
+    """
+    if window <= 0:
+        return 0
+    return int(md5_sha_from_str(f"{report_type}:{schedule_id}"), 16) % window
+
+
+def _schedule_prewarm(dashboard_schedule_id: int, eta: datetime) -> None:
+    """Schedules the warm up of the charts of a dashboard ahead of its report"""
+    prewarm_lead_time = config["EMAIL_REPORTS_PREWARM_LEAD_TIME"]
+    if not prewarm_lead_time:
+        return
+    # the warm ups are spread over the first half of the lead time
+    prewarm_offset = get_schedule_offset(
+        ScheduleType.dashboard, dashboard_schedule_id, prewarm_lead_time // 2
+    )
+    prewarm_eta = eta - timedelta(seconds=prewarm_lead_time - prewarm_offset)
+    if prewarm_eta < datetime.now(eta.tzinfo):
+        # a late warm up would run along with the report
+        return
+    prewarm_dashboard_cache.apply_async((dashboard_schedule_id,), eta=prewarm_eta)
+
+
+def schedule_prewarms(start_at: datetime, resolution: int) -> None:
+    """
+    Schedules the warm ups of the dashboards of the reports due within the
+    prewarm lead time of the next window starting at `start_at`, which are too
+    early to be warmed up when that window is scheduled.
+    """
+    prewarm_lead_time = config["EMAIL_REPORTS_PREWARM_LEAD_TIME"]
+    if not prewarm_lead_time:
+        return
+    stop_at = start_at + timedelta(seconds=prewarm_lead_time)
+    spread = min(resolution, config["EMAIL_REPORTS_SPREAD_WINDOW"])
+
+    dbsession = db.create_scoped_session()
+    schedules = dbsession.query(DashboardEmailSchedule).filter(
+        DashboardEmailSchedule.active.is_(True)
+    )
+    for schedule in schedules:
+        for eta in next_schedules(
+            schedule.crontab, start_at, stop_at, resolution=resolution
+        ):
+            eta += timedelta(
+                seconds=get_schedule_offset(ScheduleType.dashboard, schedule.id, spread)
+            )
+            if eta < stop_at:
+                _schedule_prewarm(schedule.id, eta)
+            break
+
+
 def schedule_window(
     report_type: str, start_at: datetime, stop_at: datetime, resolution: int
 ) -> None:
@@ -737,6 +892,12 @@ def schedule_window(
     Find all active schedules and schedule celery tasks for
     each of them with a specific ETA (determined by parsing
     the cron schedule for the schedule)
+
+    The ETAs are spread within the resolution, and the charts of the dashboards
+    are queried ahead of their reports, so that the reports don't all hit the
+    databases at the same time. The warm ups of the reports due within the
+    prewarm lead time of the window are scheduled with the previous window, see
+    `schedule_prewarms`.
     """
     model_cls = get_scheduler_model(report_type)
 
@@ -745,6 +906,9 @@ def schedule_window(
 
     dbsession = db.create_scoped_session()
     schedules = dbsession.query(model_cls).filter(model_cls.active.is_(True))
+    spread = min(resolution, config["EMAIL_REPORTS_SPREAD_WINDOW"])
+    # alerts querying the same database at the same time are run in one task
+    alert_batches: Dict[Tuple[int, datetime], List[int]] = defaultdict(list)
 
     for schedule in schedules:
         logging.info("Processing schedule %s", schedule)
@@ -762,9 +926,22 @@ def schedule_window(
         for eta in next_schedules(
             schedule.crontab, schedule_start_at, stop_at, resolution=resolution
         ):
+            eta += timedelta(
+                seconds=get_schedule_offset(report_type, schedule.id, spread)
+            )
+            if report_type == ScheduleType.alert:
+                alert_batches[(schedule.database_id, eta)].append(schedule.id)
+                break
+            if report_type == ScheduleType.dashboard and eta >= start_at + timedelta(
+                seconds=config["EMAIL_REPORTS_PREWARM_LEAD_TIME"]
+            ):
+                _schedule_prewarm(schedule.id, eta)
             get_scheduler_action(report_type).apply_async(args, eta=eta)  # type: ignore
             break
 
+    for (database_id, eta), alert_ids in alert_batches.items():
+        schedule_alert_queries.apply_async((database_id, alert_ids), eta=eta)
+
     return None
 
 
@@ -793,6 +970,8 @@ def schedule_hourly() -> None:
     stop_at = start_at + timedelta(seconds=3600)
     schedule_window(ScheduleType.dashboard, start_at, stop_at, resolution)
     schedule_window(ScheduleType.slice, start_at, stop_at, resolution)
+    # the reports due at the start of the next hour are warmed up during this one
+    schedule_prewarms(stop_at, resolution)
 
 
 @celery_app.task(name="alerts.schedule_check")
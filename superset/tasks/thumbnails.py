@@ -18,17 +18,64 @@
 """Utility functions used across Superset"""
 
 import logging
-from typing import Optional
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple, Type
 
 from flask import current_app
+from sqlalchemy import func
 
-from superset import app, security_manager, thumbnail_cache
+from superset import app, db, security_manager, thumbnail_cache
 from superset.extensions import celery_app
-from superset.utils.screenshots import ChartScreenshot, DashboardScreenshot
+from superset.utils.screenshots import (
+    BaseScreenshot,
+    ChartScreenshot,
+    DashboardScreenshot,
+)
 from superset.utils.webdriver import WindowSize
 
 logger = logging.getLogger(__name__)
 
+# Time in seconds a thumbnail computation is considered in flight, other
+# computations of the same thumbnail are skipped in the meantime
+THUMBNAIL_LOCK_TIMEOUT = 300
+
+
+def get_lock_key(cache_key: str) -> str:
+    return f"{cache_key}__computing"
+
+
+def get_screenshot_class(thumbnail_type: str) -> Type[BaseScreenshot]:
+    if thumbnail_type == DashboardScreenshot.thumbnail_type:
+        return DashboardScreenshot
+    return ChartScreenshot
+
+
+def _compute_thumbnail(
+    screenshot: BaseScreenshot,
+    force: bool = False,
+    window_size: Optional[WindowSize] = None,
+    thumb_size: Optional[WindowSize] = None,
+) -> None:
+    """
+    Computes and caches a thumbnail, unless the same thumbnail (same digest and
+    sizes) is already being computed
+    """
+    lock_key = get_lock_key(screenshot.cache_key(window_size, thumb_size))
+    if not thumbnail_cache.add(lock_key, True, timeout=THUMBNAIL_LOCK_TIMEOUT):
+        logger.info("Thumbnail already being computed, skipping: %s", lock_key)
+        return
+    try:
+        user = security_manager.find_user(current_app.config["THUMBNAIL_SELENIUM_USER"])
+        screenshot.compute_and_cache(
+            user=user,
+            cache=thumbnail_cache,
+            force=force,
+            window_size=window_size,
+            thumb_size=thumb_size,
+        )
+    finally:
+        thumbnail_cache.delete(lock_key)
+
 
 @celery_app.task(name="cache_chart_thumbnail", soft_time_limit=300)
 def cache_chart_thumbnail(
@@ -43,11 +90,8 @@ def cache_chart_thumbnail(
             logger.warning("No cache set, refusing to compute")
             return None
         logger.info("Caching chart: %s", url)
-        screenshot = ChartScreenshot(url, digest)
-        user = security_manager.find_user(current_app.config["THUMBNAIL_SELENIUM_USER"])
-        screenshot.compute_and_cache(
-            user=user,
-            cache=thumbnail_cache,
+        _compute_thumbnail(
+            ChartScreenshot(url, digest),
             force=force,
             window_size=window_size,
             thumb_size=thumb_size,
@@ -64,8 +108,116 @@ def cache_dashboard_thumbnail(
             logging.warning("No cache set, refusing to compute")
             return
         logger.info("Caching dashboard: %s", url)
-        screenshot = DashboardScreenshot(url, digest)
-        user = security_manager.find_user(current_app.config["THUMBNAIL_SELENIUM_USER"])
-        screenshot.compute_and_cache(
-            user=user, cache=thumbnail_cache, force=force, thumb_size=thumb_size,
+        _compute_thumbnail(
+            DashboardScreenshot(url, digest), force=force, thumb_size=thumb_size
         )
+
+
+@celery_app.task(name="cache_thumbnails", soft_time_limit=1800)
+def cache_thumbnails(
+    thumbnail_type: str, thumbnails: List[Tuple[str, str]], force: bool = False
+) -> None:
+    """
+    Computes a batch of thumbnails in a row, reusing the same pooled and
+    authenticated webdriver
+
+    :param thumbnail_type: The type of thumbnails, `chart` or `dashboard`
+    :param thumbnails: The url and digest of each thumbnail
+    :param force: Will force the computation even if it's already cached
+    """
+    with app.app_context():  # type: ignore
+        if not thumbnail_cache:
+            logger.warning("No cache set, refusing to compute")
+            return
+        screenshot_class = get_screenshot_class(thumbnail_type)
+        for url, digest in thumbnails:
+            logger.info("Caching %s: %s", thumbnail_type, url)
+            _compute_thumbnail(screenshot_class(url, digest), force=force)
+
+
+def get_recent_view_counts(id_column: str, days: int = 7) -> Dict[int, int]:
+    """
+    Counts the recent views of each chart or dashboard from the logs
+
+    :param id_column: The column of the logs, `slice_id` or `dashboard_id`
+    :param days: How many days back to look at
+    :return: The number of views by chart or dashboard id
+    """
+    # pylint: disable=import-outside-toplevel
+    from superset.models.core import Log
+
+    column = getattr(Log, id_column)
+    since = datetime.utcnow() - timedelta(days=days)
+    query = (
+        db.session.query(column, func.count(Log.id))
+        .filter(Log.dttm >= since, column.isnot(None))
+        .group_by(column)
+    )
+    return dict(query.all())
+
+
+def filter_thumbnails_to_compute(
+    thumbnail_type: str, thumbnails: List[Tuple[str, str]], force: bool = False
+) -> List[Tuple[str, str]]:
+    """
+    Drops the duplicated thumbnails, the ones already being computed and, unless
+    forced, the ones already cached, checking the cache in a single round trip
+
+    :param thumbnail_type: The type of thumbnails, `chart` or `dashboard`
+    :param thumbnails: The url and digest of each thumbnail
+    :param force: Whether the cached thumbnails should be computed again
+    :return: The url and digest of the thumbnails to compute, in the same order
+    """
+    if not thumbnail_cache:
+        logger.warning("No cache set, refusing to compute")
+        return []
+    screenshot_class = get_screenshot_class(thumbnail_type)
+    cache_keys = [
+        screenshot_class(url, digest).cache_key() for url, digest in thumbnails
+    ]
+    lock_keys = [get_lock_key(cache_key) for cache_key in cache_keys]
+    if force:
+        cached = [None] * len(cache_keys)
+        computing = thumbnail_cache.get_many(*lock_keys)
+    else:
+        values = thumbnail_cache.get_many(*cache_keys, *lock_keys)
+        cached, computing = values[: len(cache_keys)], values[len(cache_keys) :]
+
+    seen = set()
+    to_compute = []
+    for thumbnail, cache_key, payload, lock in zip(
+        thumbnails, cache_keys, cached, computing
+    ):
+        if payload or lock or cache_key in seen:
+            continue
+        seen.add(cache_key)
+        to_compute.append(thumbnail)
+    return to_compute
+
+
+def schedule_thumbnails(
+    thumbnail_type: str,
+    thumbnails: List[Tuple[str, str]],
+    force: bool = False,
+    asynchronous: bool = True,
+    batch_size: int = 10,
+) -> int:
+    """
+    Computes the thumbnails which are neither cached nor in flight, in batches
+    of `batch_size` thumbnails per task
+
+    :param thumbnail_type: The type of thumbnails, `chart` or `dashboard`
+    :param thumbnails: The url and digest of each thumbnail, by priority
+    :param force: Will force the computation even if it's already cached
+    :param asynchronous: Whether to compute the thumbnails on the workers
+    :param batch_size: The number of thumbnails computed by each task
+    :return: The number of thumbnails to compute
+    """
+    to_compute = filter_thumbnails_to_compute(thumbnail_type, thumbnails, force)
+    for i in range(0, len(to_compute), batch_size):
+        batch = to_compute[i : i + batch_size]
+        if asynchronous:
+            cache_thumbnails.delay(thumbnail_type, batch, force=force)
+        else:
+            cache_thumbnails(thumbnail_type, batch, force=force)
+    return len(to_compute)
@@ -0,0 +1,333 @@
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+"""
+Admission control of the queries run on the databases. A query waits for a slot
+of its database, and for a slot of its user on this database, before running.
+The slots are leased in the cache shared by the Superset processes, which must be
+a distributed cache such as Redis for the limits to hold across processes. The
+leases are renewed while the queries run, so that the slots of a process which
+died are freed after `QUERY_CONCURRENCY_LEASE_TIMEOUT`.
+
+While slots of a database are contended, the waiting queries of the different
+sources (SQL Lab, charts, dashboards) are admitted in a weighted fair order: the
+next slot goes to the waiting source which got the fewest slots relative to its
+weight, see `QUERY_CONCURRENCY_SOURCE_WEIGHTS`.
+"""
+import logging
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional, TYPE_CHECKING
+
+from flask import current_app, Flask
+from flask_babel import gettext as _
+
+from superset import app, cache
+from superset.errors import ErrorLevel, SupersetErrorType
+from superset.exceptions import SupersetTimeoutException
+from superset.utils import timing
+from superset.utils.core import QuerySource
+from superset.utils.dates import now_as_float
+from superset.utils.timing import trace_stage
+
+if TYPE_CHECKING:
+    # pylint: disable=unused-import
+    from superset.models.core import Database
+
+config = app.config
+stats_logger = config["STATS_LOGGER"]
+logger = logging.getLogger(__name__)
+
+# Seconds between two attempts of a waiting query to get its slots
+POLL_INTERVAL = 0.2
+# Maximum number of waiting queries counted per database and source
+MAX_QUEUE_SIZE = 64
+# Seconds a waiting query is counted in its queue without polling
+QUEUE_HEARTBEAT_TIMEOUT = 10
+# Seconds the number of slots granted to each source is kept
+SERVED_TIMEOUT = 60 * 60 * 24
+
+
+class QueryAdmission:  # pylint: disable=too-many-instance-attributes
+    """
+    The admission of a query on a database, see `admit_query`.
+    """
+
+    def __init__(  # pylint: disable=too-many-arguments
+        self,
+        database_id: int,
+        limits: Dict[str, int],
+        user_name: Optional[str],
+        source: Optional[QuerySource],
+        weights: Dict[str, float],
+        lease_timeout: int,
+    ) -> None:
+        self.database_id = database_id
+        self.database_limit = limits.get("database") or 0
+        self.user_limit = limits.get("user") or 0
+        self.user_name = user_name
+        self.source = source.name if source else QuerySource.CHART.name
+        self.weights = weights
+        self.lease_timeout = lease_timeout
+        # the value of the keys of the admission, so that it only deletes its own
+        self.token = str(uuid.uuid4())
+        self.slot_keys: List[str] = []
+        self.queue_key: Optional[str] = None
+        self._renewal: Optional[threading.Event] = None
+
+    def _key(self, *parts: Any) -> str:
+        return "_".join(["query_admission", str(self.database_id), *map(str, parts)])
+
+    def _database_slot_keys(self) -> List[str]:
+        return [self._key("slot", i) for i in range(self.database_limit)]
+
+    def _user_slot_keys(self) -> List[str]:
+        if not self.user_limit or not self.user_name:
+            return []
+        return [
+            self._key("user", self.user_name, "slot", i) for i in range(self.user_limit)
+        ]
+
+    def _acquire_slot(self, keys: List[str]) -> Optional[str]:
+        for key in keys:
+            if cache.add(key, self.token, timeout=self.lease_timeout):
+                return key
+        return None
+
+    def _delete_owned(self, key: str) -> None:
+        # a lease which expired may have been given to another query since
+        if cache.get(key) == self.token:
+            cache.delete(key)
+
+    def _queue_keys(self, source: str) -> List[str]:
+        return [self._key("queue", source, i) for i in range(MAX_QUEUE_SIZE)]
+
+    def queue_depths(self) -> Dict[str, int]:
+        """The number of queries waiting for a slot of the database per source"""
+        return {
+            source: sum(
+                value is not None for value in cache.get_many(*self._queue_keys(source))
+            )
+            for source in (query_source.name for query_source in QuerySource)
+        }
+
+    def _virtual_time(self, source: str) -> float:
+        served = cache.get(self._key("served", source)) or 0
+        return served / (self.weights.get(source) or 1)
+
+    def _enqueue(self) -> None:
+        # a source back in the queue doesn't get the slots it didn't use meanwhile
+        depths = self.queue_depths()
+        virtual_times = [
+            self._virtual_time(source)
+            for source, depth in depths.items()
+            if depth and source != self.source
+        ]
+        if virtual_times and self._virtual_time(self.source) < min(virtual_times):
+            # an integer, which the cache can increment atomically
+            cache.set(
+                self._key("served", self.source),
+                int(min(virtual_times) * (self.weights.get(self.source) or 1)),
+                timeout=SERVED_TIMEOUT,
+            )
+        self._join_queue()
+
+    def _join_queue(self) -> None:
+        for key in self._queue_keys(self.source):
+            if cache.add(key, self.token, timeout=QUEUE_HEARTBEAT_TIMEOUT):
+                self.queue_key = key
+                return
+
+    def _heartbeat(self) -> None:
+        """Keep the query counted in its queue, joining it again if it expired"""
+        if self.queue_key and cache.get(self.queue_key) == self.token:
+            cache.set(self.queue_key, self.token, timeout=QUEUE_HEARTBEAT_TIMEOUT)
+        else:
+            self.queue_key = None
+            self._join_queue()
+
+    def _dequeue(self) -> None:
+        if self.queue_key:
+            self._delete_owned(self.queue_key)
+            self.queue_key = None
+
+    def _is_turn(self) -> bool:
+        """Whether the source is the most underserved one among the waiting ones"""
+        virtual_time = self._virtual_time(self.source)
+        return all(
+            virtual_time <= self._virtual_time(source)
+            for source, depth in self.queue_depths().items()
+            if depth and source != self.source
+        )
+
+    def try_acquire(self) -> bool:
+        """Try to get the slots of the query, without waiting"""
+        user_slot_keys = self._user_slot_keys()
+        user_slot = self._acquire_slot(user_slot_keys)
+        if user_slot_keys and not user_slot:
+            return False
+        database_slot = None
+        if self.database_limit:
+            if self._is_turn():
+                database_slot = self._acquire_slot(self._database_slot_keys())
+            if not database_slot:
+                if user_slot:
+                    self._delete_owned(user_slot)
+                return False
+
+        self.slot_keys = [key for key in (user_slot, database_slot) if key]
+        served_key = self._key("served", self.source)
+        cache.add(served_key, 0, timeout=SERVED_TIMEOUT)
+        # the backends increment atomically, e.g. Redis, unlike a get and a set
+        cache.cache.inc(served_key)
+        return True
+
+    def acquire(
+        self,
+        timeout: float,
+        on_queued: Optional[Callable[[int], None]] = None,
+        is_stopped: Optional[Callable[[], bool]] = None,
+    ) -> bool:
+        """
+        Wait for the slots of the query.
+
+        :param timeout: the maximum number of seconds to wait
+        :param on_queued: called with the number of queries waiting on the database
+               when the query starts waiting
+        :param is_stopped: called while waiting, whether the query was stopped
+        :returns: whether the query got its slots, `False` if stopped meanwhile
+        :raises SupersetTimeoutException: if the slots aren't free in time
+        """
+        if self.try_acquire():
+            return True
+
+        tags = {"database": str(self.database_id), "source": self.source}
+        start = now_as_float()
+        self._enqueue()
+        try:
+            queue_depth = sum(self.queue_depths().values())
+            stats_logger.gauge_with_tags(
+                "query_admission.queue_depth", queue_depth, tags
+            )
+            if is_stopped and is_stopped():
+                return False
+            if on_queued:
+                on_queued(queue_depth)
+            while not self.try_acquire():
+                if is_stopped and is_stopped():
+                    return False
+                if now_as_float() - start > timeout * 1000:
+                    stats_logger.incr_with_tags("query_admission.timeout", tags)
+                    raise SupersetTimeoutException(
+                        error_type=SupersetErrorType.BACKEND_TIMEOUT_ERROR,
+                        message=_(
+                            "The query waited more than %(timeout)s seconds for "
+                            "the other queries on the database to complete.",
+                            timeout=timeout,
+                        ),
+                        level=ErrorLevel.ERROR,
+                        extra={"timeout": timeout},
+                    )
+                time.sleep(POLL_INTERVAL)
+                self._heartbeat()
+            return True
+        finally:
+            self._dequeue()
+            stats_logger.timing_with_tags(
+                "query_admission.wait_time", now_as_float() - start, tags
+            )
+
+    def _renew_leases(self) -> None:
+        for key in self.slot_keys:
+            if cache.get(key) == self.token:
+                cache.set(key, self.token, timeout=self.lease_timeout)
+
+    def _keep_leases(self, flask_app: Flask, stop: threading.Event) -> None:
+        with flask_app.app_context():  # type: ignore
+            while not stop.wait(self.lease_timeout / 3):
+                try:
+                    self._renew_leases()
+                except Exception:  # pylint: disable=broad-except
+                    logger.warning("Could not renew the query slots", exc_info=True)
+
+    def keep_leases(self) -> None:
+        """Renew the leases of the slots in the background until released"""
+        if not self.slot_keys or self._renewal:
+            return
+        self._renewal = threading.Event()
+        # pylint: disable=protected-access
+        flask_app = current_app._get_current_object()
+        threading.Thread(
+            target=self._keep_leases,
+            args=(flask_app, self._renewal),
+            name="query-admission",
+            daemon=True,
+        ).start()
+
+    def release(self) -> None:
+        if self._renewal:
+            self._renewal.set()
+            self._renewal = None
+        for key in self.slot_keys:
+            self._delete_owned(key)
+        self.slot_keys = []
+
+
+@contextmanager
+def admit_query(
+    database: "Database",
+    user_name: Optional[str] = None,
+    source: Optional[QuerySource] = None,
+    on_queued: Optional[Callable[[int], None]] = None,
+    is_stopped: Optional[Callable[[], bool]] = None,
+) -> Iterator[bool]:
+    """
+    Run a query on a database once admitted, within its concurrency limits, see
+    `QUERY_CONCURRENCY_LIMITS`.
+
+    :param database: the database
+    :param user_name: the user running the query
+    :param source: the source of the query
+    :param on_queued: called with the number of waiting queries when the query
+           has to wait
+    :param is_stopped: called while waiting, whether the query was stopped
+    :returns: whether the query was admitted, `False` if stopped while waiting
+    :raises SupersetTimeoutException: if the query waited for too long
+    """
+    limits = database.concurrency_limits
+    if not limits:
+        yield True
+        return
+
+    admission = QueryAdmission(
+        database.id,
+        limits,
+        user_name,
+        source,
+        config["QUERY_CONCURRENCY_SOURCE_WEIGHTS"],
+        config["QUERY_CONCURRENCY_LEASE_TIMEOUT"],
+    )
+    try:
+        with trace_stage(timing.ADMISSION_WAIT):
+            admitted = admission.acquire(
+                config["QUERY_ADMISSION_TIMEOUT"], on_queued, is_stopped
+            )
+        admission.keep_leases()
+        yield admitted
+    finally:
+        admission.release()
@@ -0,0 +1,226 @@
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+"""
+Cancellation of the queries run by the chart data requests. The cursors running
+the queries of a request are registered under the request id sent by the client,
+and cancelled on the database when the client asks for it, e.g. when a chart
+request is aborted, or when the request outlives the webserver timeout.
+
+The cancellations are requested through the cache, as the process handling the
+cancel request is usually not the one running the queries: a watcher thread of
+each process polls the cache for the cancellation of its running queries.
+"""
+import logging
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Any, Dict, Iterator, List, Optional, TYPE_CHECKING
+
+from flask import current_app, Flask, g, has_request_context, request
+
+from superset import app, cache
+
+if TYPE_CHECKING:
+    # pylint: disable=unused-import
+    from superset.models.core import Database
+
+config = app.config
+stats_logger = config["STATS_LOGGER"]
+logger = logging.getLogger(__name__)
+
+# Seconds between two checks of the cancellation requests by the watcher thread
+POLL_INTERVAL = 1.0
+# Seconds a cancellation request is kept until handled by the process running
+# the queries of its request
+CANCEL_REQUEST_TIMEOUT = 60
+
+
+@dataclass
+class RunningQuery:
+    cursor: Any
+    database: "Database"
+    user_id: Optional[int]
+    deadline: Optional[float]
+    cancel_query_id: Optional[str] = None
+
+
+def get_cancel_key(request_id: str) -> str:
+    return f"query_cancel_{request_id}"
+
+
+def get_request_id() -> Optional[str]:
+    """The id of the current chart data request, as sent by the client"""
+    if not has_request_context():  # type: ignore
+        return None
+    return request.args.get("request_id")
+
+
+def get_user_id() -> Optional[int]:
+    user = getattr(g, "user", None) if has_request_context() else None  # type: ignore
+    return user.get_id() if user else None
+
+
+class QueryCancellationRegistry:
+    """The queries of the chart data requests running in the current process"""
+
+    def __init__(self) -> None:
+        self._queries: Dict[str, List[RunningQuery]] = defaultdict(list)
+        self._lock = threading.Lock()
+        self._watcher: Optional[threading.Thread] = None
+
+    @contextmanager
+    def register(self, cursor: Any, database: "Database") -> Iterator[None]:
+        """
+        Register the cursor running the queries of the current request while in
+        the context, so that they can be cancelled.
+
+        :param cursor: the DB-API cursor
+        :param database: the database of the cursor
+        """
+        request_id = get_request_id()
+        if not request_id:
+            yield
+            return
+
+        timeout = config["SUPERSET_WEBSERVER_TIMEOUT"]
+        query = RunningQuery(
+            cursor=cursor,
+            database=database,
+            user_id=get_user_id(),
+            deadline=time.time() + timeout if timeout else None,
+        )
+        try:
+            query.cancel_query_id = database.db_engine_spec.get_cancel_query_id(
+                cursor, database
+            )
+        except Exception:  # pylint: disable=broad-except
+            logger.warning("Could not get the cancel query id", exc_info=True)
+        with self._lock:
+            self._queries[request_id].append(query)
+        self._start_watcher()
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._queries[request_id].remove(query)
+                if not self._queries[request_id]:
+                    del self._queries[request_id]
+
+    @staticmethod
+    def _cancel_query(query: RunningQuery) -> bool:
+        try:
+            cancelled = query.database.db_engine_spec.cancel_query(
+                query.cursor, query.database, query.cancel_query_id
+            )
+        except Exception:  # pylint: disable=broad-except
+            logger.warning("Could not cancel the query", exc_info=True)
+            return False
+        if cancelled:
+            stats_logger.incr("query_cancellation.cancelled")
+        return cancelled
+
+    def cancel(self, request_id: str, user_id: Optional[int]) -> int:
+        """
+        Cancel the queries of a request running in the current process.
+
+        :param request_id: the id of the request
+        :param user_id: the user asking for the cancellation, who must be the user
+               of the request
+        :return: the number of cancelled queries
+        """
+        # cancelling can take a round trip to the database, not while locked
+        with self._lock:
+            queries = [
+                query
+                for query in self._queries.get(request_id, [])
+                if query.user_id == user_id
+            ]
+        return sum(self._cancel_query(query) for query in queries)
+
+    def request_cancel(self, request_ids: List[str], user_id: Optional[int]) -> None:
+        """
+        Cancel the queries of requests, whichever process runs them.
+
+        :param request_ids: the ids of the requests
+        :param user_id: the user asking for the cancellation
+        """
+        for request_id in request_ids:
+            if self.cancel(request_id, user_id):
+                continue
+            cache.set(
+                get_cancel_key(request_id),
+                {"user_id": user_id},
+                timeout=CANCEL_REQUEST_TIMEOUT,
+            )
+
+    def _start_watcher(self) -> None:
+        with self._lock:
+            if self._watcher and self._watcher.is_alive():
+                return
+            # pylint: disable=protected-access
+            flask_app = current_app._get_current_object()
+            self._watcher = threading.Thread(
+                target=self._watch,
+                args=(flask_app,),
+                name="query-cancellation",
+                daemon=True,
+            )
+            self._watcher.start()
+
+    def _watch(self, flask_app: Flask) -> None:
+        with flask_app.app_context():  # type: ignore
+            while True:
+                time.sleep(POLL_INTERVAL)
+                try:
+                    self._check()
+                except Exception:  # pylint: disable=broad-except
+                    logger.warning(
+                        "Could not check the query cancellations", exc_info=True
+                    )
+
+    def _check(self) -> None:
+        """Cancel the queries asked to be cancelled, or past their deadline"""
+        with self._lock:
+            request_ids = list(self._queries)
+        if not request_ids:
+            return
+
+        cancel_keys = [get_cancel_key(request_id) for request_id in request_ids]
+        cancel_requests = cache.get_many(*cancel_keys)
+        now = time.time()
+        for request_id, cancel_key, cancel_request in zip(
+            request_ids, cancel_keys, cancel_requests
+        ):
+            if cancel_request:
+                self.cancel(request_id, cancel_request.get("user_id"))
+                cache.delete(cancel_key)
+            with self._lock:
+                expired = [
+                    query
+                    for query in self._queries.get(request_id, [])
+                    if query.deadline and query.deadline < now
+                ]
+                for query in expired:
+                    query.deadline = None
+            for query in expired:
+                logger.info("Cancelling a query of request %s", request_id)
+                self._cancel_query(query)
+
+
+query_cancellation = QueryCancellationRegistry()
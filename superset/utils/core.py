@@ -356,6 +356,81 @@ def parse_past_timedelta(delta_str: str) -> timedelta:
     )
 
 
+# time grains which buckets start at the same instants on all the databases: the
+# durations dividing a day, and the months of the year the buckets start on
+TIME_GRAIN_DURATIONS: Dict[str, timedelta] = {
+    "PT1S": timedelta(seconds=1),
+    "PT1M": timedelta(minutes=1),
+    "PT5M": timedelta(minutes=5),
+    "PT10M": timedelta(minutes=10),
+    "PT15M": timedelta(minutes=15),
+    "PT0.5H": timedelta(minutes=30),
+    "PT1H": timedelta(hours=1),
+    "P1D": timedelta(days=1),
+}
+TIME_GRAIN_MONTHS: Dict[str, Tuple[int, ...]] = {
+    "P1M": tuple(range(1, 13)),
+    "P0.25Y": (1, 4, 7, 10),
+    "P1Y": (1,),
+}
+
+
+def is_time_grain_start(dttm: datetime, time_grain: Optional[str]) -> bool:
+    """
+    Checks whether a datetime is the start of a time grain bucket, meaning that a
+    time range starting or ending at this datetime only covers whole buckets.
+
+    :param dttm: the datetime
+    :param time_grain: the ISO 8601 duration of the time grain, `None` for the
+           timestamps themselves
+    :return: `False` if not a bucket start or if the buckets of the time grain
+             depend on the database
+    """
+    if not time_grain:
+        return True
+    time_of_day = dttm - datetime.combine(dttm.date(), time(), dttm.tzinfo)
+    if time_grain in TIME_GRAIN_DURATIONS:
+        return time_of_day % TIME_GRAIN_DURATIONS[time_grain] == timedelta()
+    if time_grain in TIME_GRAIN_MONTHS:
+        return (
+            not time_of_day
+            and dttm.day == 1
+            and dttm.month in TIME_GRAIN_MONTHS[time_grain]
+        )
+    return False
+
+
+def is_time_grain_multiple(
+    time_grain: Optional[str], base_time_grain: Optional[str]
+) -> bool:
+    """
+    Checks whether each bucket of a time grain is a union of buckets of another
+    time grain, meaning that it can be computed from the buckets of the latter.
+
+    :param time_grain: the ISO 8601 duration of the time grain
+    :param base_time_grain: the ISO 8601 duration of the base time grain
+    :return: `False` if not a multiple or if the buckets of one of the time grains
+             depend on the database
+    """
+    if time_grain == base_time_grain:
+        return True
+    if not time_grain or not base_time_grain:
+        return False
+    if base_time_grain in TIME_GRAIN_MONTHS:
+        return time_grain in TIME_GRAIN_MONTHS and set(
+            TIME_GRAIN_MONTHS[time_grain]
+        ) <= set(TIME_GRAIN_MONTHS[base_time_grain])
+    if base_time_grain not in TIME_GRAIN_DURATIONS:
+        return False
+    if time_grain in TIME_GRAIN_DURATIONS:
+        return (
+            TIME_GRAIN_DURATIONS[time_grain] % TIME_GRAIN_DURATIONS[base_time_grain]
+            == timedelta()
+        )
+    # weeks and months start at midnight, whatever the day they start on
+    return "P1W" in time_grain or time_grain in TIME_GRAIN_MONTHS
+
+
 class JSONEncodedDict(TypeDecorator):  # pylint: disable=abstract-method
     """Represents an immutable structure as a json-encoded string."""
 
@@ -1537,6 +1612,7 @@ class ChartDataResultFormat(str, Enum):
 
     CSV = "csv"
     JSON = "json"
+    COLUMNAR = "columnar"
 
 
 class TemporalType(str, Enum):
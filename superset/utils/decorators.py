@@ -17,7 +17,7 @@
 import logging
 from datetime import datetime, timedelta
 from functools import wraps
-from typing import Any, Callable, Iterator
+from typing import Any, Callable, Dict, Iterator, Optional
 
 from contextlib2 import contextmanager
 from flask import request
@@ -35,7 +35,11 @@ logger = logging.getLogger(__name__)
 
 
 @contextmanager
-def stats_timing(stats_key: str, stats_logger: BaseStatsLogger) -> Iterator[float]:
+def stats_timing(
+    stats_key: str,
+    stats_logger: BaseStatsLogger,
+    tags: Optional[Dict[str, str]] = None,
+) -> Iterator[float]:
     """Provide a transactional scope around a series of operations."""
     start_ts = now_as_float()
     try:
@@ -43,7 +47,10 @@ def stats_timing(stats_key: str, stats_logger: BaseStatsLogger) -> Iterator[floa
     except Exception as ex:
         raise ex
     finally:
-        stats_logger.timing(stats_key, now_as_float() - start_ts)
+        if tags:
+            stats_logger.timing_with_tags(stats_key, now_as_float() - start_ts, tags)
+        else:
+            stats_logger.timing(stats_key, now_as_float() - start_ts)
 
 
 def etag_cache(max_age: int, check_perms: Callable[..., Any]) -> Callable[..., Any]:
@@ -0,0 +1,264 @@
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+"""
+Vectorized geospatial helpers.
+
+The functions in this module operate on whole columns at once and return the
+exact same values as their row-wise counterparts in `python-geohash` and
+`geopy`. Values that can't be handled by the vectorized code paths (invalid or
+very long geohashes, point strings in a format other than "lat, lon") fall back
+to the row-wise implementations, which are also responsible for raising errors.
+"""
+from typing import Any, Sequence, Tuple
+
+import geohash as geohash_lib
+import numpy as np
+import pandas as pd
+from geopy.point import Point
+from pandas.api.types import infer_dtype
+
+GEOHASH_BASE32 = "0123456789bcdefghjkmnpqrstuvwxyz"
+# longer geohashes have more bits than a float can represent exactly
+MAX_VECTORIZED_GEOHASH_LENGTH = 20
+MAX_VECTORIZED_GEOHASH_PRECISION = 12
+# `geohash.encode` doesn't round tiny non-zero coordinates consistently
+MIN_VECTORIZED_GEOHASH_COORDINATE = 1e-12
+
+_BASE32_CODES = np.frombuffer(GEOHASH_BASE32.encode(), dtype=np.uint8)
+_BASE32_VALUES = np.full(256, -1, dtype=np.int8)
+_BASE32_VALUES[_BASE32_CODES] = np.arange(32)
+# the padding of shorter strings, see `geohash_decode`
+_BASE32_VALUES[0] = 0
+# The bits of a geohash alternate between the longitude and the latitude, so each
+# character holds 3 bits of one and 2 bits of the other, in this order:
+# characters at even positions start with the longitude, odd ones with the latitude
+_DIGITS = np.arange(32)
+_SPLIT_3 = (_DIGITS >> 2 & 4) | (_DIGITS >> 1 & 2) | (_DIGITS & 1)
+_SPLIT_2 = (_DIGITS >> 2 & 2) | (_DIGITS >> 1 & 1)
+_MERGE = np.empty(32, dtype=np.int64)
+_MERGE[_SPLIT_3 << 2 | _SPLIT_2] = _DIGITS
+
+# "lat, lon" pairs of plain decimal numbers, the format used by most datasets, are
+# converted in bulk, other formats are parsed by `Point`
+_POINT_PATTERN = r"^ *(-?[0-9]+(?:\.[0-9]+)?) *, *(-?[0-9]+(?:\.[0-9]+)?) *\Z"
+
+
+def _code_points(
+    values: np.ndarray, max_length: int
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Return the indexes of the strings of at most `max_length` characters among
+    values, their code points padded with zeros, with one row per position for
+    faster access, and their lengths.
+    """
+    if infer_dtype(values, skipna=False) == "string":
+        indexes = np.arange(len(values))
+    else:
+        indexes = np.flatnonzero(
+            np.fromiter(
+                (isinstance(value, str) for value in values),
+                dtype=bool,
+                count=len(values),
+            )
+        )
+    lengths = np.fromiter(map(len, values[indexes]), dtype=np.intp, count=len(indexes))
+    strings = values[indexes].astype(str)
+    # numpy drops the trailing null characters of strings
+    keep = (lengths <= max_length) & (np.char.str_len(strings) == lengths)
+    width = max(min(strings.dtype.itemsize // 4, max_length), 1)
+    strings = strings[keep].astype(f"U{width}")
+    code_points = strings.view(np.uint32).reshape(len(strings), width)
+    return indexes[keep], np.ascontiguousarray(code_points.T), lengths[keep]
+
+
+def _geohash_bits(length: Any) -> Tuple[Any, Any]:
+    """Return the number of bits of the latitude and longitude of a geohash"""
+    return length // 2 * 5 + length % 2 * 2, length // 2 * 5 + length % 2 * 3
+
+
+def _cell_centers(ints: np.ndarray, bits: np.ndarray, span: float) -> np.ndarray:
+    """Return the centers of the cells of a geohash along one axis"""
+    half = np.ldexp(1.0, bits - 1)
+    return (ints - half) / half * span + span / (2 * half)
+
+
+def _decode_cells(
+    digits: np.ndarray, lengths: np.ndarray
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Return the latitudes and longitudes of the center of the cells of valid
+    geohashes, given as base32 digits with one row per position.
+    """
+    width = len(digits)
+    lat_ints = np.zeros(len(lengths), dtype=np.int64)
+    lon_ints = np.zeros(len(lengths), dtype=np.int64)
+    for position in range(width):
+        digit = digits[position]
+        if position % 2 == 0:
+            lon_ints = lon_ints << 3 | _SPLIT_3[digit]
+            lat_ints = lat_ints << 2 | _SPLIT_2[digit]
+        else:
+            lat_ints = lat_ints << 3 | _SPLIT_3[digit]
+            lon_ints = lon_ints << 2 | _SPLIT_2[digit]
+    # drop the bits of the padding of the shorter geohashes
+    lat_bits, lon_bits = _geohash_bits(lengths)
+    max_lat_bits, max_lon_bits = _geohash_bits(width)
+    lat_ints >>= max_lat_bits - lat_bits
+    lon_ints >>= max_lon_bits - lon_bits
+    return (
+        _cell_centers(lat_ints, lat_bits, 90.0),
+        _cell_centers(lon_ints, lon_bits, 180.0),
+    )
+
+
+def geohash_decode(geohashes: Sequence[Any]) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Decode geohashes into the latitudes and longitudes of the center of their
+    cells, like `geohash.decode` does for a single geohash.
+
+    :param geohashes: the geohashes to decode
+    :return: a tuple of arrays of latitudes and longitudes
+    :raises ValueError: if a geohash is invalid
+    """
+    values = np.asarray(geohashes, dtype=object)
+    latitudes = np.empty(len(values), dtype=np.float64)
+    longitudes = np.empty(len(values), dtype=np.float64)
+    fallback = np.ones(len(values), dtype=bool)
+    indexes, code_points, lengths = _code_points(values, MAX_VECTORIZED_GEOHASH_LENGTH)
+    if indexes.size:
+        digits = _BASE32_VALUES[np.minimum(code_points, 255)]
+        width = len(code_points)
+        valid = np.all(digits >= 0, axis=0) & (
+            np.count_nonzero(code_points == 0, axis=0) == width - lengths
+        )
+        indexes, lengths = indexes[valid], lengths[valid]
+        if not valid.all():
+            digits = digits[:, valid]
+
+        latitudes[indexes], longitudes[indexes] = _decode_cells(digits, lengths)
+        fallback[indexes] = False
+
+    for idx in np.flatnonzero(fallback):
+        cell = geohash_lib.decode(values[idx])
+        latitudes[idx], longitudes[idx] = cell[0], cell[1]
+    return latitudes, longitudes
+
+
+def _quantize(values: np.ndarray, bits: int) -> np.ndarray:
+    """
+    Return the `bits` most significant bits of the 64 bit fixed-point
+    representation of values in [-1, 1) used by `geohash.encode`.
+    """
+    half = 2 ** (bits - 1)
+    return (half + np.floor(values * float(half))).astype(np.int64)
+
+
+def _wrap_longitudes(lons: np.ndarray) -> None:
+    """Wrap longitudes in place, one turn at a time like `geohash.encode`"""
+    while True:
+        below = lons < -180.0
+        above = lons >= 180.0
+        if not (below.any() or above.any()):
+            return
+        lons[below] += 360.0
+        lons[above] -= 360.0
+
+
+def _encode_cells(lats: np.ndarray, lons: np.ndarray, precision: int) -> np.ndarray:
+    """Return the geohashes of valid latitudes and longitudes"""
+    lat_bits, lon_bits = _geohash_bits(precision)
+    lat_ints = _quantize(lats / 90.0, lat_bits)
+    lon_ints = _quantize(lons / 180.0, lon_bits)
+    chars = np.empty((len(lats), precision), dtype=np.uint8)
+    for position in range(precision):
+        if position % 2 == 0:
+            lon_bits, lat_bits = lon_bits - 3, lat_bits - 2
+            merged = (lon_ints >> lon_bits & 7) << 2 | lat_ints >> lat_bits & 3
+        else:
+            lat_bits, lon_bits = lat_bits - 3, lon_bits - 2
+            merged = (lat_ints >> lat_bits & 7) << 2 | lon_ints >> lon_bits & 3
+        chars[:, position] = _BASE32_CODES[_MERGE[merged]]
+    return chars.view(f"S{precision}").ravel().astype(str).astype(object)
+
+
+def geohash_encode(
+    latitudes: Sequence[float], longitudes: Sequence[float], precision: int = 12,
+) -> np.ndarray:
+    """
+    Encode latitudes and longitudes into geohashes, like `geohash.encode` does for
+    a single point.
+
+    :param latitudes: the latitudes, in the [-90, 90) range
+    :param longitudes: the longitudes, wrapped into the [-180, 180) range
+    :param precision: the length of the geohashes
+    :return: an array of geohashes
+    :raises ValueError: if a latitude or longitude is out of range
+    """
+    lats = np.asarray(latitudes, dtype=np.float64)
+    lons = np.array(longitudes, dtype=np.float64)
+    if not (np.all(np.isfinite(lats)) and np.all(np.isfinite(lons))):
+        raise ValueError("invalid latitude or longitude.")
+    if np.any((lats >= 90.0) | (lats < -90.0)):
+        raise ValueError("invalid latitude.")
+    _wrap_longitudes(lons)
+
+    if precision > MAX_VECTORIZED_GEOHASH_PRECISION:
+        return np.array(
+            [
+                geohash_lib.encode(lat, lon, precision)
+                for lat, lon in zip(lats.tolist(), lons.tolist())
+            ],
+            dtype=object,
+        )
+
+    geohashes = _encode_cells(lats, lons, precision)
+
+    tiny = ((lats != 0) & (np.abs(lats) < MIN_VECTORIZED_GEOHASH_COORDINATE)) | (
+        (lons != 0) & (np.abs(lons) < MIN_VECTORIZED_GEOHASH_COORDINATE)
+    )
+    for idx in np.flatnonzero(tiny):
+        geohashes[idx] = geohash_lib.encode(lats[idx], lons[idx], precision)
+    return geohashes
+
+
+def parse_points(points: Sequence[Any]) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Parse point strings into latitudes, longitudes and altitudes, like
+    `geopy.point.Point` does for a single point. Plain "lat, lon" strings are
+    converted in bulk, other formats are parsed by `Point`.
+
+    :param points: the point strings to parse
+    :return: a tuple of arrays of latitudes, longitudes and altitudes (in km)
+    :raises ValueError: if a point can't be parsed
+    """
+    values = np.asarray(points, dtype=object)
+    latitudes = np.empty(len(values), dtype=np.float64)
+    longitudes = np.empty(len(values), dtype=np.float64)
+    altitudes = np.zeros(len(values), dtype=np.float64)
+    matches = pd.Series(values, dtype=object).str.extract(_POINT_PATTERN)
+    # `Point` turns -0 into 0
+    coordinates = matches.astype(np.float64).to_numpy() + 0.0
+    lats, lons = coordinates[:, 0], coordinates[:, 1]
+    # `Point` normalizes or rejects out of range coordinates
+    parsed = (np.abs(lats) <= 90.0) & (np.abs(lons) <= 180.0)
+    latitudes[parsed] = lats[parsed]
+    longitudes[parsed] = lons[parsed]
+
+    for idx in np.flatnonzero(~parsed):
+        point = Point(values[idx])
+        latitudes[idx], longitudes[idx], altitudes[idx] = point[0], point[1], point[2]
+    return latitudes, longitudes, altitudes
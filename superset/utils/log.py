@@ -14,16 +14,21 @@
 # KIND, either express or implied.  See the License for the
 # specific language governing permissions and limitations
 # under the License.
+import atexit
 import functools
 import inspect
 import json
 import logging
+import os
 import textwrap
+import threading
+import time
 from abc import ABC, abstractmethod
 from datetime import datetime
-from typing import Any, Callable, cast, Optional, Type
+from queue import Empty, Full, Queue
+from typing import Any, Callable, cast, Dict, List, Optional, Type
 
-from flask import current_app, g, request
+from flask import current_app, Flask, g, request
 from sqlalchemy.exc import SQLAlchemyError
 
 from superset.stats_logger import BaseStatsLogger
@@ -141,39 +146,161 @@ def get_event_logger_from_cfg_value(cfg_value: Any) -> AbstractEventLogger:
 
 
 class DBEventLogger(AbstractEventLogger):
-    def log(  # pylint: disable=too-many-locals
+    def log(
         self, user_id: Optional[int], action: str, *args: Any, **kwargs: Any
     ) -> None:
-        from superset.models.core import Log
+        self.save_logs(self.get_log_records(user_id, action, **kwargs))
 
+    @staticmethod
+    def get_log_records(
+        user_id: Optional[int], action: str, **kwargs: Any
+    ) -> List[Dict[str, Any]]:
+        """Turns the logged event into the attributes of the `Log` rows to store"""
         records = kwargs.get("records", list())
         dashboard_id = kwargs.get("dashboard_id")
         slice_id = kwargs.get("slice_id")
         duration_ms = kwargs.get("duration_ms")
         referrer = kwargs.get("referrer")
 
-        logs = list()
+        log_records: List[Dict[str, Any]] = []
         for record in records:
             json_string: Optional[str]
             try:
                 json_string = json.dumps(record)
             except Exception:  # pylint: disable=broad-except
                 json_string = None
-            log = Log(
-                action=action,
-                json=json_string,
-                dashboard_id=dashboard_id,
-                slice_id=slice_id,
-                duration_ms=duration_ms,
-                referrer=referrer,
-                user_id=user_id,
+            log_records.append(
+                {
+                    "action": action,
+                    "json": json_string,
+                    "dashboard_id": dashboard_id,
+                    "slice_id": slice_id,
+                    "duration_ms": duration_ms,
+                    "referrer": referrer,
+                    "user_id": user_id,
+                    "dttm": datetime.utcnow(),
+                }
             )
-            logs.append(log)
+        return log_records
+
+    @staticmethod
+    def save_logs(log_records: List[Dict[str, Any]]) -> None:
+        from superset.models.core import Log
 
+        logs = [Log(**log_record) for log_record in log_records]
+        sesh = current_app.appbuilder.get_session
         try:
-            sesh = current_app.appbuilder.get_session
             sesh.bulk_save_objects(logs)
             sesh.commit()
         except SQLAlchemyError as ex:
+            sesh.rollback()
             logging.error("DBEventLogger failed to log event(s)")
             logging.exception(ex)
+
+
+# marks the end of the records to flush
+_STOP = object()
+
+
+class BufferedDBEventLogger(DBEventLogger):
+    """
+    Event logger that keeps the request path free of metadata database writes.
+
+    Log records are put on a bounded in-process queue and written in batches by
+    a background thread, either when `batch_size` records are pending or when
+    the oldest pending record is `flush_interval` seconds old. Records are
+    dropped, and counted with the `event_logger.dropped` metric, when the
+    queue is full. Pending records are flushed when the process exits.
+    """
+
+    def __init__(
+        self,
+        batch_size: int = 100,
+        flush_interval: float = 5.0,
+        max_queue_size: int = 10000,
+    ) -> None:
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue: "Queue[Any]" = Queue(maxsize=max_queue_size)
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._pid: Optional[int] = None
+
+    def log(
+        self, user_id: Optional[int], action: str, *args: Any, **kwargs: Any
+    ) -> None:
+        self._ensure_started()
+        dropped = 0
+        for log_record in self.get_log_records(user_id, action, **kwargs):
+            try:
+                self._queue.put_nowait(log_record)
+            except Full:
+                dropped += 1
+        if dropped:
+            logging.warning("Event logger queue is full, dropped %i event(s)", dropped)
+            self.stats_logger.incr("event_logger.dropped")
+        self.stats_logger.gauge("event_logger.queue_size", self._queue.qsize())
+
+    def _ensure_started(self) -> None:
+        # the flushing thread doesn't survive a fork, e.g. of gunicorn workers,
+        # so it is started lazily in the process that logs
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            if self._pid is not None:
+                # records queued before the fork belong to the parent process
+                self._queue = Queue(maxsize=self._queue.maxsize)
+            app = current_app._get_current_object()  # pylint: disable=protected-access
+            self._thread = threading.Thread(
+                target=self._run, args=(app,), name="event-logger", daemon=True,
+            )
+            self._thread.start()
+            self._pid = os.getpid()
+            atexit.register(self.shutdown)
+
+    def _run(self, app: Flask) -> None:
+        batch: List[Dict[str, Any]] = []
+        deadline = 0.0
+        while True:
+            timeout = max(deadline - time.monotonic(), 0) if batch else None
+            try:
+                log_record = self._queue.get(timeout=timeout)
+            except Empty:
+                log_record = None
+            if log_record is _STOP:
+                self._flush(app, batch)
+                return
+            if log_record:
+                if not batch:
+                    deadline = time.monotonic() + self.flush_interval
+                batch.append(log_record)
+            if len(batch) >= self.batch_size or (
+                batch and time.monotonic() >= deadline
+            ):
+                self._flush(app, batch)
+                batch = []
+
+    def _flush(self, app: Flask, batch: List[Dict[str, Any]]) -> None:
+        if not batch:
+            return
+        # a failed batch is lost, but must not stop the thread
+        try:
+            with app.app_context():  # type: ignore
+                self.save_logs(batch)
+        except Exception:  # pylint: disable=broad-except
+            logging.exception("Event logger failed to write %i event(s)", len(batch))
+
+    def shutdown(self, timeout: float = 10.0) -> None:
+        """Flushes the pending records and stops the background thread"""
+        if self._thread is None or self._pid != os.getpid():
+            return
+        try:
+            self._queue.put(_STOP, timeout=timeout)
+        except Full:
+            logging.warning("Event logger queue is full, pending events are lost")
+            return
+        self._thread.join(timeout)
+        self._thread = None
+        self._pid = None
@@ -14,16 +14,15 @@
 # KIND, either express or implied.  See the License for the
 # specific language governing permissions and limitations
 # under the License.
-from functools import partial
+from functools import partial, wraps
 from typing import Any, Callable, cast, Dict, List, Optional, Tuple, Union
 
-import geohash as geohash_lib
 import numpy as np
 from flask_babel import gettext as _
-from geopy.point import Point
 from pandas import DataFrame, NamedAgg, Series
 
 from superset.exceptions import QueryObjectValidationError
+from superset.utils import geo
 from superset.utils.core import DTTM_ALIAS, PostProcessingContributionOrientation
 
 ALLOWLIST_NUMPY_FUNCTIONS = (
@@ -119,6 +118,7 @@ def _flatten_column_after_pivot(
 
 def validate_column_args(*argnames: str) -> Callable[..., Any]:
     def wrapper(func: Callable[..., Any]) -> Callable[..., Any]:
+        @wraps(func)
         def wrapped(df: DataFrame, **options: Any) -> Any:
             columns = df.columns.tolist()
             for name in argnames:
@@ -335,8 +335,37 @@ def rolling(  # pylint: disable=too-many-arguments
     :return: DataFrame with the rolling columns
     :raises ChartDataValidationError: If the request in incorrect
     """
+    df_rolling = rolling_frame(
+        df[columns.keys()],
+        rolling_type=rolling_type,
+        window=window,
+        rolling_type_options=rolling_type_options,
+        center=center,
+        win_type=win_type,
+        min_periods=min_periods,
+    )
+    df = _append_columns(df, df_rolling, columns)
+    if min_periods:
+        df = df[min_periods:]
+    return df
+
+
+def rolling_frame(  # pylint: disable=too-many-arguments
+    df_rolling: DataFrame,
+    rolling_type: str,
+    window: int,
+    rolling_type_options: Optional[Dict[str, Any]] = None,
+    center: bool = False,
+    win_type: Optional[str] = None,
+    min_periods: Optional[int] = None,
+) -> DataFrame:
+    """
+    Compute the rolling values of all the columns of a DataFrame, see `rolling`.
+
+    :return: DataFrame with the rolling values of the columns
+    :raises ChartDataValidationError: If the request in incorrect
+    """
     rolling_type_options = rolling_type_options or {}
-    df_rolling = df[columns.keys()]
     kwargs: Dict[str, Union[str, int]] = {}
     if not window:
         raise QueryObjectValidationError(_("Undefined window for rolling operation"))
@@ -357,7 +386,7 @@ def rolling(  # pylint: disable=too-many-arguments
             _("Invalid rolling_type: %(type)s", type=rolling_type)
         )
     try:
-        df_rolling = getattr(df_rolling, rolling_type)(**rolling_type_options)
+        return getattr(df_rolling, rolling_type)(**rolling_type_options)
     except TypeError:
         raise QueryObjectValidationError(
             _(
@@ -366,10 +395,6 @@ def rolling(  # pylint: disable=too-many-arguments
                 options=rolling_type_options,
             )
         )
-    df = _append_columns(df, df_rolling, columns)
-    if min_periods:
-        df = df[min_periods:]
-    return df
 
 
 @validate_column_args("columns", "drop", "rename")
@@ -420,9 +445,16 @@ def diff(df: DataFrame, columns: Dict[str, str], periods: int = 1,) -> DataFrame
     :return: DataFrame with diffed columns
     :raises ChartDataValidationError: If the request in incorrect
     """
-    df_diff = df[columns.keys()]
-    df_diff = df_diff.diff(periods=periods)
-    return _append_columns(df, df_diff, columns)
+    return _append_columns(df, diff_frame(df[columns.keys()], periods), columns)
+
+
+def diff_frame(df_diff: DataFrame, periods: int = 1) -> DataFrame:
+    """
+    Compute the row-by-row difference of all the columns of a DataFrame, see `diff`.
+
+    :return: DataFrame with the diffed columns
+    """
+    return df_diff.diff(periods=periods)
 
 
 @validate_column_args("columns")
@@ -439,7 +471,16 @@ def cum(df: DataFrame, columns: Dict[str, str], operator: str) -> DataFrame:
     :param operator: cumulative operator, e.g. `sum`, `prod`, `min`, `max`
     :return: DataFrame with cumulated columns
     """
-    df_cum = df[columns.keys()]
+    return _append_columns(df, cum_frame(df[columns.keys()], operator), columns)
+
+
+def cum_frame(df_cum: DataFrame, operator: str) -> DataFrame:
+    """
+    Compute the cumulative values of all the columns of a DataFrame, see `cum`.
+
+    :return: DataFrame with the cumulated columns
+    :raises ChartDataValidationError: If the request in incorrect
+    """
     operation = "cum" + operator
     if operation not in ALLOWLIST_CUMULATIVE_FUNCTIONS or not hasattr(
         df_cum, operation
@@ -447,7 +488,7 @@ def cum(df: DataFrame, columns: Dict[str, str], operator: str) -> DataFrame:
         raise QueryObjectValidationError(
             _("Invalid cumulative operator: %(operator)s", operator=operator)
         )
-    return _append_columns(df, getattr(df_cum, operation)(), columns)
+    return getattr(df_cum, operation)()
 
 
 def geohash_decode(
@@ -463,9 +504,9 @@ def geohash_decode(
     :return: DataFrame with decoded longitudes and latitudes
     """
     try:
-        lonlat_df = DataFrame()
-        lonlat_df["latitude"], lonlat_df["longitude"] = zip(
-            *df[geohash].apply(geohash_lib.decode)
+        latitudes, longitudes = geo.geohash_decode(df[geohash].to_numpy())
+        lonlat_df = DataFrame(
+            {"latitude": latitudes, "longitude": longitudes}, index=df.index
         )
         return _append_columns(
             df, lonlat_df, {"latitude": latitude, "longitude": longitude}
@@ -487,14 +528,17 @@ def geohash_encode(
     :return: DataFrame with decoded longitudes and latitudes
     """
     try:
-        encode_df = df[[latitude, longitude]]
-        encode_df.columns = ["latitude", "longitude"]
-        encode_df["geohash"] = encode_df.apply(
-            lambda row: geohash_lib.encode(row["latitude"], row["longitude"]), axis=1,
+        encode_df = DataFrame(
+            {
+                "geohash": geo.geohash_encode(
+                    df[latitude].to_numpy(), df[longitude].to_numpy()
+                )
+            },
+            index=df.index,
         )
         return _append_columns(df, encode_df, {"geohash": geohash})
     except ValueError:
-        QueryObjectValidationError(_("Invalid longitude/latitude"))
+        raise QueryObjectValidationError(_("Invalid longitude/latitude"))
 
 
 def geodetic_parse(
@@ -515,22 +559,12 @@ def geodetic_parse(
     :param altitude: Name of new column to be created containing altitude.
     :return: DataFrame with decoded longitudes and latitudes
     """
-
-    def _parse_location(location: str) -> Tuple[float, float, float]:
-        """
-        Parse a string containing a geodetic point and return latitude, longitude
-        and altitude
-        """
-        point = Point(location)
-        return point[0], point[1], point[2]
-
     try:
-        geodetic_df = DataFrame()
-        (
-            geodetic_df["latitude"],
-            geodetic_df["longitude"],
-            geodetic_df["altitude"],
-        ) = zip(*df[geodetic].apply(_parse_location))
+        latitudes, longitudes, altitudes = geo.parse_points(df[geodetic].to_numpy())
+        geodetic_df = DataFrame(
+            {"latitude": latitudes, "longitude": longitudes, "altitude": altitudes},
+            index=df.index,
+        )
         columns = {"latitude": latitude, "longitude": longitude}
         if altitude:
             columns["altitude"] = altitude
@@ -0,0 +1,146 @@
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+"""
+Per-query timing breakdown.
+
+A `TimingTrace` collects the time spent in the different stages of a chart or
+SQL Lab query (cache lookup, Jinja rendering, SQL compilation, execution, ...).
+The trace is bound to the current thread while active, so that the stages can be
+timed with `trace_stage` deep in the call stack without passing it around.
+"""
+import threading
+from contextlib import contextmanager
+from timeit import default_timer
+from typing import Any, Dict, Iterator, Optional
+
+from flask import current_app, g, has_app_context
+
+# the stages, in the order in which they usually happen
+CACHE_LOOKUP = "cache_lookup"
+JINJA_RENDER = "jinja_render"
+SQL_COMPILE = "sql_compile"
+ADMISSION_WAIT = "admission_wait"
+CONNECTION_ACQUIRE = "connection_acquire"
+EXECUTE = "execute"
+FETCH = "fetch"
+ARROW_CONVERSION = "arrow_conversion"
+PANDAS_CONVERSION = "pandas_conversion"
+POST_PROCESSING = "post_processing"
+RESULTS_SERIALIZATION = "results_serialization"
+JSON_SERIALIZATION = "json_serialization"
+
+_local = threading.local()
+
+
+class TimingTrace:
+    """Accumulates the duration in milliseconds of each stage"""
+
+    def __init__(self) -> None:
+        self.timings: Dict[str, float] = {}
+        self._start = default_timer()
+
+    def add(self, stage: str, duration_ms: float) -> None:
+        self.timings[stage] = self.timings.get(stage, 0.0) + duration_ms
+
+    @contextmanager
+    def stage(self, stage: str) -> Iterator[None]:
+        start = default_timer()
+        try:
+            yield
+        finally:
+            self.add(stage, (default_timer() - start) * 1000)
+
+    def to_dict(self) -> Dict[str, float]:
+        timings = {stage: round(value, 3) for stage, value in self.timings.items()}
+        timings["total"] = round((default_timer() - self._start) * 1000, 3)
+        return timings
+
+
+def get_active_trace() -> Optional[TimingTrace]:
+    return getattr(_local, "trace", None)
+
+
+@contextmanager
+def timing_trace() -> Iterator[TimingTrace]:
+    """
+    Activates a timing trace for the current thread. If a trace is already active,
+    e.g. for the queries of a chart nested in a bigger request, it is reused.
+    """
+    trace = get_active_trace()
+    if trace is not None:
+        yield trace
+        return
+    trace = TimingTrace()
+    _local.trace = trace
+    try:
+        yield trace
+    finally:
+        _local.trace = None
+
+
+@contextmanager
+def trace_stage(stage: str) -> Iterator[None]:
+    """Times a stage in the active trace, if any"""
+    trace = get_active_trace()
+    if trace is None:
+        yield
+        return
+    with trace.stage(stage):
+        yield
+
+
+def report_timings(
+    timings: Dict[str, float],
+    key: str,
+    tags: Optional[Dict[str, str]] = None,
+    user_id: Optional[int] = None,
+    **log_kwargs: Any,
+) -> None:
+    """
+    Sends the timings of a trace to the stats logger, and to the event logger
+    when the `QUERY_TIMINGS` feature flag is enabled.
+
+    :param timings: the timings of the trace
+    :param key: the stats key, the stage is added as a tag
+    :param tags: the tags of the stats
+    :param user_id: the user the timings are logged for
+    :param log_kwargs: extra arguments passed to the event logger
+    """
+    # pylint: disable=import-outside-toplevel
+    from superset import is_feature_enabled
+    from superset.extensions import event_logger
+
+    if not has_app_context():  # type: ignore
+        return
+    stats_logger = current_app.config["STATS_LOGGER"]
+    for stage, duration_ms in timings.items():
+        stats_logger.timing_with_tags(
+            key, duration_ms, {**(tags or {}), "stage": stage}
+        )
+
+    if is_feature_enabled("QUERY_TIMINGS"):
+        if user_id is None and hasattr(g, "user") and g.user:
+            user_id = g.user.get_id()
+        record: Dict[str, Any] = {"timings": timings}
+        record.update(tags or {})
+        event_logger.log(
+            user_id,
+            key,
+            records=[record],
+            duration_ms=timings.get("total"),
+            **log_kwargs,
+        )
@@ -15,9 +15,12 @@
 # specific language governing permissions and limitations
 # under the License.
 
+import atexit
 import logging
-import time
-from typing import Any, Dict, Optional, Tuple, TYPE_CHECKING
+import os
+import threading
+from collections import defaultdict
+from typing import Any, Dict, List, Optional, Tuple, TYPE_CHECKING
 
 from flask import current_app
 from retry.api import retry_call
@@ -34,9 +37,9 @@ WindowSize = Tuple[int, int]
 logger = logging.getLogger(__name__)
 
 # Time in seconds, we will wait for the page to load and render
+# (i.e. for the .loading spinners to appear)
 SELENIUM_CHECK_INTERVAL = 2
 SELENIUM_RETRIES = 5
-SELENIUM_HEADSTART = 3
 
 
 if TYPE_CHECKING:
@@ -44,15 +47,111 @@ if TYPE_CHECKING:
     from flask_appbuilder.security.sqla.models import User
 
 
+class WebDriverPool:
+    """
+    Keeps authenticated webdrivers alive to reuse them across screenshots
+    within a process, instead of starting and logging in a new browser every
+    time. A driver is only ever used by one caller at a time, and is recycled
+    after `WEBDRIVER_POOL_MAX_USAGE` uses or when it fails.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._idle: Dict[Tuple[str, str], List[WebDriver]] = defaultdict(list)
+        self._usage: Dict[int, int] = {}
+        self._keys: Dict[int, Tuple[str, str]] = {}
+        self._pid = os.getpid()
+        atexit.register(self.destroy_all)
+
+    def _check_pid(self) -> None:
+        # drivers started by a parent process (e.g. before the celery workers
+        # are forked) can't be used by the child
+        if self._pid != os.getpid():
+            self._idle = defaultdict(list)
+            self._usage = {}
+            self._keys = {}
+            self._pid = os.getpid()
+
+    def acquire(
+        self, proxy: "WebDriverProxy", user: Optional["User"], fresh: bool = False
+    ) -> WebDriver:
+        """
+        Returns an idle driver authenticated as the user, or a new one
+
+        :param fresh: Whether to always start a new driver
+        """
+        key = (proxy.driver_type, user.username) if user else None
+        if key and not fresh and current_app.config["WEBDRIVER_POOL_SIZE"]:
+            with self._lock:
+                self._check_pid()
+                if self._idle[key]:
+                    logger.debug("Reusing pooled webdriver for %s", key)
+                    return self._idle[key].pop()
+        driver = proxy.auth(user)
+        if key:
+            with self._lock:
+                self._usage[id(driver)] = 0
+                self._keys[id(driver)] = key
+        return driver
+
+    def release(self, driver: WebDriver, discard: bool = False) -> bool:
+        """
+        Returns a driver to the pool, unless it failed, was used too many times
+        or the pool is full, in which case it should be destroyed by the caller.
+
+        :return: Whether the driver was kept in the pool
+        """
+        config = current_app.config
+        with self._lock:
+            self._check_pid()
+            key = self._keys.get(id(driver))
+            usage = self._usage.get(id(driver), 0) + 1
+            if (
+                not discard
+                and key
+                and usage < config["WEBDRIVER_POOL_MAX_USAGE"]
+                and len(self._idle[key]) < config["WEBDRIVER_POOL_SIZE"]
+            ):
+                self._usage[id(driver)] = usage
+                self._idle[key].append(driver)
+                return True
+            self._usage.pop(id(driver), None)
+            self._keys.pop(id(driver), None)
+        return False
+
+    def destroy_all(self) -> None:
+        with self._lock:
+            if self._pid != os.getpid():
+                return
+            drivers = [driver for idle in self._idle.values() for driver in idle]
+            self._idle = defaultdict(list)
+            self._usage = {}
+            self._keys = {}
+        for driver in drivers:
+            WebDriverProxy.destroy(driver)
+
+
+webdriver_pool = WebDriverPool()
+
+
 class WebDriverProxy:
     def __init__(
-        self, driver_type: str, window: Optional[WindowSize] = None,
+        self,
+        driver_type: str,
+        window: Optional[WindowSize] = None,
+        locate_wait: Optional[int] = None,
     ):
         self._driver_type = driver_type
         self._window: WindowSize = window or (800, 600)
-        self._screenshot_locate_wait = current_app.config["SCREENSHOT_LOCATE_WAIT"]
+        self._screenshot_locate_wait = (
+            locate_wait or current_app.config["SCREENSHOT_LOCATE_WAIT"]
+        )
         self._screenshot_load_wait = current_app.config["SCREENSHOT_LOAD_WAIT"]
 
+    @property
+    def driver_type(self) -> str:
+        return self._driver_type
+
     def create(self) -> WebDriver:
         if self._driver_type == "firefox":
             driver_class = firefox.webdriver.WebDriver
@@ -102,30 +201,59 @@ class WebDriverProxy:
         user: "User",
         retries: int = SELENIUM_RETRIES,
     ) -> Optional[bytes]:
-        driver = self.auth(user)
+        # a pooled driver may have died while idle (e.g. its browser crashed),
+        # in which case it's discarded and the screenshot retried once with a
+        # fresh driver
+        for fresh in (False, True):
+            driver = webdriver_pool.acquire(self, user, fresh=fresh)
+            discard = True
+            try:
+                img = self.take_screenshot(driver, url, element_name)
+                discard = False
+                return img
+            except TimeoutException:
+                logger.error("Selenium timed out requesting url %s", url)
+                return None
+            except WebDriverException as ex:
+                logger.warning("Webdriver failed requesting url %s: %s", url, ex)
+            finally:
+                if not webdriver_pool.release(driver, discard=discard):
+                    self.destroy(driver, retries)
+        logger.error("Unable to take a screenshot of url %s", url)
+        return None
+
+    def take_screenshot(self, driver: WebDriver, url: str, element_name: str) -> bytes:
         driver.set_window_size(*self._window)
         driver.get(url)
-        img: Optional[bytes] = None
-        logger.debug("Sleeping for %i seconds", SELENIUM_HEADSTART)
-        time.sleep(SELENIUM_HEADSTART)
+        element = self.wait_for_element(driver, element_name)
+        logger.info("Taking a PNG screenshot or url %s", url)
         try:
-            logger.debug("Wait for the presence of %s", element_name)
-            element = WebDriverWait(driver, self._screenshot_locate_wait).until(
-                EC.presence_of_element_located((By.CLASS_NAME, element_name))
-            )
-            logger.debug("Wait for .loading to be done")
-            WebDriverWait(driver, self._screenshot_load_wait).until_not(
-                EC.presence_of_all_elements_located((By.CLASS_NAME, "loading"))
-            )
-            logger.info("Taking a PNG screenshot or url %s", url)
-            img = element.screenshot_as_png
-        except TimeoutException:
-            logger.error("Selenium timed out requesting url %s", url)
+            return element.screenshot_as_png
         except WebDriverException as ex:
-            logger.error(ex)
+            logger.info(ex)
             # Some webdrivers do not support screenshots for elements.
             # In such cases, take a screenshot of the entire page.
-            img = driver.screenshot()  # pylint: disable=no-member
-        finally:
-            self.destroy(driver, retries)
-        return img
+            return driver.get_screenshot_as_png()
+
+    def wait_for_element(self, driver: WebDriver, element_name: str) -> Any:
+        """
+        Waits for the element to be present and for all the `.loading` spinners
+        of the page to be gone, rather than sleeping for a fixed amount of time
+        """
+        logger.debug("Wait for the presence of %s", element_name)
+        element = WebDriverWait(driver, self._screenshot_locate_wait).until(
+            EC.presence_of_element_located((By.CLASS_NAME, element_name))
+        )
+        # the spinners are only rendered once the charts start loading, so
+        # give them a chance to appear before waiting for them to be gone
+        try:
+            WebDriverWait(driver, SELENIUM_CHECK_INTERVAL).until(
+                EC.presence_of_all_elements_located((By.CLASS_NAME, "loading"))
+            )
+        except TimeoutException:
+            logger.debug("No .loading spinner appeared")
+        logger.debug("Wait for .loading to be done")
+        WebDriverWait(driver, self._screenshot_load_wait).until_not(
+            EC.presence_of_all_elements_located((By.CLASS_NAME, "loading"))
+        )
+        return element
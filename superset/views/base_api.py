@@ -104,6 +104,7 @@ class BaseSupersetModelRestApi(ModelRestApi):
         "thumbnail": "list",
         "refresh": "edit",
         "data": "list",
+        "cancel_data": "list",
         "viz_types": "list",
         "related_objects": "list",
     }
@@ -228,7 +229,10 @@ class BaseSupersetModelRestApi(ModelRestApi):
         :param action: String with an action name eg: error, success
         :param func_name: The function name
         """
-        self.stats_logger.incr(f"{self.__class__.__name__}.{func_name}.{action}")
+        self.stats_logger.incr_with_tags(
+            f"{self.__class__.__name__}.{func_name}.{action}",
+            {"endpoint": f"{self.__class__.__name__}.{func_name}", "action": action},
+        )
 
     def timing_stats(self, action: str, func_name: str, value: float) -> None:
         """
@@ -238,8 +242,10 @@ class BaseSupersetModelRestApi(ModelRestApi):
         :param func_name: The function name
         :param value: A float with the time it took for the endpoint to execute
         """
-        self.stats_logger.timing(
-            f"{self.__class__.__name__}.{func_name}.{action}", value
+        self.stats_logger.timing_with_tags(
+            f"{self.__class__.__name__}.{func_name}.{action}",
+            value,
+            {"endpoint": f"{self.__class__.__name__}.{func_name}", "action": action},
         )
 
     def send_stats_metrics(
@@ -68,6 +68,7 @@ from superset.connectors.sqla.models import (
     TableColumn,
 )
 from superset.dashboards.dao import DashboardDAO
+from superset.dataframe import df_to_records
 from superset.exceptions import (
     CertificateException,
     DatabaseNotFound,
@@ -405,7 +406,7 @@ class Superset(BaseSupersetView):  # pylint: disable=too-many-public-methods
 
     def get_raw_results(self, viz_obj: BaseViz) -> FlaskResponse:
         return self.json_response(
-            {"data": viz_obj.get_df_payload()["df"].to_dict("records")}
+            {"data": df_to_records(viz_obj.get_df_payload()["df"])}
         )
 
     def get_samples(self, viz_obj: BaseViz) -> FlaskResponse:
@@ -1975,7 +1976,14 @@ class Superset(BaseSupersetView):  # pylint: disable=too-many-public-methods
                 status=410,
             )
 
-        query = db.session.query(Query).filter_by(results_key=key).one_or_none()
+        # the results may be shared by the same queries, see `get_results_cache_key`,
+        # so prefer the query of the user when checking the access
+        queries = db.session.query(Query).filter_by(results_key=key)
+        user_id = g.user.get_id() if g.user else None
+        query = (
+            queries.filter_by(user_id=user_id).order_by(Query.id.desc()).first()
+            or queries.order_by(Query.id.desc()).first()
+        )
         if query is None:
             return json_error_response(
                 "Data could not be retrieved. You may want to re-run the query.",
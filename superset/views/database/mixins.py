@@ -144,7 +144,17 @@ class DatabaseMixin:
             "4. the ``version`` field is a string specifying the this db's version. "
             "This should be used with Presto DBs so that the syntax is correct<br/>"
             "5. The ``allows_virtual_table_explore`` field is a boolean specifying "
-            "whether or not the Explore button in SQL Lab results is shown.",
+            "whether or not the Explore button in SQL Lab results is shown.<br/>"
+            "6. The ``sqllab_results_cache_timeout`` is a cache timeout setting in "
+            "seconds for the results of the SQL Lab queries stored in the results "
+            "backend: the same deterministic `SELECT` queries run again on this "
+            "database reuse their results. Specify it as "
+            '**"sqllab_results_cache_timeout": 600**. '
+            "If unset or not positive, the results are not reused.<br/>"
+            "7. The ``concurrency_limits`` override the QUERY_CONCURRENCY_LIMITS "
+            "setting for this database: the maximum number of queries running at "
+            "the same time, as "
+            '**"concurrency_limits": {"database": 10, "user": 3}**.',
             True,
         ),
         "encrypted_extra": utils.markdown(
@@ -14,7 +14,12 @@
 # KIND, either express or implied.  See the License for the
 # specific language governing permissions and limitations
 # under the License.
+import hmac
+
+from flask import abort, request, Response
+
 from superset import app, talisman
+from superset.stats_logger import PrometheusStatsLogger
 from superset.typing import FlaskResponse
 
 
@@ -34,3 +39,21 @@ def healthcheck() -> FlaskResponse:
 @app.route("/health")
 def health() -> FlaskResponse:
     return "OK"
+
+
+@talisman(force_https=False)
+@app.route("/metrics")
+def metrics() -> FlaskResponse:
+    stats_logger = app.config["STATS_LOGGER"]
+    if not app.config["METRICS_ENDPOINT_ENABLED"] or not isinstance(
+        stats_logger, PrometheusStatsLogger
+    ):
+        abort(404)
+    token = app.config["METRICS_ENDPOINT_TOKEN"]
+    if token and not hmac.compare_digest(
+        request.headers.get("Authorization", ""), f"Bearer {token}"
+    ):
+        abort(401)
+    return Response(
+        stats_logger.render(), mimetype="text/plain; version=0.0.4; charset=utf-8"
+    )
@@ -53,8 +53,9 @@ from flask_babel import lazy_gettext as _
 from geopy.point import Point
 from pandas.tseries.frequencies import to_offset
 
-from superset import app, cache, security_manager
+from superset import app, cache, is_feature_enabled, security_manager
 from superset.constants import NULL_STRING
+from superset.dataframe import df_to_records, sanitize_df
 from superset.errors import ErrorLevel, SupersetError, SupersetErrorType
 from superset.exceptions import (
     NullValueException,
@@ -63,16 +64,17 @@ from superset.exceptions import (
 )
 from superset.models.helpers import QueryResult
 from superset.typing import QueryObjectDict, VizData, VizPayload
-from superset.utils import core as utils
+from superset.utils import core as utils, geo, timing
 from superset.utils.core import (
     DTTM_ALIAS,
-    JS_MAX_INTEGER,
     merge_extra_filters,
     QueryMode,
     to_adhoc,
 )
 from superset.utils.dates import datetime_to_epoch
+from superset.utils.decorators import stats_timing
 from superset.utils.hashing import md5_sha_from_str
+from superset.utils.timing import timing_trace, trace_stage
 
 if TYPE_CHECKING:
     from superset.connectors.base.models import BaseDatasource
@@ -131,6 +133,11 @@ class BaseViz:
         self.results: Optional[QueryResult] = None
         self.errors: List[Dict[str, Any]] = []
         self.force = force
+        # whether the data of the last query was approximated, see
+        # `SqlaTable.approximate_mode`
+        self.is_approximate = False
+        # the rollup answering the query, see `superset.connectors.sqla.rollups`
+        self.rollup: Optional[str] = None
         self.from_dttm: Optional[datetime] = None
         self.to_dttm: Optional[datetime] = None
 
@@ -162,19 +169,6 @@ class BaseViz:
         self.all_metrics = list(self.metric_dict.values())
         self.metric_labels = list(self.metric_dict.keys())
 
-    @staticmethod
-    def handle_js_int_overflow(
-        data: Dict[str, List[Dict[str, Any]]]
-    ) -> Dict[str, List[Dict[str, Any]]]:
-        for d in data.get("records", {}):
-            for k, v in list(d.items()):
-                if isinstance(v, int):
-                    # if an int is too big for Java Script to handle
-                    # convert it to a string
-                    if abs(v) > JS_MAX_INTEGER:
-                        d[k] = str(v)
-        return data
-
     def run_extra_queries(self) -> None:
         """Lifecycle method to use when more than one query is needed
 
@@ -237,7 +231,7 @@ class BaseViz:
             }
         )
         df = self.get_df(query_obj)
-        return df.to_dict(orient="records")
+        return df_to_records(df)
 
     def get_df(self, query_obj: Optional[QueryObjectDict] = None) -> pd.DataFrame:
         """Returns a pandas dataframe based on the query object"""
@@ -259,6 +253,8 @@ class BaseViz:
         self.query = self.results.query
         self.status = self.results.status
         self.errors = self.results.errors
+        self.is_approximate = bool(self.results.is_approximate)
+        self.rollup = self.results.rollup
 
         df = self.results.df
         # Transform the timestamp we received from database to pandas supported
@@ -298,7 +294,7 @@ class BaseViz:
             if self.enforce_numerical_metrics:
                 self.df_metrics_to_num(df)
 
-            df.replace([np.inf, -np.inf], np.nan, inplace=True)
+            df = sanitize_df(df)
         return df
 
     def df_metrics_to_num(self, df: pd.DataFrame) -> None:
@@ -364,6 +360,7 @@ class BaseViz:
         # extras are used to query elements specific to a datasource type
         # for instance the extra where clause that applies only to Tables
         extras = {
+            "approximate": bool(form_data.get("approximate")),
             "druid_time_origin": form_data.get("druid_time_origin", ""),
             "having": form_data.get("having", ""),
             "having_druid": form_data.get("having_filters", []),
@@ -439,16 +436,30 @@ class BaseViz:
 
     def get_payload(self, query_obj: Optional[QueryObjectDict] = None) -> VizPayload:
         """Returns a payload of metadata and data"""
-        self.run_extra_queries()
-        payload = self.get_df_payload(query_obj)
-
-        df = payload.get("df")
-        if self.status != utils.QueryStatus.FAILED:
-            payload["data"] = self.get_data(df)
+        with timing_trace() as trace:
+            self.run_extra_queries()
+            payload = self.get_df_payload(query_obj)
+
+            df = payload.get("df")
+            if self.status != utils.QueryStatus.FAILED:
+                with trace.stage(timing.POST_PROCESSING):
+                    payload["data"] = self.get_data(df)
         if "df" in payload:
             del payload["df"]
+        timings = trace.to_dict()
+        timing.report_timings(timings, "viz.timing", self.stats_tags)
+        if is_feature_enabled("QUERY_TIMINGS"):
+            payload["timings"] = timings
         return payload
 
+    @property
+    def stats_tags(self) -> Dict[str, str]:
+        """Tags of the metrics sent to the stats logger"""
+        return {
+            "viz_type": self.viz_type or "",
+            "database": self.datasource.connection or "",
+        }
+
     def get_df_payload(
         self, query_obj: Optional[QueryObjectDict] = None, **kwargs: Any
     ) -> Dict[str, Any]:
@@ -460,19 +471,23 @@ class BaseViz:
         is_loaded = False
         stacktrace = None
         df = None
+        self.is_approximate = False
         cached_dttm = datetime.utcnow().isoformat().split(".")[0]
         if cache_key and cache and not self.force:
-            cache_value = cache.get(cache_key)
+            with trace_stage(timing.CACHE_LOOKUP):
+                cache_value = cache.get(cache_key)
             if cache_value:
-                stats_logger.incr("loading_from_cache")
+                stats_logger.incr_with_tags("loading_from_cache", self.stats_tags)
                 try:
                     df = cache_value["df"]
                     self.query = cache_value["query"]
                     self._any_cached_dttm = cache_value["dttm"]
                     self._any_cache_key = cache_key
+                    self.is_approximate = cache_value.get("is_approximate", False)
+                    self.rollup = cache_value.get("rollup")
                     self.status = utils.QueryStatus.SUCCESS
                     is_loaded = True
-                    stats_logger.incr("loaded_from_cache")
+                    stats_logger.incr_with_tags("loaded_from_cache", self.stats_tags)
                 except Exception as ex:
                     logger.exception(ex)
                     logger.error(
@@ -500,11 +515,16 @@ class BaseViz:
                             invalid_columns=invalid_columns,
                         )
                     )
-                df = self.get_df(query_obj)
+                with stats_timing(
+                    "viz.load_from_source", stats_logger, self.stats_tags
+                ):
+                    df = self.get_df(query_obj)
                 if self.status != utils.QueryStatus.FAILED:
-                    stats_logger.incr("loaded_from_source")
+                    stats_logger.incr_with_tags("loaded_from_source", self.stats_tags)
                     if not self.force:
-                        stats_logger.incr("loaded_from_source_without_force")
+                        stats_logger.incr_with_tags(
+                            "loaded_from_source_without_force", self.stats_tags
+                        )
                     is_loaded = True
             except QueryObjectValidationError as ex:
                 error = dataclasses.asdict(
@@ -537,8 +557,14 @@ class BaseViz:
                 and self.status != utils.QueryStatus.FAILED
             ):
                 try:
-                    cache_value = dict(dttm=cached_dttm, df=df, query=self.query)
-                    stats_logger.incr("set_cache_key")
+                    cache_value = dict(
+                        dttm=cached_dttm,
+                        df=df,
+                        query=self.query,
+                        is_approximate=self.is_approximate,
+                        rollup=self.rollup,
+                    )
+                    stats_logger.incr_with_tags("set_cache_key", self.stats_tags)
                     cache.set(cache_key, cache_value, timeout=self.cache_timeout)
                 except Exception as ex:
                     # cache.set call can fail if the backend is down or if
@@ -554,7 +580,9 @@ class BaseViz:
             "errors": self.errors,
             "form_data": self.form_data,
             "is_cached": self._any_cache_key is not None,
+            "is_approximate": self.is_approximate,
             "query": self.query,
+            "rollup": self.rollup,
             "from_dttm": self.from_dttm,
             "to_dttm": self.to_dttm,
             "status": self.status,
@@ -573,7 +601,12 @@ class BaseViz:
             or payload.get("error") is not None
             or bool(payload.get("errors"))
         )
-        return self.json_dumps(payload), has_error
+        with stats_timing(
+            "viz.timing",
+            stats_logger,
+            {**self.stats_tags, "stage": timing.JSON_SERIALIZATION},
+        ):
+            return self.json_dumps(payload), has_error
 
     @property
     def data(self) -> Dict[str, Any]:
@@ -726,9 +759,7 @@ class TableViz(BaseViz):
             ],
             axis=1,
         )
-        return self.handle_js_int_overflow(
-            dict(records=df.to_dict(orient="records"), columns=list(df.columns))
-        )
+        return dict(records=df_to_records(df), columns=list(df.columns))
 
     def json_dumps(self, obj: Any, sort_keys: bool = False) -> str:
         return json.dumps(
@@ -787,6 +818,9 @@ class PivotTableViz(BaseViz):
     credits = 'a <a href="https://github.com/airbnb/superset">Superset</a> original'
     is_timeseries = False
     enforce_numerical_metrics = False
+    # aggregations returning the value of a group made of a single row
+    cell_aggfuncs = ("sum", "mean", "median", "min", "max")
+    _margin_dfs: Optional[Dict[Tuple[str, ...], pd.DataFrame]] = None
 
     def query_obj(self) -> QueryObjectDict:
         d = super().query_obj()
@@ -829,6 +863,101 @@ class PivotTableViz(BaseViz):
         # only min and max work properly for non-numerics
         return aggfunc if aggfunc in ("min", "max") else "max"
 
+    def can_push_down_margins(self, query_obj: QueryObjectDict) -> bool:
+        """
+        Whether the margins can be aggregated by the database: they must be sums
+        of the cells, and the groups must not be limited by a series limit.
+        """
+        fd = self.form_data
+        groupby = fd.get("groupby") or []
+        columns = fd.get("columns") or []
+        return (
+            bool(fd.get("pivot_margins"))
+            and (fd.get("pandas_aggfunc") or "sum") == "sum"
+            and not query_obj["timeseries_limit"]
+            and DTTM_ALIAS not in groupby + columns
+        )
+
+    def run_extra_queries(self) -> None:
+        """
+        Aggregates the margins of the pivot table in the database: the subtotals
+        of the rows, of the columns and the grand total are fetched by one query
+        per grouping, which are cached like the main query.
+        """
+        query_obj = self.query_obj()
+        if not self.can_push_down_margins(query_obj):
+            return
+
+        groupby = self.form_data.get("groupby") or []
+        columns = self.form_data.get("columns") or []
+        groupings = [groupby, columns, []] if columns else [[]]
+        margin_dfs = {}
+        for grouping in groupings:
+            df = self.get_df_payload({**query_obj, "groupby": grouping}).get("df")
+            if df is None:
+                return
+            margin_dfs[tuple(grouping)] = df
+        self._margin_dfs = margin_dfs
+
+    @staticmethod
+    def add_margins(
+        table: pd.DataFrame,
+        index: List[str],
+        columns: List[str],
+        metrics: List[str],
+        margin_dfs: Dict[Tuple[str, ...], pd.DataFrame],
+        margins_name: str = "All",
+    ) -> pd.DataFrame:
+        """
+        Adds the margins aggregated by the database to the cells of the pivot
+        table, with the same layout as the margins of `DataFrame.pivot_table`.
+
+        :param table: the cells of the pivot table
+        :param index: the columns of the rows of the pivot table
+        :param columns: the columns of the columns of the pivot table
+        :param metrics: the metrics of the pivot table
+        :param margin_dfs: the results of the margin queries, by grouping
+        :param margins_name: the label of the margins
+        :return: the pivot table with its margins
+        """
+        grand_margin = margin_dfs[()]
+        grand_totals = {
+            metric: grand_margin[metric].iloc[0] if len(grand_margin.index) else np.nan
+            for metric in metrics
+        }
+        row_margin: Dict[Any, Any] = {}
+        if columns:
+            row_totals = margin_dfs[tuple(index)].set_index(index)
+            pieces = []
+            for metric in table.columns.unique(level=0):
+                all_key = (metric, margins_name) + ("",) * (len(columns) - 1)
+                piece = table[[metric]].copy()
+                piece[all_key] = row_totals[metric]
+                pieces.append(piece)
+                row_margin[all_key] = grand_totals[metric]
+            table = pd.concat(pieces, axis=1)
+
+            column_totals = margin_dfs[tuple(columns)].set_index(columns)
+            for metric in metrics:
+                for key, value in column_totals[metric].items():
+                    key = key if isinstance(key, tuple) else (key,)
+                    row_margin[(metric,) + key] = value
+        else:
+            row_margin = grand_totals
+
+        key = margins_name
+        if len(index) > 1:
+            key = (margins_name,) + ("",) * (len(index) - 1)
+        margin_row = pd.DataFrame(
+            {column: [row_margin.get(column, np.nan)] for column in table.columns},
+            index=[key],
+            columns=table.columns,
+        )
+        row_names = table.index.names
+        table = pd.concat([table, margin_row])
+        table.index.names = row_names
+        return table
+
     def get_data(self, df: pd.DataFrame) -> VizData:
         if df.empty:
             return None
@@ -843,6 +972,8 @@ class PivotTableViz(BaseViz):
 
         groupby = self.form_data.get("groupby") or []
         columns = self.form_data.get("columns") or []
+        margins = self.form_data.get("pivot_margins")
+        margin_dfs = self._margin_dfs if margins else {}
 
         def _format_datetime(value: Any) -> Optional[str]:
             if isinstance(value, str):
@@ -852,19 +983,35 @@ class PivotTableViz(BaseViz):
         for column_name in groupby + columns:
             column = self.datasource.get_column(column_name)
             if column and column.type in ("DATE", "DATETIME", "TIMESTAMP"):
-                ts = df[column_name].apply(_format_datetime)
-                df[column_name] = ts
+                for data in [df] + list((margin_dfs or {}).values()):
+                    if column_name in data:
+                        data[column_name] = data[column_name].apply(_format_datetime)
 
         if self.form_data.get("transpose_pivot"):
             groupby, columns = columns, groupby
 
-        df = df.pivot_table(
-            index=groupby,
-            columns=columns,
-            values=metrics,
-            aggfunc=aggfuncs,
-            margins=self.form_data.get("pivot_margins"),
-        )
+        aggfunc = self.form_data.get("pandas_aggfunc") or "sum"
+        if (
+            aggfunc in self.cell_aggfuncs
+            and margin_dfs is not None
+            and all(pd.api.types.is_numeric_dtype(df[metric]) for metric in metrics)
+            and not df.duplicated(groupby + columns).any()
+        ):
+            # the query already aggregated every cell, which are laid out without
+            # aggregating them again, while the margins come from the database
+            df = df.pivot_table(
+                index=groupby, columns=columns, values=metrics, aggfunc="first"
+            )
+            if margins:
+                df = self.add_margins(df, groupby, columns, metrics, margin_dfs)
+        else:
+            df = df.pivot_table(
+                index=groupby,
+                columns=columns,
+                values=metrics,
+                aggfunc=aggfuncs,
+                margins=margins,
+            )
 
         # Re-order the columns adhering to the metric ordering.
         df = df[metrics]
@@ -995,6 +1142,17 @@ class NVD3Viz(BaseViz):
     verbose_name = "Base NVD3 Viz"
     is_timeseries = False
 
+    @staticmethod
+    def series_values(x_values: List[Any], series: pd.Series) -> List[Dict[str, Any]]:
+        """
+        Builds the points of a NVD3 series.
+
+        :param x_values: the index of the series, as a list
+        :param series: the y values
+        :return: the `{"x": ..., "y": ...}` points of the series
+        """
+        return [{"x": x, "y": y} for x, y in zip(x_values, series.tolist())]
+
 
 class BoxPlotViz(NVD3Viz):
 
@@ -1228,6 +1386,7 @@ class NVD3TimeSeriesViz(NVD3Viz):
     sort_series = False
     is_timeseries = True
     pivot_fill_value: Optional[int] = None
+    _time_compare_payload: Optional[Dict[str, Any]] = None
 
     def to_series(
         self, df: pd.DataFrame, classed: str = "", title_suffix: str = ""
@@ -1241,12 +1400,11 @@ class NVD3TimeSeriesViz(NVD3Viz):
             else:
                 cols.append(col)
         df.columns = cols
-        series = df.to_dict("series")
+        x_values = df.index.tolist()
 
         chart_data = []
-        for name in df.T.index.tolist():
-            ys = series[name]
-            if df[name].dtype.kind not in "biufc":
+        for name, ys in df.items():
+            if ys.dtype.kind not in "biufc" or not ys.notna().any():
                 continue
             series_title: Union[List[str], str, Tuple[str, ...]]
             if isinstance(name, list):
@@ -1270,21 +1428,7 @@ class NVD3TimeSeriesViz(NVD3Viz):
                 elif isinstance(series_title, tuple):
                     series_title = series_title + (title_suffix,)
 
-            values = []
-            non_nan_cnt = 0
-            for ds in df.index:
-                if ds in ys:
-                    d = {"x": ds, "y": ys[ds]}
-                    if not np.isnan(ys[ds]):
-                        non_nan_cnt += 1
-                else:
-                    d = {}
-                values.append(d)
-
-            if non_nan_cnt == 0:
-                continue
-
-            d = {"key": series_title, "values": values}
+            d = {"key": series_title, "values": self.series_values(x_values, ys)}
             if classed:
                 d["classed"] = classed
             chart_data.append(d)
@@ -1342,22 +1486,30 @@ class NVD3TimeSeriesViz(NVD3Viz):
         if not isinstance(time_compare, list):
             time_compare = [time_compare]
 
+        deltas = []
         for option in time_compare:
-            query_object = self.query_obj()
             try:
-                delta = utils.parse_past_timedelta(option)
+                deltas.append((option, utils.parse_past_timedelta(option)))
             except ValueError as ex:
                 raise QueryObjectValidationError(str(ex))
-            query_object["inner_from_dttm"] = query_object["from_dttm"]
-            query_object["inner_to_dttm"] = query_object["to_dttm"]
+        if not deltas:
+            return
 
-            if not query_object["from_dttm"] or not query_object["to_dttm"]:
-                raise QueryObjectValidationError(
-                    _(
-                        "`Since` and `Until` time bounds should be specified "
-                        "when using the `Time Shift` feature."
-                    )
+        query_object = self.query_obj()
+        if not query_object["from_dttm"] or not query_object["to_dttm"]:
+            raise QueryObjectValidationError(
+                _(
+                    "`Since` and `Until` time bounds should be specified "
+                    "when using the `Time Shift` feature."
                 )
+            )
+        if self.run_union_query(query_object, deltas):
+            return
+
+        for option, delta in deltas:
+            query_object = self.query_obj()
+            query_object["inner_from_dttm"] = query_object["from_dttm"]
+            query_object["inner_to_dttm"] = query_object["to_dttm"]
             query_object["from_dttm"] -= delta
             query_object["to_dttm"] -= delta
 
@@ -1368,6 +1520,142 @@ class NVD3TimeSeriesViz(NVD3Viz):
                 df2 = self.process_data(df2)
                 self._extra_chart_data.append((label, df2))
 
+    def can_run_union_query(
+        self, query_object: QueryObjectDict, deltas: List[Tuple[str, timedelta]]
+    ) -> bool:
+        """
+        Whether the main and time shifted data can be fetched with a single query,
+        and told apart in its result based on the timestamps: the time ranges must
+        only cover whole time grain buckets, and their union must not span much
+        more than the separate queries.
+        """
+        if self.datasource.type != "table" or not query_object["is_timeseries"]:
+            return False
+        granularity_col = self.datasource.get_column(query_object["granularity"])
+        if not granularity_col or granularity_col.python_date_format:
+            return False
+        time_grain = query_object["extras"].get("time_grain_sqla")
+        if time_grain and not self.is_end_exclusive(query_object):
+            # the bucket of the end of the range would only be partially included
+            return False
+
+        from_dttm = query_object["from_dttm"]
+        to_dttm = query_object["to_dttm"]
+        shifts = [timedelta()] + [delta for _, delta in deltas]
+        union_span = (to_dttm - min(shifts)) - (from_dttm - max(shifts))
+        max_ratio = config["TIME_COMPARE_UNION_MAX_RATIO"]
+        if union_span > max_ratio * len(shifts) * (to_dttm - from_dttm):
+            return False
+        return all(
+            utils.is_time_grain_start(dttm - delta, time_grain)
+            for dttm in (from_dttm, to_dttm)
+            for delta in shifts
+        )
+
+    @staticmethod
+    def is_end_exclusive(query_object: QueryObjectDict) -> bool:
+        endpoints = query_object["extras"].get("time_range_endpoints")
+        if not endpoints or len(endpoints) < 2:
+            return False
+        return endpoints[1] == utils.TimeRangeEndpoint.EXCLUSIVE
+
+    def run_union_query(
+        self, query_object: QueryObjectDict, deltas: List[Tuple[str, timedelta]]
+    ) -> bool:
+        """
+        Fetches the main and time shifted data with a single query over the union
+        of their time ranges, see `can_run_union_query`. The rows of each time
+        range are then selected by timestamp.
+
+        :param query_object: the main query object
+        :param deltas: the time shift options and their time deltas
+        :return: whether the union query replaced the separate queries
+        """
+        if not self.can_run_union_query(query_object, deltas):
+            return False
+
+        from_dttm = query_object["from_dttm"]
+        to_dttm = query_object["to_dttm"]
+        shifts = [delta for _, delta in deltas]
+        union_query_object = {
+            **query_object,
+            "inner_from_dttm": from_dttm,
+            "inner_to_dttm": to_dttm,
+            "from_dttm": from_dttm - max(shifts + [timedelta()]),
+            "to_dttm": to_dttm - min(shifts + [timedelta()]),
+        }
+        payload = self.get_df_payload(
+            union_query_object, time_compare=[option for option, _ in deltas]
+        )
+        df = payload.get("df")
+        if df is None:
+            # the query failed, its errors are reported as the ones of the main
+            # query rather than running it again
+            logger.warning("The time comparison union query failed")
+            self._time_compare_payload = payload
+            return True
+        if DTTM_ALIAS not in df or len(df.index) >= query_object["row_limit"]:
+            return False
+        if not pd.api.types.is_datetime64_any_dtype(df[DTTM_ALIAS]):
+            return False
+        # not narrowed to a DataFrame in the closures
+        union_df: pd.DataFrame = df
+
+        # the timestamps are shifted once fetched, see `get_df`
+        timestamps = df[DTTM_ALIAS] - (
+            self.time_shift + timedelta(hours=self.datasource.offset or 0)
+        )
+        end_exclusive = self.is_end_exclusive(query_object)
+
+        def to_bound(dttm: datetime) -> pd.Timestamp:
+            # the bounds are compared to timestamps which may or may not be
+            # timezone aware
+            bound = pd.Timestamp(dttm)
+            if timestamps.dt.tz is not None and bound.tzinfo is None:
+                return bound.tz_localize(timestamps.dt.tz)
+            if timestamps.dt.tz is None and bound.tzinfo is not None:
+                return bound.tz_convert(None)
+            return bound
+
+        def select_range(delta: timedelta) -> pd.DataFrame:
+            start, end = to_bound(from_dttm - delta), to_bound(to_dttm - delta)
+            in_range = (timestamps >= start) & (
+                timestamps < end if end_exclusive else timestamps <= end
+            )
+            return union_df[in_range].copy()
+
+        try:
+            main_df = select_range(timedelta())
+            shifted_dfs = [
+                (option, delta, select_range(delta)) for option, delta in deltas
+            ]
+        except Exception:  # pylint: disable=broad-except
+            # e.g. a bound doesn't exist in the timezone of the timestamps
+            logger.warning(
+                "Unable to split the time comparison union query", exc_info=True
+            )
+            return False
+
+        self._time_compare_payload = {
+            **payload,
+            "df": main_df,
+            "rowcount": len(main_df.index),
+        }
+        for option, delta, df2 in shifted_dfs:
+            df2[DTTM_ALIAS] += delta
+            self._extra_chart_data.append(
+                ("{} offset".format(option), self.process_data(df2))
+            )
+        return True
+
+    def get_df_payload(
+        self, query_obj: Optional[QueryObjectDict] = None, **kwargs: Any
+    ) -> Dict[str, Any]:
+        if not query_obj and not kwargs and self._time_compare_payload is not None:
+            # the main data was fetched along with the time comparisons
+            return self._time_compare_payload
+        return super().get_df_payload(query_obj, **kwargs)
+
     def get_data(self, df: pd.DataFrame) -> VizData:
         fd = self.form_data
         comparison_type = fd.get("comparison_type") or "values"
@@ -1482,21 +1770,19 @@ class NVD3DualLineViz(NVD3Viz):
             else:
                 cols.append(col)
         df.columns = cols
-        series = df.to_dict("series")
+        x_values = df.index.tolist()
         chart_data = []
         metrics = [self.form_data["metric"], self.form_data["metric_2"]]
         for i, m in enumerate(metrics):
             m = utils.get_metric_name(m)
-            ys = series[m]
-            if df[m].dtype.kind not in "biufc":
+            ys = df[m]
+            if ys.dtype.kind not in "biufc":
                 continue
             series_title = m
             d = {
                 "key": series_title,
                 "classed": classed,
-                "values": [
-                    {"x": ds, "y": ys[ds] if ds in ys else None} for ds in df.index
-                ],
+                "values": self.series_values(x_values, ys),
                 "yAxis": i + 1,
                 "type": "line",
             }
@@ -2374,37 +2660,59 @@ class BaseDeckGLViz(BaseViz):
             raise SpatialException(_("Invalid spatial point encountered: %s" % s))
 
     @staticmethod
-    def reverse_geohash_decode(geohash_code: str) -> Tuple[str, str]:
-        lat, lng = geohash.decode(geohash_code)
-        return (lng, lat)
-
-    @staticmethod
-    def reverse_latlong(df: pd.DataFrame, key: str) -> None:
-        df[key] = [tuple(reversed(o)) for o in df[key] if isinstance(o, (list, tuple))]
+    def parse_coordinates_column(
+        values: pd.Series, reverse: bool = False
+    ) -> List[Optional[Tuple[float, float]]]:
+        """
+        Parse a column of points like `parse_coordinates` does for a single point,
+        returning (lat, lon) tuples, or (lon, lat) tuples if `reverse` is set.
+        """
+        points = values.to_numpy(dtype=object)
+        is_empty = np.fromiter(
+            (not point for point in points), dtype=bool, count=len(points)
+        )
+        try:
+            latitudes, longitudes, _altitudes = geo.parse_points(points[~is_empty])
+        except Exception:  # pylint: disable=broad-except
+            # find the first invalid point to report it
+            for point in points:
+                BaseDeckGLViz.parse_coordinates(point)
+            raise
+        coordinates: List[Optional[Tuple[float, float]]] = (
+            list(zip(longitudes.tolist(), latitudes.tolist()))
+            if reverse
+            else list(zip(latitudes.tolist(), longitudes.tolist()))
+        )
+        if not is_empty.any():
+            return coordinates
+        parsed = iter(coordinates)
+        return [None if empty else next(parsed) for empty in is_empty]
 
     def process_spatial_data_obj(self, key: str, df: pd.DataFrame) -> pd.DataFrame:
         spatial = self.form_data.get(key)
         if spatial is None:
             raise ValueError(_("Bad spatial key"))
 
+        # the coordinates are built directly in the requested (lon, lat) or
+        # (lat, lon) order, instead of being reversed afterwards
+        reverse = bool(spatial.get("reverseCheckbox"))
         if spatial.get("type") == "latlong":
-            df[key] = list(
-                zip(
-                    pd.to_numeric(df[spatial.get("lonCol")], errors="coerce"),
-                    pd.to_numeric(df[spatial.get("latCol")], errors="coerce"),
-                )
-            )
+            lons = pd.to_numeric(df[spatial.get("lonCol")], errors="coerce")
+            lats = pd.to_numeric(df[spatial.get("latCol")], errors="coerce")
+            df[key] = list(zip(lats, lons) if reverse else zip(lons, lats))
         elif spatial.get("type") == "delimited":
             lon_lat_col = spatial.get("lonlatCol")
-            df[key] = df[lon_lat_col].apply(self.parse_coordinates)
+            df[key] = self.parse_coordinates_column(df[lon_lat_col], reverse)
             del df[lon_lat_col]
         elif spatial.get("type") == "geohash":
-            df[key] = df[spatial.get("geohashCol")].map(self.reverse_geohash_decode)
+            lats, lons = geo.geohash_decode(df[spatial.get("geohashCol")].to_numpy())
+            df[key] = list(
+                zip(lats.tolist(), lons.tolist())
+                if reverse
+                else zip(lons.tolist(), lats.tolist())
+            )
             del df[spatial.get("geohashCol")]
 
-        if spatial.get("reverseCheckbox"):
-            self.reverse_latlong(df, key)
-
         if df.get(key) is None:
             raise NullValueException(
                 _(
@@ -18,6 +18,8 @@
 import logging
 from unittest.mock import patch
 
+import numpy as np
+import pandas as pd
 import pytest
 
 from superset import db
@@ -26,6 +28,8 @@ from superset.models.schedules import ScheduleType
 from superset.models.slice import Slice
 from superset.tasks.schedules import (
     deliver_alert,
+    is_alert_triggered,
+    run_alert_queries,
     run_alert_query,
     schedule_alert_query,
 )
@@ -124,6 +128,36 @@ def test_run_alert_query(mock_error, mock_deliver_alert, setup_database):
     assert mock_error.call_count == 4
 
 
+def test_is_alert_triggered():
+    assert not is_alert_triggered(pd.DataFrame())
+    assert not is_alert_triggered(pd.DataFrame({"a": [0, 0], "b": ["", None]}))
+    assert not is_alert_triggered(pd.DataFrame({"a": [np.nan, 0.0]}))
+    assert is_alert_triggered(pd.DataFrame({"a": [0, 0], "b": [None, "x"]}))
+    assert is_alert_triggered(pd.DataFrame({"a": [0.0, 0.5]}))
+
+
+@patch("superset.tasks.schedules.deliver_alert")
+def test_run_alert_queries(mock_deliver_alert, setup_database):
+    dbsession = setup_database
+    alert1 = dbsession.query(Alert).filter_by(id=1).one()
+    alert2 = dbsession.query(Alert).filter_by(id=2).one()
+    alert3 = dbsession.query(Alert).filter_by(id=3).one()
+
+    # the failing alert doesn't prevent the next ones from being evaluated
+    run_alert_queries(
+        alert1.database_id,
+        [
+            (alert1.id, alert1.sql, alert1.label),
+            (alert3.id, alert3.sql, alert3.label),
+            (alert2.id, alert2.sql, alert2.label),
+        ],
+    )
+    mock_deliver_alert.assert_called_once_with(alert2.id)
+    assert alert1.last_state == "pass"
+    assert alert3.last_state == "error"
+    assert alert2.last_state == "trigger"
+
+
 @patch("superset.tasks.schedules.deliver_alert")
 @patch("superset.tasks.schedules.run_alert_query")
 def test_schedule_alert_query(mock_run_alert, mock_deliver_alert, setup_database):
@@ -181,3 +215,15 @@ def test_deliver_alert_screenshot(
         "|*Explore in Superset*>",
         "title": f"[Alert] {alert.label}",
     }
+
+
+@patch("superset.tasks.schedules.deliver_alert")
+def test_run_alert_queries_multiple_statements(mock_deliver_alert, setup_database):
+    dbsession = setup_database
+    alert1 = dbsession.query(Alert).filter_by(id=1).one()
+
+    # only the result of the last statement is evaluated
+    run_alert_queries(alert1.database_id, [(alert1.id, "SELECT 1; SELECT 0", "")])
+    mock_deliver_alert.assert_not_called()
+    run_alert_queries(alert1.database_id, [(alert1.id, "SELECT 0; SELECT 1;", "")])
+    mock_deliver_alert.assert_called_once_with(alert1.id)
@@ -712,6 +712,44 @@ class TestChartApi(SupersetTestCase, ApiOwnersTestCaseMixin):
         self.assertEqual(result["rowcount"], 5)
         self.assertEqual(result["data"][0]["name"], expected_name)
 
+    def test_chart_data_paginated_search(self):
+        """
+        Chart data API: Test raw chart data pages with a search term and total count
+        """
+        self.login(username="admin")
+        table = self.get_table_by_name("birth_names")
+        request_payload = get_query_context(table.name, table.id, table.type)
+        query = request_payload["queries"][0]
+        query.update(
+            groupby=[],
+            metrics=[],
+            columns=["name", "gender"],
+            orderby=[["name", True]],
+            row_limit=5,
+            include_total_count=True,
+        )
+        query["extras"]["search"] = "JA"
+        rv = self.post_assert_metric(CHART_DATA_URI, request_payload, "data")
+        self.assertEqual(rv.status_code, 200)
+        result = json.loads(rv.data.decode("utf-8"))["result"][0]
+        self.assertEqual(result["rowcount"], 5)
+        self.assertGreater(result["total_count"], 5)
+        for row in result["data"]:
+            self.assertIn("ja", row["name"].lower())
+        total_count = result["total_count"]
+
+        # all the pages share the same total count
+        query["row_offset"] = 5
+        rv = self.post_assert_metric(CHART_DATA_URI, request_payload, "data")
+        result = json.loads(rv.data.decode("utf-8"))["result"][0]
+        self.assertEqual(result["total_count"], total_count)
+
+        query["extras"]["search"] = "no such name"
+        rv = self.post_assert_metric(CHART_DATA_URI, request_payload, "data")
+        result = json.loads(rv.data.decode("utf-8"))["result"][0]
+        self.assertEqual(result["rowcount"], 0)
+        self.assertEqual(result["total_count"], 0)
+
     @mock.patch(
         "superset.common.query_object.config", {**app.config, "ROW_LIMIT": 7},
     )
@@ -789,6 +827,50 @@ class TestChartApi(SupersetTestCase, ApiOwnersTestCaseMixin):
         rv = self.post_assert_metric(CHART_DATA_URI, request_payload, "data")
         self.assertEqual(rv.status_code, 200)
 
+    def test_chart_data_columnar_result_format(self):
+        """
+        Chart data API: Test chart data with columnar result format
+        """
+        self.login(username="admin")
+        table = self.get_table_by_name("birth_names")
+        request_payload = get_query_context(table.name, table.id, table.type)
+        request_payload["queries"][0]["row_limit"] = 10
+        rv = self.post_assert_metric(CHART_DATA_URI, request_payload, "data")
+        records = json.loads(rv.data.decode("utf-8"))["result"][0]["data"]
+
+        request_payload["result_format"] = "columnar"
+        rv = self.post_assert_metric(CHART_DATA_URI, request_payload, "data")
+        self.assertEqual(rv.status_code, 200)
+        data = json.loads(rv.data.decode("utf-8"))["result"][0]["data"]
+        self.assertEqual(data["colnames"], ["name", "sum__num"])
+        self.assertEqual(data["coltypes"], ["STRING", "INT"])
+        self.assertEqual(
+            [dict(zip(data["colnames"], row)) for row in zip(*data["columns"])],
+            records,
+        )
+
+    @mock.patch(
+        "superset.utils.cancellation.QueryCancellationRegistry.cancel", return_value=0,
+    )
+    def test_chart_data_cancel(self, mock_cancel):
+        """
+        Chart data API: Test the cancellation of the queries of chart data requests
+        """
+        from superset import cache
+        from superset.utils.cancellation import get_cancel_key
+
+        self.login(username="admin")
+        admin = self.get_user("admin")
+        rv = self.post_assert_metric(
+            f"{CHART_DATA_URI}/cancel", {"request_ids": ["abc"]}, "cancel_data"
+        )
+        self.assertEqual(rv.status_code, 200)
+        mock_cancel.assert_called_once_with("abc", admin.id)
+        self.assertEqual(cache.get(get_cancel_key("abc")), {"user_id": admin.id})
+
+        rv = self.post_assert_metric(f"{CHART_DATA_URI}/cancel", {}, "cancel_data")
+        self.assertEqual(rv.status_code, 400)
+
     def test_chart_data_mixed_case_filter_op(self):
         """
         Chart data API: Ensure mixed case filter operator generates valid result
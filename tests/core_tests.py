@@ -434,6 +434,19 @@ class TestCore(SupersetTestCase):
         assert self.get_resp("/healthcheck") == "OK"
         assert self.get_resp("/ping") == "OK"
 
+    def test_metrics(self):
+        from superset.stats_logger import PrometheusStatsLogger
+
+        config = {"STATS_LOGGER": PrometheusStatsLogger()}
+        with mock.patch.dict(app.config, config):
+            self.assertEqual(self.client.get("/metrics").status_code, 404)
+        config["METRICS_ENDPOINT_ENABLED"] = True
+        config["METRICS_ENDPOINT_TOKEN"] = "secret"
+        with mock.patch.dict(app.config, config):
+            self.assertEqual(self.client.get("/metrics").status_code, 401)
+            rv = self.client.get("/metrics", headers={"Authorization": "Bearer secret"})
+            self.assertEqual(rv.status_code, 200)
+
     def test_testconn(self, username="admin"):
         # need to temporarily allow sqlite dbs, teardown will undo this
         app.config["PREVENT_UNSAFE_DB_CONNECTIONS"] = False
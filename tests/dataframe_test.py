@@ -19,7 +19,7 @@ import numpy as np
 import pandas as pd
 
 import tests.test_app
-from superset.dataframe import df_to_records
+from superset.dataframe import df_to_columns, df_to_records, sanitize_df
 from superset.db_engine_specs import BaseEngineSpec
 from superset.result_set import SupersetResultSet
 
@@ -51,3 +51,53 @@ class TestSupersetDataFrame(SupersetTestCase):
                 {"a": 2, "b": 100, "c": "c2"},
             ],
         )
+
+    def test_df_to_columns(self):
+        df = pd.DataFrame(
+            {
+                "a": [1, 1239162456494753670],
+                "b": [1.5, np.nan],
+                "c": ["c1", None],
+                "d": [True, False],
+                "e": pd.to_datetime(["2020-01-01 12:00:00.001", None]),
+                "f": pd.to_datetime(["2020-01-01", "1969-12-31"]).tz_localize(
+                    "US/Eastern"
+                ),
+            }
+        )
+
+        self.assertEqual(
+            df_to_columns(df),
+            {
+                "colnames": ["a", "b", "c", "d", "e", "f"],
+                "coltypes": ["INT", "FLOAT", "STRING", "BOOL", "DATETIME", "DATETIME"],
+                "columns": [
+                    [1, "1239162456494753670"],
+                    [1.5, None],
+                    ["c1", None],
+                    [True, False],
+                    [1577880000001.0, None],
+                    [1577836800000.0, -86400000.0],
+                ],
+            },
+        )
+
+    def test_sanitize_df(self):
+        df = pd.DataFrame(
+            {
+                "a": [1, 1239162456494753670],
+                "b": [1.5, np.inf],
+                "c": pd.Series([-np.inf, 2], dtype=object),
+            }
+        )
+
+        sanitized = sanitize_df(df)
+        self.assertTrue(np.isnan(sanitized["b"][1]))
+        self.assertTrue(np.isnan(sanitized["c"][0]))
+        self.assertEqual(sanitized["a"].tolist(), [1, 1239162456494753670])
+        self.assertEqual(df["b"].tolist(), [1.5, np.inf])
+
+        sanitized = sanitize_df(df, stringify_big_ints=True)
+        self.assertEqual(sanitized["a"].tolist(), [1, "1239162456494753670"])
+        unchanged = df[["a"]]
+        self.assertIs(sanitize_df(unchanged), unchanged)
@@ -19,9 +19,12 @@ from tests.test_app import app  # isort:skip
 import datetime
 from unittest import mock
 
+import pandas as pd
+
 from superset.db_engine_specs import engines
 from superset.db_engine_specs.base import BaseEngineSpec, builtin_time_grains
 from superset.db_engine_specs.sqlite import SqliteEngineSpec
+from superset.sql_parse import Table
 from superset.utils.core import get_example_database
 from tests.db_engine_specs.base_tests import TestDbEngineSpec
 
@@ -239,3 +242,82 @@ class TestDbEngineSpecs(TestDbEngineSpec):
         ]
         result = BaseEngineSpec.pyodbc_rows_to_tuples(data)
         self.assertListEqual(result, data)
+
+    @mock.patch("superset.db_engine_specs.base.BaseEngineSpec.df_to_sql")
+    @mock.patch("superset.db_engine_specs.base.BaseEngineSpec.get_engine")
+    def test_df_chunks_to_sql(self, mock_get_engine, mock_df_to_sql):
+        mock_get_engine.return_value.dialect.supports_multivalues_insert = False
+        chunks = [
+            pd.DataFrame({"a": [1, 2]}),
+            pd.DataFrame({"a": [3, None]}),
+        ]
+        BaseEngineSpec.df_chunks_to_sql(
+            chunks, Table("tbl", "schema"), mock.Mock(), {"if_exists": "replace"}
+        )
+        calls = mock_df_to_sql.call_args_list
+        self.assertEqual(len(calls), 2)
+        self.assertEqual(calls[0][1]["if_exists"], "replace")
+        self.assertEqual(calls[0][1]["schema"], "schema")
+        self.assertEqual(calls[1][1]["if_exists"], "append")
+        # the schema of the first chunk is kept
+        self.assertEqual(str(calls[1][1]["df"]["a"].dtype), "Int64")
+
+        # fractional values are left as floats
+        mock_df_to_sql.reset_mock()
+        chunks = [pd.DataFrame({"a": [1, 2]}), pd.DataFrame({"a": [3.5, None]})]
+        BaseEngineSpec.df_chunks_to_sql(
+            chunks, Table("tbl"), mock.Mock(), {"if_exists": "replace"}
+        )
+        calls = mock_df_to_sql.call_args_list
+        self.assertEqual(str(calls[1][1]["df"]["a"].dtype), "float64")
+
+    @mock.patch("superset.db_engine_specs.base.sqla.Table")
+    @mock.patch("superset.db_engine_specs.base.BaseEngineSpec.df_to_sql")
+    @mock.patch("superset.db_engine_specs.base.BaseEngineSpec.get_engine")
+    def test_df_chunks_to_sql_cleanup(
+        self, mock_get_engine, mock_df_to_sql, mock_table
+    ):
+        mock_get_engine.return_value.dialect.supports_multivalues_insert = False
+        chunks = [pd.DataFrame({"a": [1, 2]}), pd.DataFrame({"a": [3, 4]})]
+
+        # an existing table is kept when the upload fails to create it
+        mock_df_to_sql.side_effect = ValueError("Table 'tbl' already exists.")
+        with self.assertRaises(ValueError):
+            BaseEngineSpec.df_chunks_to_sql(
+                iter(chunks), Table("tbl"), mock.Mock(), {"if_exists": "fail"}
+            )
+        mock_table.return_value.drop.assert_not_called()
+
+        # the table created by the upload is dropped when a later chunk fails
+        mock_df_to_sql.side_effect = [None, ValueError()]
+        with self.assertRaises(ValueError):
+            BaseEngineSpec.df_chunks_to_sql(
+                iter(chunks), Table("tbl"), mock.Mock(), {"if_exists": "fail"}
+            )
+        mock_table.return_value.drop.assert_called_once()
+
+    def test_fetch_data_in_batches(self):
+        rows = [(i,) for i in range(25)]
+        cursor = mock.Mock()
+        cursor.fetchmany.side_effect = lambda size: [
+            rows.pop(0) for _ in range(min(size, len(rows)))
+        ]
+        data = BaseEngineSpec.fetch_data_in_batches(cursor, 10)
+        self.assertEqual(data, [(i,) for i in range(25)])
+        self.assertEqual(
+            [call[0][0] for call in cursor.fetchmany.call_args_list], [10, 10, 10, 10]
+        )
+
+        rows = [(i,) for i in range(25)]
+        cursor.fetchmany.reset_mock()
+        data = BaseEngineSpec.fetch_data_in_batches(cursor, 10, limit=15)
+        self.assertEqual(data, [(i,) for i in range(15)])
+        self.assertEqual(
+            [call[0][0] for call in cursor.fetchmany.call_args_list], [10, 5]
+        )
+
+    def test_cancel_query(self):
+        cursor = mock.Mock()
+        self.assertTrue(BaseEngineSpec.cancel_query(cursor, mock.Mock(), None))
+        cursor.cancel.assert_called_once_with()
+        self.assertFalse(BaseEngineSpec.cancel_query(object(), mock.Mock(), None))
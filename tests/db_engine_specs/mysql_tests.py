@@ -15,6 +15,7 @@
 # specific language governing permissions and limitations
 # under the License.
 import unittest
+from unittest import mock
 
 from sqlalchemy.dialects import mysql
 from sqlalchemy.dialects.mysql import DATE, NVARCHAR, TEXT, VARCHAR
@@ -101,3 +102,23 @@ class TestMySQLEngineSpecsDbEngineSpec(TestDbEngineSpec):
             assert MySQLEngineSpec.is_db_column_type_match(
                 type_str, DbColumnType.TEMPORAL
             ) is (col_type == DbColumnType.TEMPORAL)
+
+    def test_get_cancel_query_id(self):
+        cursor = mock.Mock()
+        cursor.connection.thread_id.return_value = 12
+        self.assertEqual(MySQLEngineSpec.get_cancel_query_id(cursor, mock.Mock()), "12")
+        cursor.execute.assert_not_called()
+
+        cursor = mock.Mock()
+        cursor.connection = object()
+        cursor.fetchone.return_value = (34,)
+        self.assertEqual(MySQLEngineSpec.get_cancel_query_id(cursor, mock.Mock()), "34")
+        cursor.execute.assert_called_once_with("SELECT CONNECTION_ID()")
+
+    def test_cancel_query(self):
+        database = mock.Mock()
+        engine = database.get_sqla_engine.return_value
+        self.assertFalse(MySQLEngineSpec.cancel_query(mock.Mock(), database, None))
+        engine.execute.assert_not_called()
+        self.assertTrue(MySQLEngineSpec.cancel_query(mock.Mock(), database, "12"))
+        engine.execute.assert_called_once_with("KILL QUERY 12")
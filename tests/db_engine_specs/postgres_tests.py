@@ -19,7 +19,9 @@ from unittest import mock
 from sqlalchemy import column, literal_column
 from sqlalchemy.dialects import postgresql
 
+from superset.db_engine_specs.cockroachdb import CockroachDbEngineSpec
 from superset.db_engine_specs.postgres import PostgresEngineSpec
+from superset.db_engine_specs.redshift import RedshiftEngineSpec
 from tests.db_engine_specs.base_tests import TestDbEngineSpec
 
 
@@ -117,3 +119,48 @@ class TestPostgresDbEngineSpec(TestDbEngineSpec):
         cursor.description = []
         results = PostgresEngineSpec.fetch_data(cursor, 1000)
         self.assertEqual(results, [])
+
+    def test_get_server_side_cursor(self):
+        """
+        DB Eng Specs (postgres): Test the named cursor of psycopg2 connections
+        """
+        engine = mock.Mock()
+        connection = mock.Mock()
+        engine.dialect.driver = "psycopg2"
+        cursor = PostgresEngineSpec.get_server_side_cursor(engine, connection)
+        self.assertEqual(cursor, connection.cursor.return_value)
+        self.assertTrue(connection.cursor.call_args[1]["name"].startswith("superset_"))
+
+        engine.dialect.driver = "pg8000"
+        self.assertIsNone(PostgresEngineSpec.get_server_side_cursor(engine, connection))
+
+        # the Postgres-like databases don't declare psycopg2 cursors
+        engine.dialect.driver = "psycopg2"
+        for spec in (CockroachDbEngineSpec, RedshiftEngineSpec):
+            self.assertIsNone(spec.get_server_side_cursor(engine, connection))
+
+    def test_copy_insert(self):
+        """
+        DB Eng Specs (postgres): Test the COPY of uploaded rows keeps empty strings
+        """
+        conn = mock.MagicMock()
+        conn.dialect.identifier_preparer.quote = lambda name: f'"{name}"'
+        pd_table = mock.Mock()
+        pd_table.name = "tbl"
+        pd_table.schema = None
+        PostgresEngineSpec._copy_insert(
+            pd_table, conn, ["a", "b"], iter([("", None), ('x"y', 1.5)])
+        )
+        cursor = conn.connection.cursor.return_value.__enter__.return_value
+        sql, buffer = cursor.copy_expert.call_args[0]
+        self.assertEqual(sql, 'COPY "tbl" ("a", "b") FROM STDIN WITH CSV')
+        self.assertEqual(buffer.getvalue(), '"",\n"x""y","1.5"\n')
+
+    def test_cancel_query(self):
+        """
+        DB Eng Specs (postgres): Test the query is cancelled through its connection
+        """
+        cursor = mock.Mock()
+        self.assertTrue(PostgresEngineSpec.cancel_query(cursor, mock.Mock(), None))
+        cursor.connection.cancel.assert_called_once_with()
+        cursor.cancel.assert_not_called()
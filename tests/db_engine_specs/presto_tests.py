@@ -511,3 +511,26 @@ class TestPrestoDbEngineSpec(TestDbEngineSpec):
 
         sqla_type = PrestoEngineSpec.get_sqla_column_type("integer")
         assert isinstance(sqla_type, types.Integer)
+
+    def test_get_approximate_expression(self):
+        self.assertEqual(
+            PrestoEngineSpec.get_approximate_expression(
+                "COUNT(DISTINCT user_id) / count( distinct t.session )"
+            ),
+            "approx_distinct(user_id) / approx_distinct(t.session)",
+        )
+        # distinct counts of several or computed expressions are kept exact
+        for expression in ("COUNT(DISTINCT a, b)", "COUNT(DISTINCT lower(a))"):
+            self.assertEqual(
+                PrestoEngineSpec.get_approximate_expression(expression), expression
+            )
+
+    def test_get_cost_estimate_values(self):
+        raw_cost = {
+            "columns": [],
+            "estimate": {"outputRowCount": 9.04969899e8, "cpuCost": 3.54143678301e11},
+        }
+        self.assertEqual(
+            PrestoEngineSpec.get_cost_estimate_values(raw_cost),
+            {"outputRowCount": 9.04969899e8, "cpuCost": 3.54143678301e11},
+        )
@@ -14,6 +14,8 @@
 # KIND, either express or implied.  See the License for the
 # specific language governing permissions and limitations
 # under the License.
+from unittest import mock
+
 from superset.db_engine_specs.sqlite import SqliteEngineSpec
 from tests.db_engine_specs.base_tests import TestDbEngineSpec
 
@@ -25,3 +27,8 @@ class TestSQliteDbEngineSpec(TestDbEngineSpec):
         self.assertEqual(
             SqliteEngineSpec.convert_dttm("TEXT", dttm), "'2019-01-02 03:04:05.678900'"
         )
+
+    def test_cancel_query(self):
+        cursor = mock.Mock()
+        self.assertTrue(SqliteEngineSpec.cancel_query(cursor, mock.Mock(), None))
+        cursor.connection.interrupt.assert_called_once_with()
@@ -16,8 +16,14 @@
 # under the License.
 import logging
 import unittest
+from unittest.mock import patch
 
-from superset.utils.log import DBEventLogger, get_event_logger_from_cfg_value
+from superset.utils.log import (
+    BufferedDBEventLogger,
+    DBEventLogger,
+    get_event_logger_from_cfg_value,
+)
+from tests.test_app import app
 
 
 class TestEventLogger(unittest.TestCase):
@@ -42,3 +48,24 @@ class TestEventLogger(unittest.TestCase):
         # test that assignment of non AbstractEventLogger derived type raises TypeError
         with self.assertRaises(TypeError):
             get_event_logger_from_cfg_value(logging.getLogger())
+
+    @patch.object(BufferedDBEventLogger, "save_logs")
+    def test_buffered_event_logger_flushes_batches(self, mock_save_logs):
+        # records are written in batches and pending records flushed on shutdown
+        event_logger = BufferedDBEventLogger(batch_size=2, flush_interval=60)
+        with app.app_context():
+            event_logger.log(1, "action", records=[{"a": 1}, {"a": 2}, {"a": 3}])
+            event_logger.shutdown()
+        batches = [args[0] for args, _ in mock_save_logs.call_args_list]
+        self.assertEqual([len(batch) for batch in batches], [2, 1])
+        self.assertEqual(batches[1][0]["json"], '{"a": 3}')
+
+    @patch.object(BufferedDBEventLogger, "save_logs")
+    def test_buffered_event_logger_survives_errors(self, mock_save_logs):
+        # a batch failing to be written doesn't stop the following ones
+        mock_save_logs.side_effect = [Exception("error"), None]
+        event_logger = BufferedDBEventLogger(batch_size=1, flush_interval=60)
+        with app.app_context():
+            event_logger.log(1, "action", records=[{"a": 1}, {"a": 2}])
+            event_logger.shutdown()
+        self.assertEqual(mock_save_logs.call_count, 2)
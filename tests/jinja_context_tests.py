@@ -15,10 +15,17 @@
 # specific language governing permissions and limitations
 # under the License.
 import json
+from unittest import mock
 
 import tests.test_app
 from superset import app
-from superset.jinja_context import ExtraCache, filter_values
+from superset.jinja_context import (
+    BaseTemplateProcessor,
+    compile_template,
+    ExtraCache,
+    filter_values,
+    PrestoTemplateProcessor,
+)
 from tests.base_tests import SupersetTestCase
 
 
@@ -97,3 +104,23 @@ class TestJinja2Context(SupersetTestCase):
             query_string={"form_data": json.dumps({"url_params": {"foo": "bar"}})}
         ):
             self.assertEqual(ExtraCache().url_param("foo"), "bar")
+
+    def test_template_processors_share_environment(self) -> None:
+        database = mock.Mock()
+        processor = BaseTemplateProcessor(database=database)
+        self.assertIs(processor.env, BaseTemplateProcessor(database=database).env)
+        self.assertIsNot(processor.env, PrestoTemplateProcessor(database=database).env)
+
+        sql = "SELECT '{{ 1 + 1 }}'"
+        self.assertIs(
+            compile_template(BaseTemplateProcessor, sql),
+            compile_template(BaseTemplateProcessor, sql),
+        )
+        self.assertEqual(processor.process_template(sql), "SELECT '2'")
+
+    def test_process_template_without_delimiters(self) -> None:
+        processor = BaseTemplateProcessor(database=mock.Mock())
+        with mock.patch("superset.jinja_context.compile_template") as compile_mock:
+            sql = "SELECT 1\r\nFROM tbl\n"
+            self.assertEqual(processor.process_template(sql), "SELECT 1\nFROM tbl")
+            compile_mock.assert_not_called()
@@ -19,6 +19,8 @@ from datetime import datetime
 import math
 from typing import Any, List, Optional
 
+import geohash as geohash_lib
+import numpy as np
 from pandas import DataFrame, Series
 import pytest
 
@@ -485,6 +487,52 @@ class TestPostProcessing(SupersetTestCase):
             series_to_list(post_df["latitude"]), series_to_list(lonlat_df["latitude"]),
         )
 
+    def test_geohash_encode_invalid(self):
+        df = DataFrame({"latitude": [40.7, 95.0], "longitude": [-74.0, 10.0]})
+        self.assertRaises(
+            QueryObjectValidationError,
+            proc.geohash_encode,
+            df=df,
+            latitude="latitude",
+            longitude="longitude",
+            geohash="geohash",
+        )
+
+    def test_geohash_matches_geohash_lib(self):
+        rng = np.random.default_rng(0)
+        latitudes = np.append(rng.uniform(-90, 90, 1000), [-90.0, 0.0, -0.0, 1e-300])
+        longitudes = np.append(rng.uniform(-400, 400, 1000), [180.0, -0.0, 0, -1e-9])
+        df = DataFrame({"latitude": latitudes, "longitude": longitudes})
+        post_df = proc.geohash_encode(
+            df=df, latitude="latitude", longitude="longitude", geohash="geohash",
+        )
+        expected = [
+            geohash_lib.encode(lat, lon) for lat, lon in zip(latitudes, longitudes)
+        ]
+        self.assertListEqual(series_to_list(post_df["geohash"]), expected)
+
+        geohashes = [code[: i % 14] for i, code in enumerate(expected)]
+        geohashes += ["zzzzzzzzzzzzzzzzzzzzzzzz", "DR5"]
+        post_df = proc.geohash_decode(
+            df=DataFrame({"geohash": geohashes}),
+            geohash="geohash",
+            latitude="latitude",
+            longitude="longitude",
+        )
+        self.assertListEqual(
+            list(zip(post_df["latitude"], post_df["longitude"])),
+            [geohash_lib.decode(code) for code in geohashes],
+        )
+
+        self.assertRaises(
+            QueryObjectValidationError,
+            proc.geohash_decode,
+            df=DataFrame({"geohash": ["dr5", "dr5!"]}),
+            geohash="geohash",
+            latitude="latitude",
+            longitude="longitude",
+        )
+
     def test_contribution(self):
         df = DataFrame(
             {
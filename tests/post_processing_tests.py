@@ -0,0 +1,123 @@
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+# isort:skip_file
+from typing import Any, Dict, List
+
+from pandas import DataFrame
+from pandas.testing import assert_frame_equal
+
+from superset.common.post_processing import PostProcessingPlan
+from superset.exceptions import QueryObjectValidationError
+from superset.utils import pandas_postprocessing as proc
+from superset.utils.timing import timing_trace
+
+from .base_tests import SupersetTestCase
+from .fixtures.dataframes import categories_df, timeseries_df
+
+
+def exec_sequentially(df: DataFrame, post_processing: List[Dict[str, Any]]):
+    for post_process in post_processing:
+        df = getattr(proc, post_process["operation"])(df, **post_process["options"])
+    return df
+
+
+class TestPostProcessingPlan(SupersetTestCase):
+    def test_fused_column_operations(self):
+        post_processing = [
+            {"operation": "cum", "options": {"columns": {"y": "y"}, "operator": "sum"}},
+            {"operation": "diff", "options": {"columns": {"y": "y2"}}},
+            {
+                "operation": "rolling",
+                "options": {"columns": {"y": "y3"}, "rolling_type": "sum", "window": 2},
+            },
+        ]
+        plan = PostProcessingPlan(post_processing)
+        # the diff depends on the cumulated `y`, the rolling sum doesn't
+        self.assertListEqual(
+            [step.name for step in plan.steps], ["cum", "diff+rolling"]
+        )
+        assert_frame_equal(
+            plan.execute(timeseries_df),
+            exec_sequentially(timeseries_df, post_processing),
+        )
+
+    def test_fused_sort_select(self):
+        post_processing = [
+            {"operation": "sort", "options": {"columns": {"category": True}}},
+            {
+                "operation": "select",
+                "options": {"columns": ["name", "asc_idx"], "rename": {"name": "n"}},
+            },
+        ]
+        plan = PostProcessingPlan(post_processing)
+        self.assertListEqual([step.name for step in plan.steps], ["sort+select"])
+        assert_frame_equal(
+            plan.execute(categories_df),
+            exec_sequentially(categories_df, post_processing),
+        )
+
+    def test_rolling_min_periods_not_fused(self):
+        plan = PostProcessingPlan(
+            [
+                {"operation": "diff", "options": {"columns": {"y": "y2"}}},
+                {
+                    "operation": "rolling",
+                    "options": {
+                        "columns": {"y": "y3"},
+                        "rolling_type": "sum",
+                        "window": 2,
+                        "min_periods": 2,
+                    },
+                },
+            ]
+        )
+        self.assertListEqual([step.name for step in plan.steps], ["diff", "rolling"])
+        self.assertEqual(len(plan.execute(timeseries_df)), 2)
+
+    def test_step_timings(self):
+        plan = PostProcessingPlan(
+            [{"operation": "sort", "options": {"columns": {"y": False}}}]
+        )
+        with timing_trace() as trace:
+            plan.execute(timeseries_df)
+        self.assertIn("post_processing.sort", trace.timings)
+
+    def test_validation(self):
+        self.assertRaises(
+            QueryObjectValidationError, PostProcessingPlan, [{"options": {}}]
+        )
+        self.assertRaises(
+            QueryObjectValidationError,
+            PostProcessingPlan,
+            [{"operation": "validate_column_args", "options": {}}],
+        )
+        # invalid options are rejected before any operation runs
+        self.assertRaises(
+            QueryObjectValidationError,
+            PostProcessingPlan,
+            [
+                {"operation": "sort", "options": {"columns": {"y": True}}},
+                {"operation": "cum", "options": {"columns": {"y": "y"}}},
+            ],
+        )
+        plan = PostProcessingPlan(
+            [
+                {"operation": "diff", "options": {"columns": {"y": "y2"}}},
+                {"operation": "diff", "options": {"columns": {"abc": "y3"}}},
+            ]
+        )
+        self.assertRaises(QueryObjectValidationError, plan.execute, timeseries_df)
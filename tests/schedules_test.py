@@ -29,6 +29,7 @@ from superset.models.dashboard import Dashboard
 from superset.models.schedules import (
     DashboardEmailSchedule,
     EmailDeliveryType,
+    ScheduleType,
     SliceEmailReportFormat,
     SliceEmailSchedule,
 )
@@ -36,8 +37,13 @@ from superset.tasks.schedules import (
     create_webdriver,
     deliver_dashboard,
     deliver_slice,
+    get_reports_user,
+    get_schedule_offset,
     next_schedules,
+    schedule_prewarms,
+    schedule_window,
 )
+from superset.utils.webdriver import WebDriverPool, WebDriverProxy
 from superset.models.slice import Slice
 from tests.base_tests import SupersetTestCase
 from tests.utils import read_fixture
@@ -165,6 +171,64 @@ class TestSchedules(SupersetTestCase):
         self.assertEqual(schedules[59], datetime.strptime("2018-03-30 17:40:00", fmt))
         self.assertEqual(schedules[60], datetime.strptime("2018-05-04 17:10:00", fmt))
 
+    @patch("superset.tasks.schedules.prewarm_dashboard_cache.apply_async")
+    @patch("superset.tasks.schedules.schedule_email_report.apply_async")
+    def test_schedule_window_dashboard(self, schedule_report, prewarm):
+        start_at = datetime.now().replace(microsecond=0, second=0, minute=0)
+        stop_at = start_at + timedelta(seconds=3600)
+        resolution = 15 * 60
+        schedule_window(ScheduleType.dashboard, start_at, stop_at, resolution)
+
+        etas = {
+            call[0][0][1]: call[1]["eta"] for call in schedule_report.call_args_list
+        }
+        eta = etas[self.dashboard_schedule]
+        offset = get_schedule_offset(
+            ScheduleType.dashboard, self.dashboard_schedule, 5 * 60
+        )
+        self.assertEqual(eta, start_at + timedelta(seconds=offset))
+
+        # the report is due at the start of the window, too late to be warmed up
+        prewarm_ids = [call[0][0][0] for call in prewarm.call_args_list]
+        self.assertNotIn(self.dashboard_schedule, prewarm_ids)
+
+    @patch("superset.tasks.schedules.prewarm_dashboard_cache.apply_async")
+    def test_schedule_prewarms(self, prewarm):
+        dashboard_schedule = DashboardEmailSchedule(**self.common_data)
+        dashboard_schedule.crontab = "2 * * * *"
+        dashboard_schedule.dashboard_id = (
+            db.session.query(DashboardEmailSchedule)
+            .get(self.dashboard_schedule)
+            .dashboard_id
+        )
+        dashboard_schedule.user_id = 1
+        db.session.add(dashboard_schedule)
+        db.session.commit()
+        schedule_id = dashboard_schedule.id
+
+        # the start of an upcoming window
+        start_at = datetime.now().replace(
+            microsecond=0, second=0, minute=0
+        ) + timedelta(hours=2)
+        try:
+            schedule_prewarms(start_at, 15 * 60)
+        finally:
+            db.session.delete(dashboard_schedule)
+            db.session.commit()
+
+        # the charts are queried ahead of the report due at :02
+        prewarm_etas = {
+            call[0][0][0]: call[1]["eta"] for call in prewarm.call_args_list
+        }
+        eta = start_at + timedelta(
+            seconds=2 * 60
+            + get_schedule_offset(ScheduleType.dashboard, schedule_id, 5 * 60)
+        )
+        prewarm_eta = prewarm_etas[schedule_id]
+        self.assertGreater(prewarm_eta, datetime.now())
+        self.assertLessEqual(prewarm_eta, eta - timedelta(seconds=5 * 60))
+        self.assertGreaterEqual(prewarm_eta, eta - timedelta(seconds=10 * 60))
+
     @patch("superset.tasks.schedules.firefox.webdriver.WebDriver")
     def test_create_driver(self, mock_driver_class):
         mock_driver = Mock()
@@ -174,19 +238,65 @@ class TestSchedules(SupersetTestCase):
         create_webdriver()
         mock_driver.add_cookie.assert_called_once()
 
+    @patch("superset.tasks.schedules.firefox.webdriver.WebDriver")
+    def test_webdriver_pool(self, mock_driver_class):
+        mock_driver_class.side_effect = lambda **kwargs: Mock()
+        proxy = WebDriverProxy("firefox")
+        user = get_reports_user()
+        pool = WebDriverPool()
+
+        with patch.dict(
+            app.config, {"WEBDRIVER_POOL_SIZE": 1, "WEBDRIVER_POOL_MAX_USAGE": 2}
+        ):
+            driver = pool.acquire(proxy, user)
+            self.assertTrue(pool.release(driver))
+            # the authenticated driver is reused
+            self.assertIs(pool.acquire(proxy, user), driver)
+            self.assertEqual(mock_driver_class.call_count, 1)
+            # and recycled after being used too many times
+            self.assertFalse(pool.release(driver))
+            self.assertIsNot(pool.acquire(proxy, user), driver)
+
+            # failed drivers are not kept around
+            driver = pool.acquire(proxy, user)
+            self.assertFalse(pool.release(driver, discard=True))
+            self.assertIsNot(pool.acquire(proxy, user), driver)
+
+    @patch("superset.utils.webdriver.webdriver_pool")
+    @patch("superset.tasks.schedules.firefox.webdriver.WebDriver")
+    def test_webdriver_pool_dead_driver(self, mock_driver_class, mock_pool):
+        dead_driver = Mock()
+        dead_driver.get.side_effect = WebDriverException("browser is gone")
+        fresh_driver = Mock()
+        fresh_driver.find_element.return_value.screenshot_as_png = b"png"
+        # No .loading element on the page
+        fresh_driver.find_elements.return_value = []
+        mock_pool.acquire.side_effect = [dead_driver, fresh_driver]
+        mock_pool.release.return_value = True
+
+        proxy = WebDriverProxy("firefox")
+        user = get_reports_user()
+        self.assertEqual(proxy.get_screenshot("url", "element", user), b"png")
+
+        # the dead driver is discarded and the screenshot retried with a new one
+        self.assertEqual(mock_pool.acquire.call_args_list[1][1], {"fresh": True})
+        mock_pool.release.assert_any_call(dead_driver, discard=True)
+        mock_pool.release.assert_any_call(fresh_driver, discard=False)
+        fresh_driver.get_screenshot_as_png.assert_not_called()
+
     @patch("superset.tasks.schedules.firefox.webdriver.WebDriver")
     @patch("superset.tasks.schedules.send_email_smtp")
-    @patch("superset.tasks.schedules.time")
-    def test_deliver_dashboard_inline(self, mtime, send_email_smtp, driver_class):
+    def test_deliver_dashboard_inline(self, send_email_smtp, driver_class):
         element = Mock()
         driver = Mock()
-        mtime.sleep.return_value = None
 
         driver_class.return_value = driver
 
         # Ensure that we are able to login with the driver
         driver.find_elements_by_id.side_effect = [True, False]
-        driver.find_element_by_class_name.return_value = element
+        driver.find_element.return_value = element
+        # No .loading element left on the page
+        driver.find_elements.return_value = []
         element.screenshot_as_png = read_fixture("sample.png")
 
         schedule = (
@@ -203,26 +313,23 @@ class TestSchedules(SupersetTestCase):
             schedule.deliver_as_group,
         )
 
-        mtime.sleep.assert_called_once()
-        driver.screenshot.assert_not_called()
+        driver.get_screenshot_as_png.assert_not_called()
         send_email_smtp.assert_called_once()
 
     @patch("superset.tasks.schedules.firefox.webdriver.WebDriver")
     @patch("superset.tasks.schedules.send_email_smtp")
-    @patch("superset.tasks.schedules.time")
-    def test_deliver_dashboard_as_attachment(
-        self, mtime, send_email_smtp, driver_class
-    ):
+    def test_deliver_dashboard_as_attachment(self, send_email_smtp, driver_class):
         element = Mock()
         driver = Mock()
-        mtime.sleep.return_value = None
 
         driver_class.return_value = driver
 
         # Ensure that we are able to login with the driver
         driver.find_elements_by_id.side_effect = [True, False]
         driver.find_element_by_id.return_value = element
-        driver.find_element_by_class_name.return_value = element
+        driver.find_element.return_value = element
+        # No .loading element left on the page
+        driver.find_elements.return_value = []
         element.screenshot_as_png = read_fixture("sample.png")
 
         schedule = (
@@ -241,8 +348,7 @@ class TestSchedules(SupersetTestCase):
             schedule.deliver_as_group,
         )
 
-        mtime.sleep.assert_called_once()
-        driver.screenshot.assert_not_called()
+        driver.get_screenshot_as_png.assert_not_called()
         send_email_smtp.assert_called_once()
         self.assertIsNone(send_email_smtp.call_args[1]["images"])
         self.assertEqual(
@@ -252,13 +358,11 @@ class TestSchedules(SupersetTestCase):
 
     @patch("superset.tasks.schedules.firefox.webdriver.WebDriver")
     @patch("superset.tasks.schedules.send_email_smtp")
-    @patch("superset.tasks.schedules.time")
-    def test_dashboard_chrome_like(self, mtime, send_email_smtp, driver_class):
+    def test_dashboard_chrome_like(self, send_email_smtp, driver_class):
         # Test functionality for chrome driver which does not support
         # element snapshots
         element = Mock()
         driver = Mock()
-        mtime.sleep.return_value = None
         type(element).screenshot_as_png = PropertyMock(side_effect=WebDriverException)
 
         driver_class.return_value = driver
@@ -266,8 +370,10 @@ class TestSchedules(SupersetTestCase):
         # Ensure that we are able to login with the driver
         driver.find_elements_by_id.side_effect = [True, False]
         driver.find_element_by_id.return_value = element
-        driver.find_element_by_class_name.return_value = element
-        driver.screenshot.return_value = read_fixture("sample.png")
+        driver.find_element.return_value = element
+        # No .loading element left on the page
+        driver.find_elements.return_value = []
+        driver.get_screenshot_as_png.return_value = read_fixture("sample.png")
 
         schedule = (
             db.session.query(DashboardEmailSchedule)
@@ -283,29 +389,28 @@ class TestSchedules(SupersetTestCase):
             schedule.deliver_as_group,
         )
 
-        mtime.sleep.assert_called_once()
-        driver.screenshot.assert_called_once()
+        driver.get_screenshot_as_png.assert_called_once()
         send_email_smtp.assert_called_once()
 
         self.assertEqual(send_email_smtp.call_args[0][0], self.RECIPIENTS)
         self.assertEqual(
             list(send_email_smtp.call_args[1]["images"].values())[0],
-            driver.screenshot.return_value,
+            driver.get_screenshot_as_png.return_value,
         )
 
     @patch("superset.tasks.schedules.firefox.webdriver.WebDriver")
     @patch("superset.tasks.schedules.send_email_smtp")
-    @patch("superset.tasks.schedules.time")
-    def test_deliver_email_options(self, mtime, send_email_smtp, driver_class):
+    def test_deliver_email_options(self, send_email_smtp, driver_class):
         element = Mock()
         driver = Mock()
-        mtime.sleep.return_value = None
 
         driver_class.return_value = driver
 
         # Ensure that we are able to login with the driver
         driver.find_elements_by_id.side_effect = [True, False]
-        driver.find_element_by_class_name.return_value = element
+        driver.find_element.return_value = element
+        # No .loading element left on the page
+        driver.find_elements.return_value = []
         element.screenshot_as_png = read_fixture("sample.png")
 
         schedule = (
@@ -328,8 +433,7 @@ class TestSchedules(SupersetTestCase):
             schedule.deliver_as_group,
         )
 
-        mtime.sleep.assert_called_once()
-        driver.screenshot.assert_not_called()
+        driver.get_screenshot_as_png.assert_not_called()
 
         self.assertEqual(send_email_smtp.call_count, 2)
         self.assertEqual(send_email_smtp.call_args[1]["bcc"], self.BCC)
@@ -337,19 +441,19 @@ class TestSchedules(SupersetTestCase):
     @patch("superset.tasks.slack_util.WebClient.files_upload")
     @patch("superset.tasks.schedules.firefox.webdriver.WebDriver")
     @patch("superset.tasks.schedules.send_email_smtp")
-    @patch("superset.tasks.schedules.time")
     def test_deliver_slice_inline_image(
-        self, mtime, send_email_smtp, driver_class, files_upload
+        self, send_email_smtp, driver_class, files_upload
     ):
         element = Mock()
         driver = Mock()
-        mtime.sleep.return_value = None
 
         driver_class.return_value = driver
 
         # Ensure that we are able to login with the driver
         driver.find_elements_by_id.side_effect = [True, False]
-        driver.find_element_by_class_name.return_value = element
+        driver.find_element.return_value = element
+        # No .loading element left on the page
+        driver.find_elements.return_value = []
         element.screenshot_as_png = read_fixture("sample.png")
 
         schedule = (
@@ -367,8 +471,7 @@ class TestSchedules(SupersetTestCase):
             schedule.email_format,
             schedule.deliver_as_group,
         )
-        mtime.sleep.assert_called_once()
-        driver.screenshot.assert_not_called()
+        driver.get_screenshot_as_png.assert_not_called()
         send_email_smtp.assert_called_once()
 
         self.assertEqual(
@@ -389,19 +492,19 @@ class TestSchedules(SupersetTestCase):
     @patch("superset.tasks.slack_util.WebClient.files_upload")
     @patch("superset.tasks.schedules.firefox.webdriver.WebDriver")
     @patch("superset.tasks.schedules.send_email_smtp")
-    @patch("superset.tasks.schedules.time")
     def test_deliver_slice_attachment(
-        self, mtime, send_email_smtp, driver_class, files_upload
+        self, send_email_smtp, driver_class, files_upload
     ):
         element = Mock()
         driver = Mock()
-        mtime.sleep.return_value = None
 
         driver_class.return_value = driver
 
         # Ensure that we are able to login with the driver
         driver.find_elements_by_id.side_effect = [True, False]
-        driver.find_element_by_class_name.return_value = element
+        driver.find_element.return_value = element
+        # No .loading element left on the page
+        driver.find_elements.return_value = []
         element.screenshot_as_png = read_fixture("sample.png")
 
         schedule = (
@@ -420,8 +523,7 @@ class TestSchedules(SupersetTestCase):
             schedule.deliver_as_group,
         )
 
-        mtime.sleep.assert_called_once()
-        driver.screenshot.assert_not_called()
+        driver.get_screenshot_as_png.assert_not_called()
         send_email_smtp.assert_called_once()
 
         self.assertEqual(
@@ -18,7 +18,7 @@ import unittest
 
 import sqlparse
 
-from superset.sql_parse import ParsedQuery, Table
+from superset.sql_parse import get_parsed_query, ParsedQuery, Table
 
 
 class TestSupersetSqlParse(unittest.TestCase):
@@ -385,6 +385,29 @@ class TestSupersetSqlParse(unittest.TestCase):
         self.assertEqual(False, sql.is_select())
         self.assertEqual(True, sql.is_readonly())
 
+    def test_is_deterministic(self):
+        self.assertTrue(ParsedQuery("SELECT * FROM t").is_deterministic())
+        self.assertTrue(ParsedQuery("SELECT 'now' FROM t").is_deterministic())
+        self.assertFalse(ParsedQuery("SELECT NOW()").is_deterministic())
+        self.assertFalse(
+            ParsedQuery("SELECT * FROM t WHERE ds > current_date").is_deterministic()
+        )
+        self.assertFalse(ParsedQuery("SELECT rand() FROM t").is_deterministic())
+
+    def test_is_plain_select(self):
+        self.assertTrue(ParsedQuery("SELECT * FROM t").is_plain_select())
+        self.assertTrue(
+            ParsedQuery("WITH x AS (SELECT 1) SELECT * FROM x").is_plain_select()
+        )
+        self.assertTrue(ParsedQuery("SELECT 'into' FROM t").is_plain_select())
+        self.assertFalse(ParsedQuery("SELECT * INTO t2 FROM t").is_plain_select())
+        self.assertFalse(
+            ParsedQuery(
+                "WITH d AS (DELETE FROM t RETURNING *) SELECT * FROM d"
+            ).is_plain_select()
+        )
+        self.assertFalse(ParsedQuery("UPDATE t SET a = 1").is_plain_select())
+
     def test_complex_extract_tables(self):
         query = """SELECT sum(m_examples) AS "sum__m_example"
             FROM
@@ -579,3 +602,18 @@ class TestSupersetSqlParse(unittest.TestCase):
                 reindent=True,
             ),
         )
+
+    def test_get_parsed_query(self):
+        query = "SELECT * FROM tbname LIMIT 5000"
+        parsed = get_parsed_query(query)
+        self.assertIs(parsed, get_parsed_query(query))
+        self.assertEqual({Table("tbname")}, parsed.tables)
+
+        # the shared parsed query isn't modified when updating the limit
+        self.assertEqual(
+            "SELECT * FROM tbname LIMIT 1000", parsed.set_or_update_query_limit(1000)
+        )
+        self.assertEqual(5000, parsed.limit)
+        self.assertEqual(
+            "SELECT * FROM tbname LIMIT 2000", parsed.set_or_update_query_limit(2000)
+        )
@@ -15,16 +15,24 @@
 # specific language governing permissions and limitations
 # under the License.
 # isort:skip_file
+from datetime import datetime
 from typing import Any, Dict, NamedTuple, List, Tuple, Union
-from unittest.mock import patch
+from unittest.mock import patch, PropertyMock
 import pytest
 
 import tests.test_app
+from superset import db, viz
 from superset.connectors.sqla.models import SqlaTable, TableColumn
+from superset.connectors.sqla.rollups import Rollup
 from superset.db_engine_specs.druid import DruidEngineSpec
 from superset.exceptions import QueryObjectValidationError
 from superset.models.core import Database
-from superset.utils.core import DbColumnType, get_example_database, FilterOperator
+from superset.utils.core import (
+    DbColumnType,
+    get_example_database,
+    FilterOperator,
+    TimeRangeEndpoint,
+)
 
 from .base_tests import SupersetTestCase
 
@@ -165,6 +173,228 @@ class TestDatabaseModel(SupersetTestCase):
             sql = table.database.compile_sqla_query(sqla_query.sqla_query)
             self.assertIn(filter_.expected, sql)
 
+    def test_approximate_mode(self):
+        table = self.get_table_by_name("birth_names")
+        db_engine_spec = table.database.db_engine_spec
+        query_obj = {
+            "granularity": None,
+            "from_dttm": None,
+            "to_dttm": None,
+            "groupby": ["gender"],
+            "metrics": [
+                {
+                    "expressionType": "SIMPLE",
+                    "column": {"column_name": "name"},
+                    "aggregate": "COUNT_DISTINCT",
+                    "label": "names",
+                }
+            ],
+            "is_timeseries": False,
+            "filter": [],
+            "extras": {"approximate": True},
+        }
+        with patch.object(
+            db_engine_spec, "approx_count_distinct_function", "APPROX_COUNT_DISTINCT"
+        ), patch.object(db_engine_spec, "table_sample_method", "BERNOULLI"):
+            # the dataset isn't in approximate mode
+            sqla_query = table.get_sqla_query(**query_obj)
+            sql = table.database.compile_sqla_query(sqla_query.sqla_query)
+            self.assertFalse(sqla_query.is_approximate)
+            self.assertIn("COUNT(DISTINCT", sql)
+
+            with patch.object(
+                SqlaTable,
+                "params_dict",
+                new_callable=PropertyMock,
+                return_value={
+                    "approximate_mode": True,
+                    "approximate_sample_percent": 10,
+                },
+            ):
+                sqla_query = table.get_sqla_query(**query_obj)
+                sql = table.database.compile_sqla_query(sqla_query.sqla_query)
+                self.assertTrue(sqla_query.is_approximate)
+                self.assertIn("APPROX_COUNT_DISTINCT(name)", sql)
+                self.assertIn("TABLESAMPLE BERNOULLI(10.0)", sql)
+
+                # the exact query is only run if it isn't too costly
+                query_obj["extras"] = {}
+                self.assertFalse(table.query(query_obj).is_approximate)
+                with patch.object(
+                    SqlaTable, "is_above_cost_thresholds", return_value=True
+                ), patch.object(db_engine_spec, "table_sample_method", None):
+                    query_str_ext = table.get_query_str_extended(query_obj)
+                self.assertTrue(query_str_ext.is_approximate)
+                self.assertIn("APPROX_COUNT_DISTINCT(name)", query_str_ext.sql)
+
+    def test_approximate_mode_viz_fallback(self):
+        table = self.get_table_by_name("birth_names")
+        db_engine_spec = table.database.db_engine_spec
+        form_data = {
+            "viz_type": "table",
+            "groupby": ["gender"],
+            "metrics": [
+                {
+                    "expressionType": "SIMPLE",
+                    "column": {"column_name": "name"},
+                    "aggregate": "COUNT_DISTINCT",
+                    "label": "names",
+                }
+            ],
+            "time_range": "No filter",
+        }
+        query_obj = viz.BaseViz(table, form_data).query_obj()
+        self.assertFalse(query_obj["extras"]["approximate"])
+        with patch.object(
+            db_engine_spec, "approx_count_distinct_function", "APPROX_COUNT_DISTINCT"
+        ), patch.object(
+            SqlaTable,
+            "params_dict",
+            new_callable=PropertyMock,
+            return_value={"approximate_mode": True},
+        ), patch.object(
+            SqlaTable, "is_above_cost_thresholds", return_value=True
+        ):
+            query_str_ext = table.get_query_str_extended(query_obj)
+        self.assertTrue(query_str_ext.is_approximate)
+        self.assertIn("APPROX_COUNT_DISTINCT(name)", query_str_ext.sql)
+
+    def test_approximate_sample_percent(self):
+        table = self.get_table_by_name("birth_names")
+        for sample_percent, expected in (
+            (None, None),
+            (10, 10.0),
+            ("2.5", 2.5),
+            (100, None),
+            (0, None),
+            (150, None),
+            ("ten", None),
+            ([10], None),
+        ):
+            with patch.object(
+                SqlaTable,
+                "params_dict",
+                new_callable=PropertyMock,
+                return_value={"approximate_sample_percent": sample_percent},
+            ):
+                self.assertEqual(table.approximate_sample_percent, expected)
+
+    @patch("superset.connectors.sqla.models.cache")
+    def test_is_above_cost_thresholds_cached(self, mock_cache):
+        table = self.get_table_by_name("birth_names")
+        db_engine_spec = table.database.db_engine_spec
+        cached = {}
+        mock_cache.get.side_effect = cached.get
+        mock_cache.set.side_effect = lambda key, value, timeout: cached.update(
+            {key: value}
+        )
+        with patch.dict(
+            "superset.connectors.sqla.models.config",
+            {"APPROXIMATE_QUERY_COST_THRESHOLDS": {"cpuCost": 10.0}},
+        ), patch.object(
+            db_engine_spec, "get_allow_cost_estimate", return_value=True
+        ), patch.object(
+            db_engine_spec, "estimate_query_cost", return_value=[{"cpuCost": 20.0}]
+        ) as estimate_query_cost:
+            self.assertTrue(table.is_above_cost_thresholds("SELECT 1"))
+            self.assertTrue(table.is_above_cost_thresholds("SELECT 1"))
+            # the same query is only estimated once
+            estimate_query_cost.assert_called_once()
+
+    def test_rollups(self):
+        table = self.get_table_by_name("birth_names")
+        rollups = {
+            "rollups": [
+                {
+                    "name": "by_state",
+                    "dimensions": ["gender", "state"],
+                    "metrics": ["count", "sum__num"],
+                    "time_grain": "P1D",
+                    "row_count": 1000,
+                    "refreshed_on": "2020-01-01T00:00:00",
+                },
+                {
+                    "name": "by_gender",
+                    "dimensions": ["gender"],
+                    "metrics": ["sum__num"],
+                    "time_grain": "P1Y",
+                    "row_count": 100,
+                    "refreshed_on": "2020-01-01T00:00:00",
+                },
+            ]
+        }
+        for definition in rollups["rollups"]:
+            definition["definition_hash"] = Rollup.from_dict(
+                table, definition
+            ).get_definition_hash(table)
+        query_obj = {
+            "granularity": "ds",
+            "from_dttm": datetime(2000, 1, 1),
+            "to_dttm": datetime(2010, 1, 1),
+            "groupby": ["gender"],
+            "metrics": ["sum__num"],
+            "is_timeseries": False,
+            "filter": [{"col": "state", "op": "==", "val": "CA"}],
+            "extras": {
+                "time_range_endpoints": (
+                    TimeRangeEndpoint.INCLUSIVE,
+                    TimeRangeEndpoint.EXCLUSIVE,
+                )
+            },
+        }
+        with patch.object(
+            SqlaTable, "params_dict", new_callable=PropertyMock, return_value=rollups
+        ):
+            sqla_query = table.get_sqla_query(**query_obj)
+            sql = table.database.compile_sqla_query(sqla_query.sqla_query)
+            self.assertEqual(sqla_query.rollup, "by_state")
+            self.assertIn("birth_names__by_state", sql)
+            self.assertIn("SUM(sum__num)", sql)
+
+            # the smallest rollup answering the query is used
+            query_obj["filter"] = []
+            self.assertEqual(table.get_sqla_query(**query_obj).rollup, "by_gender")
+
+            # the rollups don't hold the rows of a part of a day
+            query_obj["to_dttm"] = datetime(2010, 1, 1, 12)
+            self.assertIsNone(table.get_sqla_query(**query_obj).rollup)
+
+            query_obj["to_dttm"] = datetime(2010, 1, 1)
+            query_obj["filter"] = [{"col": "name", "op": "==", "val": "Aaron"}]
+            self.assertIsNone(table.get_sqla_query(**query_obj).rollup)
+
+            query_obj["filter"] = []
+            query_obj["extras"] = {**query_obj["extras"], "use_rollups": False}
+            self.assertIsNone(table.get_sqla_query(**query_obj).rollup)
+            query_obj["extras"] = {**query_obj["extras"], "use_rollups": True}
+
+            # the rows added since the last refresh aren't in the rollups
+            query_obj["to_dttm"] = datetime(2021, 1, 1)
+            self.assertIsNone(table.get_sqla_query(**query_obj).rollup)
+            query_obj["to_dttm"] = None
+            self.assertIsNone(table.get_sqla_query(**query_obj).rollup)
+            query_obj["to_dttm"] = datetime(2010, 1, 1)
+            self.assertEqual(table.get_sqla_query(**query_obj).rollup, "by_gender")
+
+            # the rollups materialized from another definition are stale
+            rollups["rollups"][1]["definition_hash"] = "stale"
+            self.assertEqual(table.get_sqla_query(**query_obj).rollup, "by_state")
+            metric = next(m for m in table.metrics if m.metric_name == "sum__num")
+            with patch.object(metric, "expression", "SUM(num_boys)"):
+                self.assertIsNone(table.get_sqla_query(**query_obj).rollup)
+
+    def test_rollup_query_obj_is_exact(self):
+        rollup = Rollup(
+            name="by_state", table_name="by_state", time_grain="P1D", metrics=["count"]
+        )
+        self.assertFalse(rollup.get_query_obj()["extras"]["approximate"])
+        self.assertFalse(rollup.get_query_obj()["extras"]["use_rollups"])
+
+    def test_rollup_needs_time_grain(self):
+        table = self.get_table_by_name("birth_names")
+        with self.assertRaises(ValueError):
+            Rollup.from_dict(table, {"name": "by_state", "dimensions": ["state"]})
+
     def test_incorrect_jinja_syntax_raises_correct_exception(self):
         query_obj = {
             "granularity": None,
@@ -187,3 +417,40 @@ class TestDatabaseModel(SupersetTestCase):
         if get_example_database().backend != "presto":
             with pytest.raises(QueryObjectValidationError):
                 table.get_sqla_query(**query_obj)
+
+    def test_fetch_metadata_diff(self):
+        database = get_example_database()
+        engine = database.get_sqla_engine()
+        engine.execute("DROP TABLE IF EXISTS fetch_metadata_test")
+        engine.execute("CREATE TABLE fetch_metadata_test (a INTEGER, b VARCHAR(10))")
+        table = SqlaTable(table_name="fetch_metadata_test", database=database)
+        db.session.add(table)
+        results = table.fetch_metadata()
+        self.assertEqual(sorted(results.added), ["a", "b"])
+        column_a = table.get_column("a")
+
+        engine.execute("DROP TABLE fetch_metadata_test")
+        engine.execute("CREATE TABLE fetch_metadata_test (a INTEGER, c VARCHAR(10))")
+        results = SqlaTable.bulk_fetch_metadata([table])
+        self.assertEqual(results[table.id].added, ["c"])
+        self.assertEqual(results[table.id].removed, ["b"])
+        self.assertEqual(results[table.id].modified, [])
+        self.assertEqual(sorted(col.column_name for col in table.columns), ["a", "c"])
+        # unchanged columns are kept as is
+        self.assertIs(table.get_column("a"), column_a)
+
+        # the changes of a dataset failing to refresh are rolled back
+        def mutator(table_):
+            raise Exception("mutator error")
+
+        engine.execute("DROP TABLE fetch_metadata_test")
+        engine.execute("CREATE TABLE fetch_metadata_test (a INTEGER, d VARCHAR(10))")
+        with patch.dict(
+            "superset.connectors.sqla.models.config", {"SQLA_TABLE_MUTATOR": mutator}
+        ):
+            self.assertEqual(SqlaTable.bulk_fetch_metadata([table]), {})
+        self.assertEqual(sorted(col.column_name for col in table.columns), ["a", "c"])
+
+        db.session.delete(table)
+        db.session.commit()
+        engine.execute("DROP TABLE fetch_metadata_test")
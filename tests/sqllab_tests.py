@@ -28,8 +28,10 @@ import tests.test_app
 from superset import db, security_manager
 from superset.connectors.sqla.models import SqlaTable
 from superset.db_engine_specs import BaseEngineSpec
+from superset.models.core import Database
 from superset.models.sql_lab import Query
 from superset.result_set import SupersetResultSet
+from superset.sql_lab import get_results_cache_key
 from superset.sql_parse import CtasMethod
 from superset.utils.core import (
     datetime_to_epoch,
@@ -500,6 +502,46 @@ class TestSqlLab(SupersetTestCase):
         admin = security_manager.find_user("admin")
         self.assertEqual(3, len(data["result"]))
 
+    @mock.patch.object(
+        Database, "sqllab_results_cache_enabled", new_callable=mock.PropertyMock
+    )
+    def test_get_results_cache_key(self, mock_cache_enabled):
+        database = get_example_database()
+        query = Query(database=database, schema="main", limit=100)
+
+        mock_cache_enabled.return_value = False
+        self.assertIsNone(get_results_cache_key(query, QUERY_1, "admin"))
+
+        mock_cache_enabled.return_value = True
+        key = get_results_cache_key(query, QUERY_1, "admin")
+        self.assertIsNotNone(key)
+        # the same normalized SQL
+        self.assertEqual(
+            key,
+            get_results_cache_key(
+                query, "select *\n  from birth_names -- the names\nlimit 1", "gamma"
+            ),
+        )
+        self.assertNotEqual(key, get_results_cache_key(query, QUERY_3, "admin"))
+        query.limit = 10
+        self.assertNotEqual(key, get_results_cache_key(query, QUERY_1, "admin"))
+
+        # DML and non deterministic statements aren't cached
+        self.assertIsNone(
+            get_results_cache_key(query, "DELETE FROM birth_names", "admin")
+        )
+        self.assertIsNone(
+            get_results_cache_key(query, "SELECT NOW(), * FROM birth_names", "admin")
+        )
+        db.session.rollback()
+
+    def test_sqllab_results_cache_enabled(self):
+        database = Database(database_name="results_cache", sqlalchemy_uri="sqlite://")
+        self.assertFalse(database.sqllab_results_cache_enabled)
+        for timeout, enabled in ((600, True), (0, False), (-1, False), ("600", False)):
+            database.extra = json.dumps({"sqllab_results_cache_timeout": timeout})
+            self.assertEqual(database.sqllab_results_cache_enabled, enabled)
+
     def test_api_database(self):
         self.login("admin")
         self.create_fake_db()
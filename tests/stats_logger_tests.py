@@ -18,7 +18,7 @@
 from unittest import TestCase
 from unittest.mock import Mock, patch
 
-from superset.stats_logger import StatsdStatsLogger
+from superset.stats_logger import PrometheusStatsLogger, StatsdStatsLogger
 
 
 class TestStatsdStatsLogger(TestCase):
@@ -29,9 +29,9 @@ class TestStatsdStatsLogger(TestCase):
         logger.decr("foo2")
         client.decr.assert_called_once()
         client.decr.assert_called_with("foo2")
-        logger.gauge("foo3")
+        logger.gauge("foo3", 2)
         client.gauge.assert_called_once()
-        client.gauge.assert_called_with("foo3")
+        client.gauge.assert_called_with("foo3", 2)
         logger.timing("foo4", 1.234)
         client.timing.assert_called_once()
         client.timing.assert_called_with("foo4", 1.234)
@@ -47,3 +47,42 @@ class TestStatsdStatsLogger(TestCase):
 
             stats_logger = StatsdStatsLogger()
             self.verify_client_calls(stats_logger, mock_client)
+
+
+class TestPrometheusStatsLogger(TestCase):
+    def test_counters_and_gauges(self):
+        logger = PrometheusStatsLogger()
+        logger.incr("loaded_from_cache")
+        logger.incr_with_tags("loaded_from_cache", {"viz_type": "table"})
+        logger.incr_with_tags("loaded_from_cache", {"viz_type": "table"})
+        logger.gauge_with_tags("event_logger.queue_size", 5)
+        lines = logger.render().splitlines()
+        self.assertIn("# TYPE superset_loaded_from_cache_total counter", lines)
+        self.assertIn("superset_loaded_from_cache_total 1.0", lines)
+        self.assertIn('superset_loaded_from_cache_total{viz_type="table"} 2.0', lines)
+        self.assertIn("superset_event_logger_queue_size 5.0", lines)
+
+    def test_incr_decr(self):
+        logger = PrometheusStatsLogger()
+        logger.gauge("event_logger.queue_size", 3)
+        logger.incr("active")
+        logger.incr("active")
+        logger.decr("active")
+        lines = logger.render().splitlines()
+        self.assertIn("superset_event_logger_queue_size 3.0", lines)
+        self.assertIn("# TYPE superset_active_total gauge", lines)
+        self.assertIn("superset_active_total 1.0", lines)
+
+    def test_timing_histogram(self):
+        logger = PrometheusStatsLogger(buckets=(0.1, 1))
+        tags = {"database": "examples"}
+        logger.timing_with_tags("sqllab.query.time_executing_query", 50, tags)
+        logger.timing_with_tags("sqllab.query.time_executing_query", 500, tags)
+        lines = logger.render().splitlines()
+        name = "superset_sqllab_query_time_executing_query_seconds"
+        self.assertIn(f"# TYPE {name} histogram", lines)
+        self.assertIn(f'{name}_bucket{{database="examples",le="0.1"}} 1.0', lines)
+        self.assertIn(f'{name}_bucket{{database="examples",le="1.0"}} 2.0', lines)
+        self.assertIn(f'{name}_bucket{{database="examples",le="+Inf"}} 2.0', lines)
+        self.assertIn(f'{name}_sum{{database="examples"}} 0.55', lines)
+        self.assertIn(f'{name}_count{{database="examples"}} 2.0', lines)
@@ -71,6 +71,9 @@ ENABLE_REACT_CRUD_VIEWS = os.environ.get("ENABLE_REACT_CRUD_VIEWS", False)
 
 CACHE_CONFIG = {"CACHE_TYPE": "simple"}
 
+# Tests mock a new webdriver for every screenshot
+WEBDRIVER_POOL_SIZE = 0
+
 
 REDIS_HOST = os.environ.get("REDIS_HOST", "localhost")
 REDIS_PORT = os.environ.get("REDIS_PORT", "6379")
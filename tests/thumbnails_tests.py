@@ -27,6 +27,7 @@ from superset import db, is_feature_enabled, security_manager, thumbnail_cache
 from superset.extensions import machine_auth_provider_factory
 from superset.models.dashboard import Dashboard
 from superset.models.slice import Slice
+from superset.tasks.thumbnails import get_lock_key, schedule_thumbnails
 from superset.utils.screenshots import ChartScreenshot, DashboardScreenshot
 from superset.utils.urls import get_url_path
 from tests.test_app import app
@@ -215,3 +216,45 @@ class TestThumbnails(SupersetTestCase):
         self.assertRedirects(
             rv, f"api/v1/dashboard/{dashboard.id}/thumbnail/{dashboard.digest}/"
         )
+
+    @skipUnless((is_feature_enabled("THUMBNAILS")), "Thumbnails feature")
+    def test_schedule_thumbnails(self):
+        """
+            Thumbnails: Schedule only the thumbnails not cached nor in flight
+        """
+        thumbnails = [
+            ("url1", "digest1"),
+            ("url1", "digest1"),
+            ("url2", "digest2"),
+            ("url3", "digest3"),
+        ]
+        cached_key = ChartScreenshot("url2", "digest2").cache_key()
+        lock_key = get_lock_key(ChartScreenshot("url3", "digest3").cache_key())
+        thumbnail_cache.set(cached_key, self.mock_image)
+        thumbnail_cache.set(lock_key, True)
+        with patch("superset.tasks.thumbnails.cache_thumbnails.delay") as mock_task:
+            count = schedule_thumbnails("chart", thumbnails)
+            self.assertEqual(count, 1)
+            mock_task.assert_called_once_with(
+                "chart", [("url1", "digest1")], force=False
+            )
+            # the cached thumbnail is computed again when forced
+            mock_task.reset_mock()
+            count = schedule_thumbnails("chart", thumbnails, force=True)
+            self.assertEqual(count, 2)
+            mock_task.assert_called_once_with(
+                "chart", [("url1", "digest1"), ("url2", "digest2")], force=True
+            )
+        thumbnail_cache.delete(cached_key)
+        thumbnail_cache.delete(lock_key)
+
+    def test_schedule_thumbnails_no_cache(self):
+        """
+            Thumbnails: Schedule nothing when no thumbnail cache is set
+        """
+        with patch("superset.tasks.thumbnails.thumbnail_cache", None), patch(
+            "superset.tasks.thumbnails.cache_thumbnails.delay"
+        ) as mock_task:
+            count = schedule_thumbnails("chart", [("url1", "digest1")])
+            self.assertEqual(count, 0)
+            mock_task.assert_not_called()
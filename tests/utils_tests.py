@@ -32,7 +32,7 @@ import marshmallow
 from sqlalchemy.exc import ArgumentError
 
 import tests.test_app
-from superset import app, db, security_manager
+from superset import app, cache, db, security_manager
 from superset.exceptions import CertificateException, SupersetException
 from superset.models.core import Database, Log
 from superset.utils.cache_manager import CacheManager
@@ -48,6 +48,8 @@ from superset.utils.core import (
     get_or_create_db,
     get_since_until,
     get_stacktrace,
+    is_time_grain_multiple,
+    is_time_grain_start,
     json_int_dttm_ser,
     json_iso_dttm_ser,
     JSONEncodedDict,
@@ -58,13 +60,16 @@ from superset.utils.core import (
     parse_human_timedelta,
     parse_js_uri_path_item,
     parse_past_timedelta,
+    QuerySource,
     split,
     TimeRangeEndpoint,
     validate_json,
     zlib_compress,
     zlib_decompress,
 )
-from superset.utils import schema
+from superset.utils import schema, timing
+from superset.utils.admission import QueryAdmission
+from superset.utils.cancellation import get_cancel_key, QueryCancellationRegistry
 from superset.views.utils import (
     build_extra_filters,
     get_form_data,
@@ -164,6 +169,28 @@ class TestUtils(SupersetTestCase):
         self.assertEqual(parse_past_timedelta("52 weeks"), timedelta(364))
         self.assertEqual(parse_past_timedelta("1 month"), timedelta(31))
 
+    def test_is_time_grain_start(self):
+        self.assertTrue(is_time_grain_start(datetime(2019, 1, 1, 10, 30), None))
+        self.assertTrue(is_time_grain_start(datetime(2019, 1, 1, 10, 30), "PT0.5H"))
+        self.assertFalse(is_time_grain_start(datetime(2019, 1, 1, 10, 30), "PT1H"))
+        self.assertTrue(is_time_grain_start(datetime(2019, 4, 1), "P0.25Y"))
+        self.assertFalse(is_time_grain_start(datetime(2019, 5, 1), "P0.25Y"))
+        self.assertFalse(is_time_grain_start(datetime(2019, 1, 1, 1), "P1Y"))
+        # the first day of the weeks depends on the database
+        self.assertFalse(is_time_grain_start(datetime(2019, 1, 7), "P1W"))
+
+    def test_is_time_grain_multiple(self):
+        self.assertTrue(is_time_grain_multiple("P1D", "P1D"))
+        self.assertTrue(is_time_grain_multiple("P1D", "PT1H"))
+        self.assertFalse(is_time_grain_multiple("PT1H", "P1D"))
+        self.assertFalse(is_time_grain_multiple("PT15M", "PT10M"))
+        self.assertTrue(is_time_grain_multiple("P1W", "P1D"))
+        self.assertTrue(is_time_grain_multiple("P1Y", "P0.25Y"))
+        self.assertFalse(is_time_grain_multiple("P1M", "P0.25Y"))
+        self.assertFalse(is_time_grain_multiple(None, "P1D"))
+        # the first day of the weeks depends on the database
+        self.assertFalse(is_time_grain_multiple("P1M", "P1W"))
+
     def test_zlib_compression(self):
         json_str = '{"test": 1}'
         blob = zlib_compress(json_str)
@@ -1381,3 +1408,154 @@ class TestUtils(SupersetTestCase):
         assert get_form_data_token({"token": "token_abcdefg1"}) == "token_abcdefg1"
         generated_token = get_form_data_token({})
         assert re.match(r"^token_[a-z0-9]{8}$", generated_token) is not None
+
+    def test_timing_trace(self):
+        with timing.trace_stage(timing.EXECUTE):
+            pass
+        self.assertIsNone(timing.get_active_trace())
+
+        with timing.timing_trace() as trace:
+            with timing.trace_stage(timing.EXECUTE):
+                pass
+            with timing.timing_trace() as nested:
+                self.assertIs(trace, nested)
+                with timing.trace_stage(timing.EXECUTE):
+                    pass
+                with timing.trace_stage(timing.FETCH):
+                    pass
+        self.assertIsNone(timing.get_active_trace())
+
+        timings = trace.to_dict()
+        self.assertEqual(set(timings.keys()), {timing.EXECUTE, timing.FETCH, "total"})
+        self.assertGreaterEqual(timings["total"], timings[timing.EXECUTE])
+
+    def test_query_admission(self):
+        def admission(user_name, source):
+            return QueryAdmission(
+                1000,
+                {"database": 2, "user": 1},
+                user_name,
+                source,
+                {"SQL_LAB": 1, "CHART": 2},
+                60,
+            )
+
+        first = admission("alpha", QuerySource.SQL_LAB)
+        second = admission("alpha", QuerySource.SQL_LAB)
+        third = admission("gamma", QuerySource.CHART)
+        fourth = admission("admin", QuerySource.SQL_LAB)
+        try:
+            self.assertTrue(first.try_acquire())
+            # a single query per user
+            self.assertFalse(second.try_acquire())
+            self.assertTrue(third.try_acquire())
+            # two queries on the database
+            self.assertFalse(fourth.try_acquire())
+            first.release()
+            self.assertTrue(second.try_acquire())
+
+            # the charts are now underserved relative to their weight
+            second.release()
+            first = admission("alpha", QuerySource.CHART)
+            first._enqueue()
+            fourth._enqueue()
+            self.assertEqual(fourth.queue_depths()["SQL_LAB"], 1)
+            self.assertFalse(fourth.try_acquire())
+            self.assertTrue(first.try_acquire())
+        finally:
+            for query_admission in (first, second, third, fourth):
+                query_admission._dequeue()
+                query_admission.release()
+            cache.clear()
+
+    def test_query_admission_owned_keys(self):
+        first = QueryAdmission(1000, {"database": 1}, None, None, {}, 60)
+        second = QueryAdmission(1000, {"database": 1}, None, None, {}, 60)
+        try:
+            self.assertTrue(first.try_acquire())
+            # the lease of the first query expired and was given to the second one
+            cache.delete(first.slot_keys[0])
+            self.assertTrue(second.try_acquire())
+            first.release()
+            self.assertEqual(cache.get(second.slot_keys[0]), second.token)
+            self.assertEqual(cache.get(first._key("served", "CHART")), 2)
+        finally:
+            second.release()
+            cache.clear()
+
+    def test_query_admission_renew_leases(self):
+        admission = QueryAdmission(1000, {"database": 1}, None, None, {}, 60)
+        try:
+            self.assertTrue(admission.try_acquire())
+            key = admission.slot_keys[0]
+            admission._renew_leases()
+            self.assertEqual(cache.get(key), admission.token)
+            # a lease given to another query isn't renewed
+            cache.set(key, "other")
+            admission._renew_leases()
+            self.assertEqual(cache.get(key), "other")
+        finally:
+            admission.release()
+            cache.clear()
+
+    def test_query_admission_stopped(self):
+        first = QueryAdmission(1000, {"database": 1}, None, None, {}, 60)
+        second = QueryAdmission(1000, {"database": 1}, None, None, {}, 60)
+        try:
+            self.assertTrue(first.try_acquire())
+            on_queued = Mock()
+            self.assertFalse(second.acquire(10, on_queued, lambda: True))
+            on_queued.assert_not_called()
+            self.assertIsNone(second.queue_key)
+            self.assertEqual(second.slot_keys, [])
+        finally:
+            first.release()
+            cache.clear()
+
+    def test_query_cancellation_registry(self):
+        registry = QueryCancellationRegistry()
+        database = Mock()
+        database.db_engine_spec.get_cancel_query_id.return_value = None
+        database.db_engine_spec.cancel_query.return_value = True
+        cursor = Mock()
+        with patch.object(registry, "_start_watcher"):
+            # not a chart data request
+            with app.test_request_context():
+                with registry.register(cursor, database):
+                    self.assertEqual(registry._queries, {})
+            with app.test_request_context("/?request_id=abc"):
+                with registry.register(cursor, database):
+                    # only the user of the request can cancel its queries
+                    self.assertEqual(registry.cancel("abc", 1), 0)
+                    self.assertEqual(registry.cancel("abc", None), 1)
+        database.db_engine_spec.cancel_query.assert_called_once_with(
+            cursor, database, None
+        )
+        self.assertEqual(registry._queries, {})
+
+    def test_query_cancellation_watcher(self):
+        registry = QueryCancellationRegistry()
+        database = Mock()
+        database.db_engine_spec.get_cancel_query_id.return_value = None
+        cancel_query = database.db_engine_spec.cancel_query
+        cancel_query.return_value = True
+        with patch.object(registry, "_start_watcher"), app.test_request_context(
+            "/?request_id=abc"
+        ):
+            with registry.register(Mock(), database):
+                registry._check()
+                cancel_query.assert_not_called()
+
+                cache.set(get_cancel_key("abc"), {"user_id": None})
+                registry._check()
+                self.assertEqual(cancel_query.call_count, 1)
+                # the cancellation request is handled once
+                self.assertIsNone(cache.get(get_cancel_key("abc")))
+                registry._check()
+                self.assertEqual(cancel_query.call_count, 1)
+
+                # the query outlived the webserver timeout
+                registry._queries["abc"][0].deadline = 1.0
+                registry._check()
+                self.assertEqual(cancel_query.call_count, 2)
+                self.assertIsNone(registry._queries["abc"][0].deadline)
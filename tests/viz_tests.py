@@ -22,6 +22,7 @@ from math import nan
 from unittest.mock import Mock, patch
 from typing import Any, Dict, List, Set
 
+import geohash
 import numpy as np
 import pandas as pd
 import pytest
@@ -1081,6 +1082,41 @@ class TestBaseDeckGLViz(SupersetTestCase):
         with self.assertRaises(SpatialException):
             test_viz_deckgl.parse_coordinates("fldkjsalkj,fdlaskjfjadlksj")
 
+    def test_parse_coordinates_column(self):
+        form_data = load_fixture("deck_path_form_data.json")
+        datasource = self.get_datasource_mock()
+        viz_instance = viz.BaseDeckGLViz(datasource, form_data)
+        points = pd.Series(["1.23, 3.21", None, "1.23 3.21", "-45.5,170"])
+
+        self.assertEqual(
+            viz_instance.parse_coordinates_column(points),
+            [viz_instance.parse_coordinates(point) for point in points],
+        )
+        self.assertEqual(
+            viz_instance.parse_coordinates_column(points, reverse=True),
+            [(3.21, 1.23), None, (3.21, 1.23), (170.0, -45.5)],
+        )
+        with self.assertRaises(SpatialException):
+            viz_instance.parse_coordinates_column(pd.Series(["1, 2", "NULL"]))
+
+    def test_process_spatial_data_obj_geohash(self):
+        form_data = load_fixture("deck_path_form_data.json")
+        form_data["spatial"] = {
+            "type": "geohash",
+            "geohashCol": "geo",
+            "reverseCheckbox": True,
+        }
+        datasource = self.get_datasource_mock()
+        viz_instance = viz.BaseDeckGLViz(datasource, form_data)
+        df = pd.DataFrame({"geo": ["dr5regw3pg6f", "r3gx2u9qdevk"]})
+
+        df = viz_instance.process_spatial_data_obj("spatial", df)
+        self.assertListEqual(df.columns.tolist(), ["spatial"])
+        self.assertEqual(
+            df["spatial"].tolist(),
+            [geohash.decode("dr5regw3pg6f"), geohash.decode("r3gx2u9qdevk")],
+        )
+
     @patch("superset.utils.core.uuid.uuid4")
     def test_filter_nulls(self, mock_uuid4):
         mock_uuid4.return_value = uuid.UUID("12345678123456781234567812345678")
@@ -1184,6 +1220,104 @@ class TestTimeSeriesViz(SupersetTestCase):
         ]
         self.assertEqual(expected, viz_data)
 
+    def test_to_series(self):
+        datasource = self.get_datasource_mock()
+        t1 = pd.Timestamp("2019-01-01")
+        t2 = pd.Timestamp("2019-01-02")
+        df = pd.DataFrame(
+            index=[t1, t2],
+            data={
+                "a": [1, 2],
+                "b": [np.nan, 2.5],
+                "c": [np.nan, np.nan],
+                "d": ["x", "y"],
+            },
+        )
+        test_viz = viz.NVD3TimeSeriesViz(datasource, {"metrics": ["a"]})
+        chart_data = test_viz.to_series(df, classed="time-shift-0")
+        self.assertEqual(
+            [series["key"] for series in chart_data], ["a", "b"],
+        )
+        self.assertEqual(chart_data[0]["classed"], "time-shift-0")
+        self.assertEqual(
+            chart_data[0]["values"], [{"x": t1, "y": 1}, {"x": t2, "y": 2}]
+        )
+        self.assertIsInstance(chart_data[0]["values"][0]["y"], int)
+        self.assertTrue(np.isnan(chart_data[1]["values"][0]["y"]))
+        self.assertEqual(chart_data[1]["values"][1], {"x": t2, "y": 2.5})
+
+    @patch("superset.viz.BaseViz.get_df_payload")
+    def test_time_compare_union_query(self, get_df_payload):
+        datasource = self.get_datasource_mock()
+        datasource.offset = 0
+        datasource.get_column = Mock(return_value=Mock(python_date_format=None))
+        form_data = {
+            "metrics": ["y"],
+            "granularity_sqla": "ds",
+            "time_grain_sqla": "P1D",
+            "time_range": "2019-01-08 : 2019-01-15",
+            "time_range_endpoints": ["inclusive", "exclusive"],
+            "time_compare": ["1 week"],
+        }
+        get_df_payload.return_value = {
+            "df": pd.DataFrame(
+                {
+                    DTTM_ALIAS: pd.date_range("2019-01-01", periods=14),
+                    "y": [float(i) for i in range(14)],
+                }
+            )
+        }
+        test_viz = viz.NVD3TimeSeriesViz(datasource, form_data)
+        test_viz.run_extra_queries()
+
+        get_df_payload.assert_called_once()
+        query_obj = get_df_payload.call_args[0][0]
+        self.assertEqual(query_obj["from_dttm"], datetime(2019, 1, 1))
+        self.assertEqual(query_obj["to_dttm"], datetime(2019, 1, 15))
+        self.assertEqual(query_obj["inner_from_dttm"], datetime(2019, 1, 8))
+        self.assertEqual(query_obj["inner_to_dttm"], datetime(2019, 1, 15))
+
+        main_df = test_viz.get_df_payload()["df"]
+        self.assertEqual(main_df["y"].tolist(), [7.0, 8.0, 9.0, 10.0, 11.0, 12.0, 13.0])
+        label, df2 = test_viz._extra_chart_data[0]
+        self.assertEqual(label, "1 week offset")
+        self.assertEqual(df2.index.tolist(), main_df[DTTM_ALIAS].tolist())
+        self.assertEqual(df2["y"].tolist(), [0.0, 1.0, 2.0, 3.0, 4.0, 5.0, 6.0])
+
+        # the union of the time ranges would be much larger than the parts
+        get_df_payload.reset_mock()
+        test_viz = viz.NVD3TimeSeriesViz(
+            datasource, {**form_data, "time_compare": ["1 year"]}
+        )
+        test_viz.run_extra_queries()
+        get_df_payload.assert_called_once()
+        self.assertEqual(get_df_payload.call_args[1], {"time_compare": "1 year"})
+
+        # the naive time range is compared to timezone aware timestamps
+        get_df_payload.return_value = {
+            "df": pd.DataFrame(
+                {
+                    DTTM_ALIAS: pd.date_range("2019-01-01", periods=14, tz="UTC"),
+                    "y": [float(i) for i in range(14)],
+                }
+            )
+        }
+        test_viz = viz.NVD3TimeSeriesViz(datasource, form_data)
+        test_viz.run_extra_queries()
+        main_df = test_viz.get_df_payload()["df"]
+        self.assertEqual(main_df["y"].tolist(), [7.0, 8.0, 9.0, 10.0, 11.0, 12.0, 13.0])
+        _, df2 = test_viz._extra_chart_data[0]
+        self.assertEqual(df2["y"].tolist(), [0.0, 1.0, 2.0, 3.0, 4.0, 5.0, 6.0])
+
+        # the failed union query is reported as the main query
+        get_df_payload.reset_mock()
+        get_df_payload.return_value = {"df": None, "errors": ["error"]}
+        test_viz = viz.NVD3TimeSeriesViz(datasource, form_data)
+        test_viz.run_extra_queries()
+        self.assertEqual(test_viz.get_df_payload()["errors"], ["error"])
+        get_df_payload.assert_called_once()
+        self.assertEqual(test_viz._extra_chart_data, [])
+
     def test_process_data_resample(self):
         datasource = self.get_datasource_mock()
 
@@ -1353,6 +1487,53 @@ class TestPivotTableViz(SupersetTestCase):
             == "min"
         )
 
+    @patch("superset.viz.BaseViz.get_df_payload")
+    def test_margins_push_down(self, get_df_payload):
+        datasource = self.get_datasource_mock()
+        datasource.get_column = Mock(return_value=None)
+        form_data = {
+            "metrics": ["sum__num"],
+            "groupby": ["gender"],
+            "columns": ["state"],
+            "pivot_margins": True,
+        }
+        margin_dfs = {
+            ("gender",): pd.DataFrame({"gender": ["boy", "girl"], "sum__num": [3, 7]}),
+            ("state",): pd.DataFrame({"state": ["CA", "NY"], "sum__num": [4, 6]}),
+            (): pd.DataFrame({"sum__num": [10]}),
+        }
+        get_df_payload.side_effect = lambda query_obj: {
+            "df": margin_dfs[tuple(query_obj["groupby"])].copy()
+        }
+        test_viz = viz.PivotTableViz(datasource, form_data)
+        test_viz.run_extra_queries()
+        self.assertEqual(
+            [call[0][0]["groupby"] for call in get_df_payload.call_args_list],
+            [["gender"], ["state"], []],
+        )
+
+        df = pd.DataFrame(
+            {
+                "gender": ["boy", "boy", "girl", "girl"],
+                "state": ["CA", "NY", "CA", "NY"],
+                "sum__num": [1, 2, 3, 4],
+            }
+        )
+        data = test_viz.get_data(df)
+        self.assertEqual(
+            data["columns"],
+            [("sum__num", "CA"), ("sum__num", "NY"), ("sum__num", "All")],
+        )
+        self.assertIn("<th>All</th>\n      <td>4</td>\n      <td>6</td>", data["html"])
+
+        # the margins are aggregated by pandas when they are not sums
+        get_df_payload.reset_mock()
+        test_viz = viz.PivotTableViz(datasource, {**form_data, "pandas_aggfunc": "max"})
+        test_viz.run_extra_queries()
+        get_df_payload.assert_not_called()
+        data = test_viz.get_data(df)
+        self.assertIn("<th>All</th>\n      <td>3</td>\n      <td>4</td>", data["html"])
+
 
 class TestDistributionPieViz(SupersetTestCase):
     base_df = pd.DataFrame(